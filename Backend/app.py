@@ -7,9 +7,11 @@ Replaces the previous Streamlit mock UI with a proper REST API
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
+from contextlib import asynccontextmanager
 from datetime import datetime
 import uvicorn
 import os
+import logging
 from dotenv import load_dotenv
 
 # Import custom middleware and exceptions
@@ -20,21 +22,64 @@ from middleware.error_handling import (
     create_success_response
 )
 
+from middleware.upload_limits import UploadSizeLimitMiddleware
+
+from database import (
+    DATABASE_FALLBACK_TO_MEMORY, close_mongo_connection, connect_to_mongo,
+    database_backend, use_in_memory_database
+)
+from repositories.base import get_write_batcher
+
 # Import routers
-from routers import quiz, study_plan, syllabus, calendar, auth, ai
+from routers import quiz, study_plan, syllabus, calendar, auth, ai, progress
+from utils.executor_utils import executor_stats, run_state, shutdown_executors, start_executors
+from utils.memory_utils import drain_pending_writes
+from utils import ocr_utils  # noqa: F401  (registers the OCR warm-up on the "cpu" worker processes)
+from utils.upload_utils import UPLOAD_MAX_REQUEST_BYTES
+from utils.state_utils import STATE_BACKEND, get_shared_store, is_state_shared
+from utils.store_utils import get_store
 
 # Load environment variables
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start shared resources before serving requests and release them on shutdown"""
+    # Shared MongoDB connection pool (in-memory demo storage if it can't be reached)
+    try:
+        await connect_to_mongo()
+    except Exception as e:
+        if not DATABASE_FALLBACK_TO_MEMORY:
+            raise
+        logger.warning(f"Starting without MongoDB: {e}")
+        use_in_memory_database()
+    # Worker pools for CPU-bound file processing and blocking SDK calls; the
+    # "cpu" workers start now and load the OCR models in the background
+    start_executors()
+    yield
+    # Write out batched and in-flight writes first: with a shared STATE_BACKEND
+    # they still need the "state" pool, and all of them need the connection
+    await get_write_batcher().close()
+    await drain_pending_writes()
+    shutdown_executors()
+    await close_mongo_connection()
+
 # Create FastAPI app instance
 app = FastAPI(
     title="StudyMentor API",
     description="REST API for StudyMentor - Your AI-powered learning companion",
     version="1.0.0",
     docs_url="/docs",  # Swagger UI at /docs
-    redoc_url="/redoc"  # ReDoc at /redoc
+    redoc_url="/redoc",  # ReDoc at /redoc
+    lifespan=lifespan
 )
 
+# Reject oversized uploads with 413 before their bodies are read
+# (added before CORS so the 413 still carries CORS headers)
+app.add_middleware(UploadSizeLimitMiddleware, max_body_bytes=UPLOAD_MAX_REQUEST_BYTES)
+
 # CORS middleware for React frontend
 app.add_middleware(
     CORSMiddleware,
@@ -72,7 +117,12 @@ async def health_check():
         data={
             "status": "healthy",
             "service": "StudyMentor API",
-            "version": "1.0.0"
+            "version": "1.0.0",
+            "database": database_backend(),
+            "executors": executor_stats(),
+            "store": get_store().stats(),
+            "state_backend": STATE_BACKEND,
+            "shared_state": await run_state(get_shared_store().stats) if is_state_shared() else None
         },
         message="API is running successfully"
     )
@@ -84,6 +134,7 @@ app.include_router(quiz.router)
 app.include_router(study_plan.router)
 app.include_router(syllabus.router)
 app.include_router(calendar.router)
+app.include_router(progress.router)
 
 # Root endpoint
 @app.get("/")
@@ -99,16 +150,22 @@ async def root():
                 "quiz": "/api/quiz",
                 "study_plan": "/api/study-plan", 
                 "syllabus": "/api/syllabus",
-                "auth": "/api/auth"
+                "auth": "/api/auth",
+                "progress": "/api/progress"
             }
         }
     )
 
 if __name__ == "__main__":
+    # More than one worker needs STATE_BACKEND=sqlite or redis when running without MongoDB
+    workers = int(os.getenv("API_WORKERS", "1"))
+    if workers > 1 and not is_state_shared():
+        logger.warning("API_WORKERS > 1 with STATE_BACKEND=memory: demo-mode data is not shared between workers")
     # Run the server
     uvicorn.run(
         "app:app",
         host="0.0.0.0",
         port=8000,
-        reload=True  # Enable hot reload during development
+        workers=workers,
+        reload=workers == 1  # Enable hot reload during development (single worker only)
     )
@@ -13,6 +13,10 @@ from pydantic import BaseModel, EmailStr, validator
 import secrets
 import string
 
+from utils.auth_utils import (
+    BCRYPT_ROUNDS, hash_password_async, password_needs_rehash, verify_password_async
+)
+
 # JWT Configuration
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-super-secret-key-change-in-production")
 ALGORITHM = "HS256"
@@ -24,16 +28,31 @@ class PasswordManager:
     
     @staticmethod
     def hash_password(password: str) -> str:
-        """Hash a password with bcrypt"""
-        salt = bcrypt.gensalt()
+        """Hash a password with bcrypt (CPU-bound; use hash_password_async from async code)"""
+        salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
         hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
         return hashed.decode('utf-8')
     
     @staticmethod
     def verify_password(password: str, hashed_password: str) -> bool:
-        """Verify a password against its hash"""
+        """Verify a password against its hash (CPU-bound; use verify_password_async from async code)"""
         return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
     
+    @staticmethod
+    async def hash_password_async(password: str) -> str:
+        """Hash a password in the bcrypt worker pool"""
+        return await hash_password_async(password)
+    
+    @staticmethod
+    async def verify_password_async(password: str, hashed_password: str) -> bool:
+        """Verify a password in the bcrypt worker pool"""
+        return await verify_password_async(password, hashed_password)
+    
+    @staticmethod
+    def needs_rehash(hashed_password: str) -> bool:
+        """Whether a hash was made with a different cost than BCRYPT_ROUNDS"""
+        return password_needs_rehash(hashed_password)
+    
     @staticmethod
     def generate_random_token(length: int = 32) -> str:
         """Generate a random token for email verification, password reset, etc."""
@@ -83,7 +102,7 @@ class TokenManager:
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Token has expired"
             )
-        except jwt.JWTError:
+        except jwt.InvalidTokenError:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Could not validate credentials"
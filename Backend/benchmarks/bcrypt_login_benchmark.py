@@ -0,0 +1,100 @@
+"""
+bcrypt_login_benchmark.py
+Measures password verification throughput and its effect on the event loop,
+for each bcrypt cost, comparing verification inline on the event loop (the
+old behaviour) with the bcrypt worker pool in utils/executor_utils.py.
+
+For each cost it reports:
+- single verification latency
+- logins/s for a burst of concurrent logins, and logins/s per core
+- worst event-loop stall seen by a 10 ms ticker during the burst (how long
+  every other request would have been frozen)
+
+Use it to pick BCRYPT_ROUNDS for the login rate a deployment must sustain.
+
+Usage (from the Backend directory):
+    python benchmarks/bcrypt_login_benchmark.py --rounds 10 11 12 --logins 32
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import bcrypt
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.executor_utils import ManagedExecutor  # noqa: E402
+
+PASSWORD = "correct horse battery staple 42"
+
+
+async def watch_loop(stop: asyncio.Event, interval: float = 0.01) -> float:
+    """Return the worst delay beyond `interval` between ticks while running."""
+    worst = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - started - interval)
+    return worst
+
+
+async def run_burst(verify, hashed: bytes, logins: int):
+    stop = asyncio.Event()
+    watcher = asyncio.create_task(watch_loop(stop))
+    await asyncio.sleep(0)
+    started = time.perf_counter()
+    results = await asyncio.gather(*(verify(PASSWORD.encode(), hashed) for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    stall = await watcher
+    assert all(results)
+    return logins / elapsed, stall
+
+
+async def bench_cost(rounds: int, logins: int, workers: int):
+    hashed = bcrypt.hashpw(PASSWORD.encode(), bcrypt.gensalt(rounds=rounds))
+    started = time.perf_counter()
+    bcrypt.checkpw(PASSWORD.encode(), hashed)
+    single_ms = (time.perf_counter() - started) * 1000
+
+    async def inline(password, hashed_password):
+        return bcrypt.checkpw(password, hashed_password)
+
+    pool = ManagedExecutor("bcrypt-bench", "thread", workers, max_queue=logins, timeout=600)
+
+    async def pooled(password, hashed_password):
+        return await pool.run(bcrypt.checkpw, password, hashed_password)
+
+    inline_rate, inline_stall = await run_burst(inline, hashed, logins)
+    pooled_rate, pooled_stall = await run_burst(pooled, hashed, logins)
+    queue_wait = pool.stats()["avg_queue_wait_ms"]
+    pool.shutdown()
+    return single_ms, inline_rate, inline_stall, pooled_rate, pooled_stall, queue_wait
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, nargs="+", default=[10, 11, 12], help="bcrypt costs to test")
+    parser.add_argument("--logins", type=int, default=32, help="Concurrent logins per burst")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="bcrypt pool size")
+    args = parser.parse_args()
+
+    cores = min(args.workers, os.cpu_count() or 1)
+    rows = [(rounds, *asyncio.run(bench_cost(rounds, args.logins, args.workers))) for rounds in args.rounds]
+
+    print()
+    print(f"logins per burst={args.logins} pool workers={args.workers} cores used={cores}")
+    header = (f"{'cost':>4} {'1 verify ms':>11} | {'inline/s':>8} {'loop stall ms':>13} | "
+              f"{'pool/s':>7} {'per core':>8} {'loop stall ms':>13} {'queue wait ms':>13}")
+    print(header)
+    print("-" * len(header))
+    for rounds, single_ms, inline_rate, inline_stall, pooled_rate, pooled_stall, queue_wait in rows:
+        print(f"{rounds:>4} {single_ms:>11.1f} | {inline_rate:>8.1f} {inline_stall * 1000:>13.1f} | "
+              f"{pooled_rate:>7.1f} {pooled_rate / cores:>8.1f} {pooled_stall * 1000:>13.1f} {queue_wait:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+embedding_benchmark.py
+Compares the embedding backends in utils/embedding_utils.py against the
+reference sentence-transformers model.
+
+Measures, per backend:
+- bulk throughput (chunks/sec) for ingestion-style batches
+- query latency (p50/p95) and throughput for concurrent single-query
+  requests, encoded inline vs. through the MicroBatcher
+- cosine agreement with the reference "torch" embeddings
+
+Usage (from the Backend directory):
+    python benchmarks/embedding_benchmark.py --backends torch int8 onnx --concurrency 16
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.embedding_utils import EmbeddingEngine, MicroBatcher  # noqa: E402
+
+SAMPLE_SENTENCES = [
+    "Normalization reduces redundancy in relational database schemas.",
+    "Gradient descent iteratively updates weights to minimise a loss function.",
+    "The ER model describes entities, attributes and relationships.",
+    "Supervised learning trains a model on labelled examples.",
+    "A B-tree keeps keys sorted and allows logarithmic-time lookups.",
+    "Backpropagation computes gradients layer by layer using the chain rule.",
+    "SQL joins combine rows from two or more tables on a related column.",
+    "Convolutional neural networks exploit spatial locality in images.",
+]
+
+
+def make_corpus(n: int, words_per_chunk: int):
+    """Build n synthetic syllabus-like chunks of roughly words_per_chunk words."""
+    rng = np.random.default_rng(0)
+    corpus = []
+    for _ in range(n):
+        parts = []
+        while sum(len(p.split()) for p in parts) < words_per_chunk:
+            parts.append(SAMPLE_SENTENCES[rng.integers(len(SAMPLE_SENTENCES))])
+        corpus.append(" ".join(parts))
+    return corpus
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def bench_bulk(engine, corpus):
+    engine.encode(corpus[:8])  # warm-up
+    start = time.perf_counter()
+    embeddings = engine.encode(corpus)
+    elapsed = time.perf_counter() - start
+    return embeddings, len(corpus) / elapsed
+
+
+def bench_queries(encode_one, queries, concurrency):
+    latencies = []
+
+    def run(query):
+        start = time.perf_counter()
+        encode_one(query)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(run, queries))
+    elapsed = time.perf_counter() - start
+    return {
+        "qps": len(queries) / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--backends", nargs="+", default=["torch", "int8", "onnx"])
+    parser.add_argument("--chunks", type=int, default=512, help="Chunks for the bulk throughput test")
+    parser.add_argument("--words", type=int, default=150, help="Words per chunk")
+    parser.add_argument("--queries", type=int, default=256, help="Queries for the latency test")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.chunks, args.words)
+    queries = [f"What is {s.split()[0].lower()} in {i}?" for i, s in enumerate(make_corpus(args.queries, 8))]
+
+    reference = None
+    rows = []
+    for backend in ["torch"] + [b for b in args.backends if b != "torch"]:
+        try:
+            engine = EmbeddingEngine(args.model, backend)
+        except Exception as e:
+            print(f"[{backend}] skipped: {e}")
+            continue
+
+        embeddings, chunks_per_sec = bench_bulk(engine, corpus)
+        if reference is None:
+            reference = embeddings
+        agreement = float(np.mean(np.sum(embeddings * reference, axis=1)))
+
+        inline = bench_queries(lambda q: engine.encode([q]), queries, args.concurrency)
+        batcher = MicroBatcher(engine.encode, max_wait_ms=args.max_wait_ms)
+        batched = bench_queries(lambda q: batcher.encode([q]), queries, args.concurrency)
+
+        rows.append((backend, chunks_per_sec, agreement, inline, batched, batcher.stats()["avg_batch_size"]))
+
+    print()
+    print(f"model={args.model} chunks={args.chunks}x{args.words}w queries={args.queries} "
+          f"concurrency={args.concurrency} max_wait_ms={args.max_wait_ms}")
+    header = (f"{'backend':<8} {'chunks/s':>9} {'cos vs torch':>12} | "
+              f"{'inline qps':>10} {'p50 ms':>7} {'p95 ms':>7} | "
+              f"{'batched qps':>11} {'p50 ms':>7} {'p95 ms':>7} {'avg batch':>9}")
+    print(header)
+    print("-" * len(header))
+    for backend, cps, agreement, inline, batched, avg_batch in rows:
+        print(f"{backend:<8} {cps:>9.1f} {agreement:>12.4f} | "
+              f"{inline['qps']:>10.1f} {inline['p50_ms']:>7.1f} {inline['p95_ms']:>7.1f} | "
+              f"{batched['qps']:>11.1f} {batched['p50_ms']:>7.1f} {batched['p95_ms']:>7.1f} {avg_batch:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+ocr_preprocess_benchmark.py
+Compares the original fixed OCR preprocessing (full-resolution
+fastNlMeansDenoising + Otsu) against the adaptive pipeline in
+utils/ocr_utils.py.
+
+Measures, per image:
+- preprocessing time for both pipelines and the adaptive per-step timings
+- the adaptive decisions (scale, noise estimate, denoised, binarization)
+- OCR character accuracy for both outputs when Tesseract is installed and
+  ground-truth text is available
+
+Without --images a synthetic set of phone-photo-like syllabus pages is
+generated (12 MP, uneven lighting, sensor noise) with known text. With
+--images, every image in the directory is used; a sibling .txt file with
+the same stem is taken as its ground truth.
+
+Usage (from the Backend directory):
+    python benchmarks/ocr_preprocess_benchmark.py --synthetic 4
+    python benchmarks/ocr_preprocess_benchmark.py --images ./ocr_samples
+"""
+
+import argparse
+import difflib
+import os
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.ocr_utils import PYTESSERACT_AVAILABLE, preprocess_for_ocr, tesseract_best_text  # noqa: E402
+
+SYLLABUS_LINES = [
+    "Unit 1: Introduction to Database Systems",
+    "Data models, schemas and instances",
+    "Unit 2: Entity Relationship Model",
+    "Entities, attributes, keys and relationships",
+    "Unit 3: Relational Algebra and SQL",
+    "Selection, projection, joins and aggregation",
+    "Unit 4: Normalization",
+    "Functional dependencies, 1NF, 2NF, 3NF and BCNF",
+    "Unit 5: Transactions and Concurrency Control",
+    "ACID properties, locking and recovery",
+]
+
+IMAGE_SUFFIXES = {".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp", ".webp"}
+
+
+def legacy_preprocess(image):
+    """The original preprocessing: always denoise at full resolution, then Otsu."""
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    denoised = cv2.fastNlMeansDenoising(gray)
+    _, thresh = cv2.threshold(denoised, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return thresh
+
+
+def synthetic_photo(seed: int, size=(3024, 4032), noise_sigma=6.0):
+    """Render a syllabus page the way a phone would capture it."""
+    rng = np.random.default_rng(seed)
+    width, height = size
+    page = np.full((height, width), 235, np.uint8)
+    lines = [SYLLABUS_LINES[i % len(SYLLABUS_LINES)] for i in range(seed, seed + 24)]
+    for i, line in enumerate(lines):
+        cv2.putText(page, line, (180, 300 + i * 140), cv2.FONT_HERSHEY_SIMPLEX, 2.4, 25, 5, cv2.LINE_AA)
+
+    # Uneven lighting: brighter near a random corner
+    yy, xx = np.mgrid[0:height, 0:width].astype(np.float32)
+    cx, cy = rng.uniform(0, width), rng.uniform(0, height)
+    falloff = 1.0 - 0.45 * np.hypot(xx - cx, yy - cy) / np.hypot(width, height)
+    photo = page.astype(np.float32) * falloff + rng.normal(0, noise_sigma, page.shape)
+    photo = np.clip(photo, 0, 255).astype(np.uint8)
+    return cv2.cvtColor(photo, cv2.COLOR_GRAY2BGR), "\n".join(lines)
+
+
+def load_images(directory: Path):
+    for path in sorted(directory.iterdir()):
+        if path.suffix.lower() not in IMAGE_SUFFIXES:
+            continue
+        image = cv2.imdecode(np.fromfile(str(path), dtype=np.uint8), cv2.IMREAD_COLOR)
+        truth_path = path.with_suffix(".txt")
+        truth = truth_path.read_text(encoding="utf-8") if truth_path.exists() else None
+        yield path.name, image, truth
+
+
+def char_accuracy(text: str, truth: str) -> float:
+    normalize = lambda s: " ".join(s.split()).lower()  # noqa: E731
+    return difflib.SequenceMatcher(None, normalize(text), normalize(truth)).ratio()
+
+
+def ocr_accuracy(image, truth):
+    if truth is None or not PYTESSERACT_AVAILABLE:
+        return None
+    try:
+        best = tesseract_best_text(image)
+    except Exception:
+        return None
+    return char_accuracy(best["text"] if best else "", truth)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=Path, help="Directory of images (optionally with .txt ground truth)")
+    parser.add_argument("--synthetic", type=int, default=4, help="Synthetic photos to generate without --images")
+    parser.add_argument("--noise", type=float, default=6.0, help="Sensor noise sigma for synthetic photos")
+    parser.add_argument("--no-ocr", action="store_true", help="Only time preprocessing")
+    args = parser.parse_args()
+
+    if args.images:
+        samples = list(load_images(args.images))
+    else:
+        samples = [(f"synthetic-{i}", *synthetic_photo(i, noise_sigma=args.noise)) for i in range(args.synthetic)]
+
+    rows = []
+    for name, image, truth in samples:
+        start = time.perf_counter()
+        legacy = legacy_preprocess(image)
+        legacy_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        adaptive, report = preprocess_for_ocr(image)
+        adaptive_ms = (time.perf_counter() - start) * 1000
+
+        legacy_acc = adaptive_acc = None
+        if not args.no_ocr:
+            legacy_acc = ocr_accuracy(legacy, truth)
+            adaptive_acc = ocr_accuracy(adaptive, truth)
+        rows.append((name, image.shape, legacy_ms, adaptive_ms, report, legacy_acc, adaptive_acc))
+
+    fmt_acc = lambda acc: f"{acc:>8.3f}" if acc is not None else f"{'-':>8}"  # noqa: E731
+    header = (f"{'image':<18} {'size':>11} | {'legacy ms':>9} {'adapt ms':>9} {'speedup':>7} | "
+              f"{'scale':>5} {'sigma':>5} {'denoise':>7} {'binarize':>8} | {'acc old':>8} {'acc new':>8}")
+    print(header)
+    print("-" * len(header))
+    for name, shape, legacy_ms, adaptive_ms, report, legacy_acc, adaptive_acc in rows:
+        print(f"{name[:18]:<18} {shape[1]:>5}x{shape[0]:<5} | {legacy_ms:>9.0f} {adaptive_ms:>9.0f} "
+              f"{legacy_ms / adaptive_ms:>6.1f}x | {report['scale']:>5.2f} {report['noise_sigma']:>5.1f} "
+              f"{str(report['denoised']):>7} {report['binarization']:>8} | "
+              f"{fmt_acc(legacy_acc)} {fmt_acc(adaptive_acc)}")
+
+    total_legacy = sum(row[2] for row in rows)
+    total_adaptive = sum(row[3] for row in rows)
+    print(f"\ntotal: legacy {total_legacy:.0f} ms, adaptive {total_adaptive:.0f} ms "
+          f"({total_legacy / total_adaptive:.1f}x faster)")
+
+    steps = {}
+    for row in rows:
+        for step, ms in row[4]["timings_ms"].items():
+            steps[step] = steps.get(step, 0.0) + ms
+    print("adaptive step totals: " + ", ".join(f"{step} {ms:.0f} ms" for step, ms in steps.items()))
+    if not PYTESSERACT_AVAILABLE and not args.no_ocr:
+        print("pytesseract not installed: accuracy columns skipped")
+
+
+if __name__ == "__main__":
+    main()
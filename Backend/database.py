@@ -9,11 +9,20 @@ from pymongo.errors import ConnectionFailure
 import logging
 from typing import Optional
 
+from repositories.memory import InMemoryDatabase
+from utils.state_utils import STATE_BACKEND, is_state_shared
+
 logger = logging.getLogger(__name__)
 
+# Serve from process memory (demo mode) when MongoDB can't be reached at startup
+DATABASE_FALLBACK_TO_MEMORY = os.getenv("DATABASE_FALLBACK_TO_MEMORY", "true").lower() == "true"
+# Chat sessions untouched for this long are removed by a TTL index
+CHAT_SESSION_TTL_DAYS = int(os.getenv("CHAT_SESSION_TTL_DAYS", "30"))
+
 class Database:
     client: Optional[AsyncIOMotorClient] = None
     database = None
+    in_memory: bool = False
 
 # Database instance
 db_instance = Database()
@@ -48,16 +57,46 @@ async def connect_to_mongo():
         
     except ConnectionFailure as e:
         logger.error(f"Failed to connect to MongoDB: {e}")
+        _discard_client()
         raise
     except Exception as e:
         logger.error(f"Unexpected error connecting to MongoDB: {e}")
+        _discard_client()
         raise
 
+def _discard_client():
+    """Drop a client whose connection attempt failed"""
+    if db_instance.client:
+        db_instance.client.close()
+    db_instance.client = None
+    db_instance.database = None
+
+def use_in_memory_database():
+    """Serve all collections from the shared state store (demo mode, see utils/state_utils.py)"""
+    db_instance.database = InMemoryDatabase(os.getenv("DATABASE_NAME", "studymentor"))
+    db_instance.in_memory = True
+    if is_state_shared():
+        logger.warning(f"MongoDB unavailable - using {STATE_BACKEND} state storage (demo mode)")
+    else:
+        logger.warning("MongoDB unavailable - using in-memory storage (demo mode, data is lost on restart "
+                       "and not shared between workers)")
+
+def database_backend() -> str:
+    """Name of the active storage backend, for health checks"""
+    if db_instance.database is None:
+        return "unavailable"
+    if db_instance.in_memory:
+        return f"in-memory ({STATE_BACKEND})"
+    return "mongodb"
+
 async def close_mongo_connection():
     """Close database connection"""
     if db_instance.client:
         db_instance.client.close()
         logger.info("Disconnected from MongoDB")
+    db_instance.client = None
+    db_instance.database = None
+    db_instance.in_memory = False
 
 async def create_indexes():
     """Create database indexes for performance"""
@@ -85,7 +124,8 @@ async def create_indexes():
         await db.quizzes.create_index("status")
         
         # Quiz attempts collection indexes
-        await db.quiz_attempts.create_index([("user_id", 1), ("created_at", -1)])
+        # Includes _id so keyset-paginated history seeks and sorts on the index alone
+        await db.quiz_attempts.create_index([("user_id", 1), ("created_at", -1), ("_id", -1)])
         await db.quiz_attempts.create_index("quiz_id")
         await db.quiz_attempts.create_index([("user_id", 1), ("quiz_id", 1), ("attempt_number", 1)])
         
@@ -93,6 +133,15 @@ async def create_indexes():
         await db.user_progress.create_index([("user_id", 1), ("date", -1)])
         await db.user_progress.create_index([("date", -1)])
         
+        # Topic performance collection indexes
+        await db.topic_performance.create_index("user_id")
+        
+        # Chat sessions expire after a period of inactivity
+        await db.chat_sessions.create_index("updated_at", expireAfterSeconds=CHAT_SESSION_TTL_DAYS * 86400)
+        
+        # Syllabus analyses collection indexes
+        await db.syllabus_analyses.create_index([("processed_at", -1)])
+        
         logger.info("Database indexes created successfully")
         
     except Exception as e:
@@ -101,7 +150,8 @@ async def create_indexes():
 
 def get_database():
     """Get database instance"""
-    if not db_instance.database:
+    # Motor databases don't support truth testing; compare with None
+    if db_instance.database is None:
         raise RuntimeError("Database not initialized. Call connect_to_mongo() first.")
     return db_instance.database
 
@@ -128,4 +178,16 @@ def get_quiz_attempts_collection():
 
 def get_user_progress_collection():
     """Get user progress collection"""
-    return get_database().user_progress
\ No newline at end of file
+    return get_database().user_progress
+
+def get_topic_performance_collection():
+    """Get topic performance collection"""
+    return get_database().topic_performance
+
+def get_chat_sessions_collection():
+    """Get chat sessions collection"""
+    return get_database().chat_sessions
+
+def get_syllabus_analyses_collection():
+    """Get syllabus analyses collection"""
+    return get_database().syllabus_analyses
\ No newline at end of file
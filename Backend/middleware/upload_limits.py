@@ -0,0 +1,71 @@
+"""
+upload_limits.py
+ASGI middleware that rejects oversized request bodies with 413 before they
+are read: up front from Content-Length, and while streaming for chunked
+requests or bodies that run past their declared length.
+"""
+
+from datetime import datetime
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+
+class UploadSizeLimitMiddleware:
+    """Reject request bodies larger than max_body_bytes with 413 Payload Too Large"""
+
+    def __init__(self, app, max_body_bytes: int):
+        self.app = app
+        self.max_body_bytes = max_body_bytes
+
+    def _too_large_response(self) -> JSONResponse:
+        return JSONResponse(
+            status_code=413,
+            content={
+                "success": False,
+                "error": {
+                    "code": "PAYLOAD_TOO_LARGE",
+                    "message": f"Request body exceeds the {self.max_body_bytes / (1024 * 1024):g} MB limit",
+                    "status_code": 413
+                },
+                "timestamp": datetime.utcnow().isoformat() + "Z"
+            }
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        content_length = headers.get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > self.max_body_bytes:
+            # Declared too large: answer without reading a single body byte
+            await self._too_large_response()(scope, receive, send)
+            return
+
+        received = 0
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_bytes:
+                    # Raised inside body parsing; FastAPI passes HTTPExceptions through
+                    raise HTTPException(status_code=413, detail="Request body too large")
+            return message
+
+        async def tracking_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except HTTPException as exc:
+            if exc.status_code != 413 or response_started:
+                raise
+            await self._too_large_response()(scope, receive, send)
@@ -0,0 +1,56 @@
+"""
+progress.py
+Pydantic models for progress dashboard endpoints
+"""
+
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+class TopicProgress(BaseModel):
+    """Quiz accuracy for one topic"""
+    topic: Optional[str]
+    attempts: int
+    questions: int
+    correct: int
+    accuracy_percentage: float
+
+class ProgressDashboardData(BaseModel):
+    """Overall progress for a user"""
+    user_id: str
+    quizzes_attempted: int = 0
+    questions_answered: int = 0
+    correct_answers: int = 0
+    accuracy_percentage: float = Field(0.0, description="Correct answers over questions answered")
+    average_score: float = Field(0.0, description="Mean quiz score percentage")
+    minutes_studied: float = Field(0.0, description="Study plan minutes plus time spent on quizzes")
+    sessions_completed: int = Field(0, description="Study plan days completed")
+    current_study_streak: int = Field(0, description="Consecutive active days up to today or yesterday")
+    longest_study_streak: int = 0
+    last_active_date: Optional[str] = None
+    topics: List[TopicProgress] = Field(default_factory=list, description="Per-topic accuracy, weakest first")
+
+class DailyProgress(BaseModel):
+    """Activity on one day"""
+    date: str
+    quizzes_attempted: int = 0
+    questions_answered: int = 0
+    correct_answers: int = 0
+    average_score: float = 0.0
+    minutes_studied: float = 0.0
+    sessions_completed: int = 0
+    topics_studied: List[str] = Field(default_factory=list)
+
+class DailyProgressData(BaseModel):
+    """Recent daily activity for a user, newest first"""
+    user_id: str
+    days: List[DailyProgress]
+
+class WeakTopic(BaseModel):
+    """A topic ranked by average quiz score"""
+    topic: str
+    average_score: float = Field(..., description="Mean score percentage")
+
+class WeakTopicsData(BaseModel):
+    """A user's weakest topics, weakest first"""
+    user_id: str
+    weak_topics: List[WeakTopic]
@@ -46,6 +46,7 @@ class QuizSubmitRequest(BaseModel):
     quiz_id: str = Field(..., description="Quiz identifier")
     user_id: Optional[str] = Field(None, description="User identifier")
     answers: List[str] = Field(..., description="List of submitted answers")
+    time_taken: Optional[int] = Field(None, ge=0, description="Time taken in seconds")
 
 class QuizResult(BaseModel):
     """Quiz result model"""
@@ -55,4 +56,53 @@ class QuizResult(BaseModel):
     total_questions: int = Field(..., description="Total number of questions")
     percentage: float = Field(..., description="Score percentage")
     correct_answers: List[bool] = Field(..., description="List indicating which answers were correct")
-    time_taken: Optional[int] = Field(None, description="Time taken in seconds")
\ No newline at end of file
+    time_taken: Optional[int] = Field(None, description="Time taken in seconds")
+    attempt_id: Optional[str] = Field(None, description="Stored attempt identifier (when user_id was given)")
+
+class QuizAttemptSummary(BaseModel):
+    """One row of a user's quiz history"""
+    attempt_id: str
+    quiz_id: str
+    topic: Optional[str]
+    score: int = Field(..., description="Number of correct answers")
+    total_questions: int
+    percentage: float
+    created_at: str
+
+class QuizHistoryData(BaseModel):
+    """A page of quiz history, newest first"""
+    user_id: str
+    total_quizzes: Optional[int] = Field(None, description="Total attempts (first page only)")
+    quiz_history: List[QuizAttemptSummary]
+    next_cursor: Optional[str] = Field(None, description="Pass as cursor to get the next page")
+    has_more: bool = False
+class QuizBatchSubmitRequest(BaseModel):
+    """Request model for grading many submissions at once (e.g. a whole class)"""
+    submissions: List[QuizSubmitRequest] = Field(..., min_items=1, max_items=1000, description="Submissions to grade")
+
+class QuizBatchRejection(BaseModel):
+    """A submission that could not be graded"""
+    index: int = Field(..., description="Position in the request's submissions")
+    quiz_id: str
+    detail: str
+
+class QuestionStatistics(BaseModel):
+    """Item analysis for one question across a batch"""
+    question_id: int
+    difficulty_index: float = Field(..., description="Share of submissions answering correctly")
+    discrimination_index: Optional[float] = Field(None, description="Correct share in the top 27% minus the bottom 27% by score")
+
+class QuizBatchStatistics(BaseModel):
+    """Class statistics for one quiz in a batch"""
+    quiz_id: str
+    topic: Optional[str]
+    submissions: int
+    average_percentage: float
+    questions: List[QuestionStatistics]
+
+class QuizBatchResult(BaseModel):
+    """Results of a batch submission"""
+    graded: int
+    results: List[QuizResult] = Field(..., description="Graded submissions, in request order")
+    rejected: List[QuizBatchRejection]
+    statistics: List[QuizBatchStatistics]
@@ -53,6 +53,7 @@ class StudyProgressRequest(BaseModel):
     user_id: str = Field(..., description="User identifier")
     completed_day: str = Field(..., description="Completed day (e.g., 'Day 1')")
     tasks_completed: List[str] = Field(..., description="List of completed tasks")
+    minutes_studied: Optional[int] = Field(None, ge=0, le=1440, description="Minutes studied (defaults to the plan's daily average)")
 
 class StudyProgressData(BaseModel):
     """Study progress response data model"""
@@ -23,6 +23,7 @@ class SyllabusParseRequest(BaseModel):
     """Request model for syllabus parsing from text"""
     text: str = Field(..., min_length=10, description="Syllabus text to parse")
     use_mock: bool = Field(default=False, description="Use mock parsing instead of LLM")
+    syllabus_id: Optional[str] = Field(None, description="Previous syllabus to update; only changed sections are re-parsed")
 
     @validator('text')
     def text_must_not_be_empty(cls, v):
@@ -35,6 +36,18 @@ class SyllabusImageParseRequest(BaseModel):
     ocr_method: OCRMethod = Field(default=OCRMethod.AUTO, description="OCR method to use")
     use_mock: bool = Field(default=False, description="Use mock parsing instead of LLM")
 
+class SyllabusChanges(BaseModel):
+    """Differences from the previous version of a re-parsed syllabus"""
+    added_topics: List[str] = Field(default_factory=list, description="Topics new in this version")
+    removed_topics: List[str] = Field(default_factory=list, description="Topics no longer present")
+    changed_topics: List[str] = Field(default_factory=list, description="Topics whose subtopics changed")
+    sections_total: int = Field(0, description="Sections the syllabus was split into")
+    sections_reparsed: int = Field(0, description="Sections sent to the LLM for this version")
+    sections_unchanged: int = Field(0, description="Sections identical to a section of the previous version")
+    sections_changed: int = Field(0, description="Sections whose heading exists in the previous version but whose content changed")
+    sections_added: int = Field(0, description="Sections new in this version")
+    sections_removed: int = Field(0, description="Sections of the previous version no longer present")
+
 class SyllabusData(BaseModel):
     """Syllabus parsing response data model"""
     syllabus_id: str = Field(..., description="Unique syllabus identifier")
@@ -44,6 +57,14 @@ class SyllabusData(BaseModel):
     total_subjects: int = Field(..., description="Number of subjects found")
     total_topics: int = Field(..., description="Total number of topics found")
     confidence_score: Optional[float] = Field(None, ge=0.0, le=1.0, description="Parsing confidence score")
+    cache_hit: bool = Field(default=False, description="True only when nothing was recomputed: text_cache_hit "
+                                                        "(for uploads) and topics_cache_hit are both true")
+    text_cache_hit: Optional[bool] = Field(None, description="Extracted text reused from a byte-identical earlier upload "
+                                                             "(every image, for image uploads); None for text input")
+    topics_cache_hit: bool = Field(default=False, description="Topics of every section came from the topic cache or "
+                                                              "the previous version, so no LLM call was made")
+    version: int = Field(default=1, description="Incremented on every re-parse of the same syllabus")
+    changes: Optional[SyllabusChanges] = Field(None, description="Differences from the previous version")
 
 class FlashcardRequest(BaseModel):
     """Request model for flashcard generation"""
@@ -0,0 +1 @@
+# Data access layer over the MongoDB collections
\ No newline at end of file
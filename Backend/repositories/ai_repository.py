@@ -0,0 +1,79 @@
+"""
+ai_repository.py
+Study buddy chat sessions and AI syllabus analyses
+"""
+
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from utils.store_utils import get_store
+
+from .base import BaseRepository
+
+# Messages kept per chat session (older ones are dropped as new ones arrive)
+CHAT_HISTORY_MAX_MESSAGES = int(os.getenv("CHAT_HISTORY_MAX_MESSAGES", "50"))
+
+# Analyses don't change once stored and are read by every generate-* call, so they are cached per worker
+ANALYSIS_CACHE = "syllabus_analyses"
+get_store().configure(ANALYSIS_CACHE, max_entries=512, max_bytes=16 * 1024 * 1024, ttl_seconds=3600)
+
+
+class ChatSessionRepository(BaseRepository):
+    """Documents: {_id: session_id, messages: [...], updated_at}"""
+
+    collection_name = "chat_sessions"
+
+    async def get_recent_messages(self, session_id: str, limit: int) -> List[Dict[str, Any]]:
+        """
+        Fetch the last messages of a session.
+
+        Args:
+            session_id: Session ID
+            limit: Number of messages
+
+        Returns:
+            list: Messages, oldest first (empty for a new session)
+        """
+        document = await self.get(session_id, {"messages": {"$slice": -limit}})
+        return document.get("messages", []) if document else []
+
+    async def append_messages(self, session_id: str, messages: List[Dict[str, Any]]):
+        """
+        Append messages to a session (created if new) in one write, awaited so
+        a failure reaches the caller and turns land in order; the history
+        stays capped at CHAT_HISTORY_MAX_MESSAGES.
+        """
+        await self.collection.update_one(
+            {"_id": session_id},
+            {
+                "$push": {"messages": {"$each": messages, "$slice": -CHAT_HISTORY_MAX_MESSAGES}},
+                "$set": {"updated_at": datetime.utcnow()},
+            },
+            upsert=True
+        )
+
+
+class SyllabusAnalysisRepository(BaseRepository):
+    """Documents: {_id: analysis_id, analysis, original_content, file_name, processed_at}"""
+
+    collection_name = "syllabus_analyses"
+
+    async def save(self, document_id: str, document: Dict[str, Any]):
+        await super().save(document_id, document)
+        get_store().set(ANALYSIS_CACHE, document_id, document["analysis"])
+
+    async def get_analysis(self, analysis_id: str) -> Optional[Dict[str, Any]]:
+        """Return the stored analysis (without the original content, cached), or None."""
+        analysis = get_store().get(ANALYSIS_CACHE, analysis_id)
+        if analysis is None:
+            document = await self.get(analysis_id, {"analysis": 1})
+            if document is None:
+                return None
+            analysis = document["analysis"]
+            get_store().set(ANALYSIS_CACHE, analysis_id, analysis)
+        return analysis
+
+
+chat_session_repository = ChatSessionRepository()
+syllabus_analysis_repository = SyllabusAnalysisRepository()
@@ -0,0 +1,182 @@
+"""
+base.py
+Shared pieces of the repository layer: a base class bound to one collection
+and a write batcher that coalesces fire-and-forget writes into bulk_write
+round trips.
+"""
+
+import asyncio
+import logging
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo.errors import BulkWriteError
+
+from database import get_database
+
+logger = logging.getLogger(__name__)
+
+# Buffered writes are flushed when this many are pending...
+WRITE_BATCH_MAX_OPS = int(os.getenv("WRITE_BATCH_MAX_OPS", "100"))
+# ...or after this long, whichever comes first
+WRITE_BATCH_MAX_DELAY_MS = float(os.getenv("WRITE_BATCH_MAX_DELAY_MS", "50"))
+# Flushes an operation is retried in after its batch fails (e.g. the database is briefly unreachable)
+WRITE_BATCH_MAX_RETRIES = int(os.getenv("WRITE_BATCH_MAX_RETRIES", "3"))
+
+
+class WriteBatcher:
+    """
+    Buffers write operations per collection and sends each collection's
+    buffer as one ordered bulk_write. Used for writes the request doesn't
+    need to read back immediately (e.g. last-login times, topic results), so
+    a burst of requests costs one round trip instead of one each. Flushes
+    run one at a time, so a collection's operations are applied in the order
+    they were queued; operations from a failed batch are retried with the
+    next flush, ahead of anything queued since.
+    """
+
+    def __init__(self, max_ops: int = WRITE_BATCH_MAX_OPS, max_delay_ms: float = WRITE_BATCH_MAX_DELAY_MS,
+                 max_retries: int = WRITE_BATCH_MAX_RETRIES):
+        self.max_ops = max_ops
+        self.max_delay = max_delay_ms / 1000.0
+        self.max_retries = max_retries
+        # collection -> [(operation, failed attempts)]
+        self._pending: Dict[str, List[Tuple[Any, int]]] = {}
+        self._pending_count = 0
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._flush_tasks: set = set()
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._stats = {"queued": 0, "flushed": 0, "batches": 0, "retried": 0, "failed": 0}
+
+    def add(self, collection_name: str, operation: Any):
+        """
+        Queue a pymongo write model (InsertOne, UpdateOne, ...) for a collection.
+
+        Args:
+            collection_name: Target collection
+            operation: pymongo write model
+        """
+        self._pending.setdefault(collection_name, []).append((operation, 0))
+        self._pending_count += 1
+        self._stats["queued"] += 1
+        if self._pending_count >= self.max_ops:
+            self._schedule_flush()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(self.max_delay, self._schedule_flush)
+
+    def _schedule_flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        task = asyncio.get_running_loop().create_task(self.flush())
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+
+    def _requeue(self, collection_name: str, entries: List[Tuple[Any, int]], attempted: bool = True):
+        retry = []
+        for operation, attempts in entries:
+            attempts += attempted
+            if attempts > self.max_retries:
+                self._stats["failed"] += 1
+                logger.error(f"Dropping a write to {collection_name} after {attempts} failed attempts: {operation}")
+            else:
+                retry.append((operation, attempts))
+        if retry:
+            self._stats["retried"] += len(retry)
+            # Ahead of operations queued since, so the collection's order is kept
+            self._pending[collection_name] = retry + self._pending.get(collection_name, [])
+            self._pending_count += len(retry)
+
+    async def flush(self):
+        """Write everything pending now (after any flush already in progress)."""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            if self._flush_handle is not None:
+                self._flush_handle.cancel()
+                self._flush_handle = None
+            pending, self._pending, self._pending_count = self._pending, {}, 0
+            if not pending:
+                return
+            database = get_database()
+            for collection_name, entries in pending.items():
+                try:
+                    await database[collection_name].bulk_write([operation for operation, _ in entries], ordered=True)
+                    self._stats["flushed"] += len(entries)
+                    self._stats["batches"] += 1
+                except BulkWriteError as e:
+                    # Ordered: everything before the first error was applied, the failed write itself
+                    # (e.g. a duplicate key) would fail again, and the rest never ran
+                    index = e.details["writeErrors"][0]["index"]
+                    self._stats["flushed"] += index
+                    self._stats["failed"] += 1
+                    logger.error(f"Batched write to {collection_name} failed: {e.details['writeErrors'][0]}")
+                    self._requeue(collection_name, entries[index + 1:], attempted=False)
+                except Exception as e:
+                    logger.error(f"Batched write to {collection_name} failed ({len(entries)} operations): {e}")
+                    self._requeue(collection_name, entries)
+            if self._pending_count and self._flush_handle is None:
+                self._flush_handle = asyncio.get_running_loop().call_later(self.max_delay, self._schedule_flush)
+
+    async def close(self):
+        """Flush pending writes and wait for in-progress flushes, e.g. at shutdown."""
+        if self._flush_tasks:
+            await asyncio.gather(*self._flush_tasks, return_exceptions=True)
+        # Failed batches get their remaining retries now rather than on a timer
+        for _ in range(self.max_retries + 1):
+            await self.flush()
+            if not self._pending_count:
+                break
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+    def stats(self) -> Dict[str, int]:
+        """Return counters for queued, flushed, retried and failed operations."""
+        return dict(self._stats, pending=self._pending_count)
+
+
+_write_batcher = WriteBatcher()
+
+
+def get_write_batcher() -> WriteBatcher:
+    """Get the process-wide write batcher."""
+    return _write_batcher
+
+
+class BaseRepository:
+    """A repository over one collection; documents use string ids as _id."""
+
+    collection_name: str = ""
+
+    @property
+    def collection(self):
+        """The collection on the active backend (MongoDB or in-memory)."""
+        return get_database()[self.collection_name]
+
+    async def get(self, document_id: str, projection: Optional[Dict[str, Any]] = None) -> Optional[Dict]:
+        """
+        Fetch one document by id.
+
+        Args:
+            document_id: Document _id
+            projection: Fields to return (None for the whole document)
+
+        Returns:
+            dict or None if not found
+        """
+        return await self.collection.find_one({"_id": document_id}, projection)
+
+    async def exists(self, document_id: str) -> bool:
+        """Whether a document with this id exists (reads only the _id)."""
+        return await self.collection.find_one({"_id": document_id}, {"_id": 1}) is not None
+
+    async def save(self, document_id: str, document: Dict[str, Any]):
+        """
+        Insert or replace a document.
+
+        Args:
+            document_id: Document _id
+            document: Document fields (without _id)
+        """
+        await self.collection.replace_one({"_id": document_id}, {"_id": document_id, **document}, upsert=True)
@@ -0,0 +1,607 @@
+"""
+memory.py
+In-process stand-in for the Motor database, used in demo mode when MongoDB
+is unreachable. Implements the subset of the async collection API the
+repositories use (equality/comparison filters, $set/$inc/$push/$addToSet updates and
+simple update pipelines, projections, sort/limit and bulk writes). Data
+lives only as long as the process. Each collection is a namespace of the
+shared state store (utils/state_utils.py): with STATE_BACKEND=sqlite or
+redis every worker sees the same data, and writes hold the store's lock so
+read-modify-write updates stay atomic across workers. Those backends block
+on disk or network I/O, so operations on them run in the "state" thread
+pool rather than on the event loop. user_id and email are indexed, so
+lookups by them don't scan the collection; users.email (and any unique
+single-field index created at runtime) is unique, with duplicates raising
+DuplicateKeyError like MongoDB. Like a database, nothing is
+evicted: once a collection reaches IN_MEMORY_DB_MAX_DOCUMENTS or
+IN_MEMORY_DB_MAX_BYTES further inserts (and updates that grow a document
+past the limit) fail with InMemoryStorageFull.
+"""
+
+import copy
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import DeleteOne, InsertOne, ReplaceOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+
+from utils.executor_utils import run_state
+from utils.state_utils import get_shared_store
+from utils.store_utils import BoundedStore
+
+# Limits per collection in demo mode
+IN_MEMORY_DB_MAX_DOCUMENTS = int(os.getenv("IN_MEMORY_DB_MAX_DOCUMENTS", "10000"))
+IN_MEMORY_DB_MAX_BYTES = int(os.getenv("IN_MEMORY_DB_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Fields documents are looked up by (accounts by email, history by user), kept in a per-collection index
+INDEXED_FIELDS = ("user_id", "email")
+# Unique indexes enforced in memory, as created on MongoDB by database.create_indexes
+UNIQUE_FIELDS = {"users": ("email",)}
+# Index key recording that documents stored before the index existed have been indexed
+_INDEX_BUILT = ("", "built")
+
+_MISSING = object()
+
+
+class InMemoryStorageFull(OperationFailure):
+    """Raised when a write would take a demo-mode collection past its limits."""
+
+
+def _get_path(doc: Any, path: str) -> Any:
+    value = doc
+    for part in path.split("."):
+        if isinstance(value, dict) and part in value:
+            value = value[part]
+        else:
+            return _MISSING
+    return value
+
+
+def _set_path(doc: Dict, path: str, value: Any):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.setdefault(part, {})
+    doc[parts[-1]] = value
+
+
+def _unset_path(doc: Dict, path: str):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.get(part)
+        if not isinstance(doc, dict):
+            return
+    doc.pop(parts[-1], None)
+
+
+def _compare(value: Any, operator: str, operand: Any) -> bool:
+    if operator == "$exists":
+        return (value is not _MISSING) == bool(operand)
+    if operator == "$in":
+        return any(_compare(value, "$eq", item) for item in operand)
+    if operator == "$nin":
+        return not any(_compare(value, "$eq", item) for item in operand)
+    if operator == "$ne":
+        return not _compare(value, "$eq", operand)
+    if operator == "$eq":
+        if isinstance(value, list) and not isinstance(operand, list):
+            return operand in value
+        return (None if value is _MISSING else value) == operand
+    if value is _MISSING or value is None:
+        return False
+    try:
+        if operator == "$gt":
+            return value > operand
+        if operator == "$gte":
+            return value >= operand
+        if operator == "$lt":
+            return value < operand
+        if operator == "$lte":
+            return value <= operand
+    except TypeError:
+        return False
+    raise NotImplementedError(f"Query operator {operator} is not supported in memory")
+
+
+def _matches(doc: Dict, query: Optional[Dict]) -> bool:
+    for key, condition in (query or {}).items():
+        if key == "$and":
+            if not all(_matches(doc, sub) for sub in condition):
+                return False
+        elif key == "$or":
+            if not any(_matches(doc, sub) for sub in condition):
+                return False
+        else:
+            value = _get_path(doc, key)
+            if isinstance(condition, dict) and condition and all(op.startswith("$") for op in condition):
+                if not all(_compare(value, op, operand) for op, operand in condition.items()):
+                    return False
+            elif not _compare(value, "$eq", condition):
+                return False
+    return True
+
+
+def _include(source: Any, parts: List[str], target: Dict):
+    head, rest = parts[0], parts[1:]
+    if not isinstance(source, dict) or head not in source:
+        return
+    value = source[head]
+    if not rest:
+        target[head] = copy.deepcopy(value)
+    elif isinstance(value, list):
+        # Mongo applies a sub-path projection to each embedded document
+        items = target.setdefault(head, [{} for _ in value])
+        for item, projected in zip(value, items):
+            _include(item, rest, projected)
+    elif isinstance(value, dict):
+        _include(value, rest, target.setdefault(head, {}))
+
+
+def _project(doc: Dict, projection: Optional[Dict]) -> Dict:
+    if not projection:
+        return copy.deepcopy(doc)
+    fields = {key: value for key, value in projection.items() if key != "_id"}
+    if fields and all(fields.values()):
+        result = {}
+        for path, spec in fields.items():
+            _include(doc, path.split("."), result)
+            if isinstance(spec, dict) and "$slice" in spec:
+                items = _get_path(result, path)
+                if isinstance(items, list):
+                    limit = spec["$slice"]
+                    _set_path(result, path, items[limit:] if limit < 0 else items[:limit])
+        if projection.get("_id", 1) and "_id" in doc:
+            result["_id"] = doc["_id"]
+        return result
+    result = copy.deepcopy(doc)
+    for path, keep in projection.items():
+        if not keep:
+            _unset_path(result, path)
+    return result
+
+
+def _evaluate(expression: Any, doc: Dict) -> Any:
+    """Evaluate the aggregation expressions used in update pipelines."""
+    if isinstance(expression, str) and expression.startswith("$"):
+        value = _get_path(doc, expression[1:])
+        return None if value is _MISSING else value
+    if isinstance(expression, list):
+        return [_evaluate(item, doc) for item in expression]
+    if not (isinstance(expression, dict) and len(expression) == 1 and next(iter(expression)).startswith("$")):
+        if isinstance(expression, dict):
+            return {key: _evaluate(value, doc) for key, value in expression.items()}
+        return expression
+    operator, operand = next(iter(expression.items()))
+    if operator == "$literal":
+        return operand
+    if operator == "$cond":
+        # Only the branch taken is evaluated
+        condition, then, otherwise = operand
+        return _evaluate(then if _evaluate(condition, doc) else otherwise, doc)
+    args = _evaluate(operand if isinstance(operand, list) else [operand], doc)
+    if operator == "$add":
+        return sum(args)
+    if operator == "$multiply":
+        product = 1
+        for arg in args:
+            product *= arg
+        return product
+    if operator == "$ifNull":
+        return next((arg for arg in args[:-1] if arg is not None), args[-1])
+    if operator in ("$gt", "$gte", "$lt", "$lte", "$eq", "$ne"):
+        return _compare(args[0], operator, args[1])
+    raise NotImplementedError(f"Expression operator {operator} is not supported in memory")
+
+
+def _apply_pipeline(doc: Dict, pipeline: List[Dict]):
+    for stage in pipeline:
+        (name, fields), = stage.items()
+        if name not in ("$set", "$addFields"):
+            raise NotImplementedError(f"Pipeline stage {name} is not supported in memory")
+        # Every expression of a stage sees the document as it was before the stage
+        values = {path: _evaluate(expression, doc) for path, expression in fields.items()}
+        for path, value in values.items():
+            _set_path(doc, path, copy.deepcopy(value))
+
+
+def _apply_update(doc: Dict, update: Any, inserting: bool):
+    if isinstance(update, list):
+        _apply_pipeline(doc, update)
+        return
+    for operator, fields in update.items():
+        if operator == "$setOnInsert":
+            if inserting:
+                for path, value in fields.items():
+                    _set_path(doc, path, copy.deepcopy(value))
+        elif operator == "$set":
+            for path, value in fields.items():
+                _set_path(doc, path, copy.deepcopy(value))
+        elif operator == "$unset":
+            for path in fields:
+                _unset_path(doc, path)
+        elif operator == "$inc":
+            for path, amount in fields.items():
+                current = _get_path(doc, path)
+                _set_path(doc, path, (0 if current is _MISSING else current) + amount)
+        elif operator in ("$max", "$min"):
+            for path, value in fields.items():
+                current = _get_path(doc, path)
+                if current is _MISSING or (value > current if operator == "$max" else value < current):
+                    _set_path(doc, path, value)
+        elif operator == "$push":
+            for path, value in fields.items():
+                items = _get_path(doc, path)
+                items = [] if items is _MISSING else list(items)
+                if isinstance(value, dict) and "$each" in value:
+                    items.extend(copy.deepcopy(value["$each"]))
+                    if "$slice" in value:
+                        limit = value["$slice"]
+                        items = items[limit:] if limit < 0 else items[:limit]
+                else:
+                    items.append(copy.deepcopy(value))
+                _set_path(doc, path, items)
+        elif operator == "$addToSet":
+            for path, value in fields.items():
+                items = _get_path(doc, path)
+                items = [] if items is _MISSING else list(items)
+                for item in value["$each"] if isinstance(value, dict) and "$each" in value else [value]:
+                    if item not in items:
+                        items.append(copy.deepcopy(item))
+                _set_path(doc, path, items)
+        else:
+            raise NotImplementedError(f"Update operator {operator} is not supported in memory")
+
+
+def _indexable(value: Any) -> bool:
+    return isinstance(value, (str, int, ObjectId)) and not isinstance(value, bool)
+
+
+def _index_keys(doc: Optional[Dict]) -> List[Tuple[str, Any]]:
+    keys = []
+    for field in INDEXED_FIELDS:
+        value = (doc or {}).get(field)
+        # Equality also matches array elements, so each element is indexed
+        for item in value if isinstance(value, list) else [value]:
+            if _indexable(item) and (field, item) not in keys:
+                keys.append((field, item))
+    return keys
+
+
+def _sort_key(value: Any) -> Tuple:
+    # None/missing sort first, like MongoDB
+    return (0, "") if value is _MISSING or value is None else (1, value)
+
+
+class _Result:
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+
+class InMemoryCursor:
+    """Minimal async cursor: sort, skip, limit, to_list and async iteration."""
+
+    def __init__(self, collection: "InMemoryCollection", filter: Optional[Dict], projection: Optional[Dict]):
+        self._collection = collection
+        self._filter = filter
+        self._projection = projection
+        self._sort: List[Tuple[str, int]] = []
+        self._skip = 0
+        self._limit = 0
+
+    def sort(self, key_or_list, direction: int = 1) -> "InMemoryCursor":
+        self._sort = [(key_or_list, direction)] if isinstance(key_or_list, str) else list(key_or_list)
+        return self
+
+    def skip(self, count: int) -> "InMemoryCursor":
+        self._skip = count
+        return self
+
+    def limit(self, count: int) -> "InMemoryCursor":
+        self._limit = count
+        return self
+
+    async def _results(self) -> List[Dict]:
+        docs = await self._collection._run(False, self._collection._find, self._filter)
+        for key, direction in reversed(self._sort):
+            docs.sort(key=lambda doc: _sort_key(_get_path(doc, key)), reverse=direction < 0)
+        docs = docs[self._skip:]
+        if self._limit:
+            docs = docs[:self._limit]
+        return [_project(doc, self._projection) for doc in docs]
+
+    async def to_list(self, length: Optional[int] = None) -> List[Dict]:
+        results = await self._results()
+        return results[:length] if length else results
+
+    def __aiter__(self):
+        self._iterator = None
+        return self
+
+    async def __anext__(self) -> Dict:
+        if self._iterator is None:
+            self._iterator = iter(await self._results())
+        try:
+            return next(self._iterator)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class InMemoryCollection:
+    """One collection, stored in a bounded store namespace as {_id: document}."""
+
+    def __init__(self, name: str, store: Any):
+        self.name = name
+        self._store = store
+        self._namespace = f"memory_db.{name}"
+        # (field, value) -> _ids of the documents holding it, for INDEXED_FIELDS
+        self._index_namespace = f"memory_db.{name}.index"
+        self._index_ready = False
+        self._unique = list(UNIQUE_FIELDS.get(name, ()))
+        # The shared backends do disk or network I/O, kept off the event loop
+        self._blocking = not isinstance(store, BoundedStore)
+        # The collection copies documents itself; the store holds them as-is and
+        # rejects writes when full rather than evicting stored accounts or history
+        store.configure(self._namespace, max_entries=IN_MEMORY_DB_MAX_DOCUMENTS,
+                        max_bytes=IN_MEMORY_DB_MAX_BYTES, ttl_seconds=None, copy_values=False, evict=False)
+        store.configure(self._index_namespace, max_entries=IN_MEMORY_DB_MAX_DOCUMENTS * len(INDEXED_FIELDS) + 1,
+                        max_bytes=IN_MEMORY_DB_MAX_BYTES, ttl_seconds=None, copy_values=False, evict=False)
+
+    def _call(self, locked: bool, fn, *args) -> Any:
+        if not locked:
+            return fn(*args)
+        with self._store.lock(self._namespace):
+            return fn(*args)
+
+    async def _run(self, locked: bool, fn, *args) -> Any:
+        """Run fn (under the collection's lock if locked), in the "state" pool for a shared backend."""
+        if self._blocking:
+            return await run_state(self._call, locked, fn, *args)
+        return self._call(locked, fn, *args)
+
+    def _full(self) -> "InMemoryStorageFull":
+        return InMemoryStorageFull(
+            f"Demo-mode collection {self.name} is full ({IN_MEMORY_DB_MAX_DOCUMENTS} documents / "
+            f"{IN_MEMORY_DB_MAX_BYTES} bytes); connect MongoDB or raise IN_MEMORY_DB_MAX_DOCUMENTS / "
+            f"IN_MEMORY_DB_MAX_BYTES"
+        )
+
+    def _ensure_index(self):
+        if self._index_ready:
+            return
+        with self._store.lock(self._namespace):
+            if self._store.get(self._index_namespace, _INDEX_BUILT) is None:
+                # Documents stored before the index existed (a persistent STATE_BACKEND)
+                entries: Dict[Tuple[str, Any], List[Any]] = {}
+                for _id, doc in self._store.items(self._namespace):
+                    for key in _index_keys(doc):
+                        entries.setdefault(key, []).append(_id)
+                for key, ids in entries.items():
+                    if not self._store.set(self._index_namespace, key, ids):
+                        raise self._full()
+                self._store.set(self._index_namespace, _INDEX_BUILT, True)
+        self._index_ready = True
+
+    def _index_update(self, key: Tuple[str, Any], _id: Any, add: bool):
+        ids = self._store.get(self._index_namespace, key) or []
+        if add and _id not in ids:
+            # A new list each time: readers may be iterating the stored one
+            if not self._store.set(self._index_namespace, key, ids + [_id]):
+                raise self._full()
+        elif not add and _id in ids:
+            if len(ids) == 1:
+                self._store.delete(self._index_namespace, key)
+            else:
+                self._store.set(self._index_namespace, key, [item for item in ids if item != _id])
+
+    def _find(self, query: Optional[Dict]) -> List[Dict]:
+        if query and set(query) == {"_id"} and not isinstance(query["_id"], dict):
+            doc = self._store.get(self._namespace, query["_id"])
+            return [doc] if doc is not None else []
+        for field in INDEXED_FIELDS:
+            if _indexable((query or {}).get(field)):
+                self._ensure_index()
+                ids = self._store.get(self._index_namespace, (field, query[field])) or []
+                # The index may still list documents being removed; the filter decides
+                docs = (self._store.get(self._namespace, _id) for _id in ids)
+                return [doc for doc in docs if doc is not None and _matches(doc, query)]
+        return [doc for _, doc in self._store.items(self._namespace) if _matches(doc, query)]
+
+    def _check_unique(self, document: Dict, previous: Optional[Dict]):
+        for field in self._unique:
+            value = document.get(field)
+            if value is None or (previous is not None and previous.get(field) == value):
+                continue
+            if any(doc["_id"] != document["_id"] for doc in self._find({field: value})):
+                raise DuplicateKeyError(
+                    f"E11000 duplicate key error collection: {self.name} index: {field}_1 "
+                    f"dup key: {{ {field}: {value!r} }}"
+                )
+
+    def _save(self, document: Dict, previous: Optional[Dict] = None):
+        # Runs under the collection lock, so the check and the write are atomic across workers
+        self._check_unique(document, previous)
+        old_keys, new_keys = _index_keys(previous), _index_keys(document)
+        # Indexed before the document is stored and unindexed after, so a lookup never misses it
+        for key in new_keys:
+            if key not in old_keys:
+                self._index_update(key, document["_id"], add=True)
+        # Re-stored after every change so the store's size accounting stays current
+        if not self._store.set(self._namespace, document["_id"], document):
+            raise self._full()
+        for key in old_keys:
+            if key not in new_keys:
+                self._index_update(key, document["_id"], add=False)
+
+    def _insert(self, document: Dict) -> Any:
+        document = copy.deepcopy(document)
+        document.setdefault("_id", ObjectId())
+        if self._store.get(self._namespace, document["_id"]) is not None:
+            raise DuplicateKeyError(
+                f"E11000 duplicate key error collection: {self.name} index: _id_ dup key: {{ _id: {document['_id']!r} }}"
+            )
+        self._save(document)
+        return document["_id"]
+
+    def _update(self, query: Dict, update: Dict, upsert: bool, many: bool) -> _Result:
+        matches = self._find(query)
+        if not many:
+            matches = matches[:1]
+        for doc in matches:
+            # Updated on a copy, so a rejected save leaves the stored document as it was
+            updated = copy.deepcopy(doc)
+            _apply_update(updated, update, inserting=False)
+            self._save(updated, previous=doc)
+        upserted_id = None
+        if not matches and upsert:
+            doc = {key: value for key, value in query.items()
+                   if not key.startswith("$") and not isinstance(value, dict)}
+            _apply_update(doc, update, inserting=True)
+            upserted_id = self._insert(doc)
+        return _Result(matched_count=len(matches), modified_count=len(matches), upserted_id=upserted_id)
+
+    def _replace(self, query: Dict, replacement: Dict, upsert: bool) -> _Result:
+        matches = self._find(query)[:1]
+        upserted_id = None
+        if matches:
+            replacement = copy.deepcopy(replacement)
+            replacement["_id"] = matches[0]["_id"]
+            self._save(replacement, previous=matches[0])
+        elif upsert:
+            replacement = dict(replacement)
+            if "_id" in query and not isinstance(query["_id"], dict):
+                replacement.setdefault("_id", query["_id"])
+            upserted_id = self._insert(replacement)
+        return _Result(matched_count=len(matches), modified_count=len(matches), upserted_id=upserted_id)
+
+    def _delete(self, query: Dict, many: bool) -> int:
+        matches = self._find(query)
+        if not many:
+            matches = matches[:1]
+        for doc in matches:
+            self._store.delete(self._namespace, doc["_id"])
+            for key in _index_keys(doc):
+                self._index_update(key, doc["_id"], add=False)
+        return len(matches)
+
+    async def find_one(self, filter: Optional[Dict] = None, projection: Optional[Dict] = None,
+                       sort: Optional[List[Tuple[str, int]]] = None) -> Optional[Dict]:
+        cursor = self.find(filter, projection)
+        if sort:
+            cursor.sort(sort)
+        results = await cursor.limit(1).to_list()
+        return results[0] if results else None
+
+    def find(self, filter: Optional[Dict] = None, projection: Optional[Dict] = None) -> InMemoryCursor:
+        return InMemoryCursor(self, filter, projection)
+
+    async def count_documents(self, filter: Optional[Dict] = None) -> int:
+        return len(await self._run(False, self._find, filter))
+
+    async def insert_one(self, document: Dict) -> _Result:
+        return _Result(inserted_id=await self._run(True, self._insert, document))
+
+    async def insert_many(self, documents: List[Dict], ordered: bool = True) -> _Result:
+        return _Result(inserted_ids=await self._run(True, self._insert_many, documents))
+
+    def _insert_many(self, documents: List[Dict]) -> List[Any]:
+        return [self._insert(document) for document in documents]
+
+    async def update_one(self, filter: Dict, update: Dict, upsert: bool = False) -> _Result:
+        return await self._run(True, self._update, filter, update, upsert, False)
+
+    async def find_one_and_update(self, filter: Dict, update: Dict, projection: Optional[Dict] = None,
+                                  upsert: bool = False,
+                                  return_document: bool = ReturnDocument.BEFORE) -> Optional[Dict]:
+        return await self._run(True, self._find_one_and_update, filter, update, projection, upsert, return_document)
+
+    def _find_one_and_update(self, filter: Dict, update: Dict, projection: Optional[Dict], upsert: bool,
+                             return_document: bool) -> Optional[Dict]:
+        matches = self._find(filter)[:1]
+        if matches:
+            before, after = matches[0], copy.deepcopy(matches[0])
+            _apply_update(after, update, inserting=False)
+            self._save(after, previous=before)
+            return _project(after if return_document == ReturnDocument.AFTER else before, projection)
+        if not upsert:
+            return None
+        upserted_id = self._update(filter, update, upsert=True, many=False).upserted_id
+        if return_document != ReturnDocument.AFTER:
+            return None
+        return _project(self._store.get(self._namespace, upserted_id), projection)
+
+    async def update_many(self, filter: Dict, update: Dict, upsert: bool = False) -> _Result:
+        return await self._run(True, self._update, filter, update, upsert, True)
+
+    async def replace_one(self, filter: Dict, replacement: Dict, upsert: bool = False) -> _Result:
+        return await self._run(True, self._replace, filter, replacement, upsert)
+
+    async def delete_one(self, filter: Dict) -> _Result:
+        return _Result(deleted_count=await self._run(True, self._delete, filter, False))
+
+    async def delete_many(self, filter: Dict) -> _Result:
+        return _Result(deleted_count=await self._run(True, self._delete, filter, True))
+
+    async def bulk_write(self, requests: List, ordered: bool = True) -> _Result:
+        return await self._run(True, self._bulk_write, requests)
+
+    def _bulk_write(self, requests: List) -> _Result:
+        inserted = matched = deleted = 0
+        upserted_ids = {}
+        for index, request in enumerate(requests):
+            try:
+                counts = self._bulk_write_one(request)
+            except DuplicateKeyError as e:
+                # Like an ordered bulk_write: earlier writes stay applied, later ones don't run
+                raise BulkWriteError({
+                    "writeErrors": [{"index": index, "code": 11000, "errmsg": str(e), "op": request}],
+                    "nInserted": inserted, "nMatched": matched, "nModified": matched,
+                    "nUpserted": len(upserted_ids), "nRemoved": deleted,
+                    "upserted": [{"index": i, "_id": _id} for i, _id in upserted_ids.items()],
+                })
+            inserted += counts[0]
+            matched += counts[1]
+            deleted += counts[2]
+            if counts[3] is not None:
+                upserted_ids[index] = counts[3]
+        return _Result(inserted_count=inserted, matched_count=matched, modified_count=matched,
+                       upserted_count=len(upserted_ids), upserted_ids=upserted_ids, deleted_count=deleted)
+
+    def _bulk_write_one(self, request: Any) -> Tuple[int, int, int, Any]:
+        """Apply one write model; returns (inserted, matched, deleted, upserted _id)."""
+        if isinstance(request, InsertOne):
+            self._insert(request._doc)
+            return 1, 0, 0, None
+        if isinstance(request, UpdateOne):
+            result = self._update(request._filter, request._doc, request._upsert, many=False)
+            return 0, result.matched_count, 0, result.upserted_id
+        if isinstance(request, ReplaceOne):
+            result = self._replace(request._filter, request._doc, request._upsert)
+            return 0, result.matched_count, 0, result.upserted_id
+        if isinstance(request, DeleteOne):
+            return 0, 0, self._delete(request._filter, many=False), None
+        raise NotImplementedError(f"{type(request).__name__} is not supported in memory")
+
+    async def create_index(self, keys, unique: bool = False, **kwargs) -> str:
+        # Only unique single-field indexes apply in memory (user_id and email are always indexed)
+        if unique and isinstance(keys, str) and keys not in self._unique:
+            self._unique.append(keys)
+        return keys if isinstance(keys, str) else "_".join(f"{key}_{direction}" for key, direction in keys)
+
+
+class InMemoryDatabase:
+    """Collections created on first access, like a Motor database."""
+
+    def __init__(self, name: str = "studymentor", store: Optional[Any] = None):
+        self.name = name
+        self._store = store or get_shared_store()
+        self._collections: Dict[str, InMemoryCollection] = {}
+
+    def __getattr__(self, name: str) -> InMemoryCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def __getitem__(self, name: str) -> InMemoryCollection:
+        if name not in self._collections:
+            self._collections[name] = InMemoryCollection(name, self._store)
+        return self._collections[name]
@@ -0,0 +1,357 @@
+"""
+progress_repository.py
+Per-user progress rollups, maintained incrementally as activity comes in.
+Each user has one "overall" document and one document per active (UTC) day.
+Quiz submissions and study plan progress apply atomic $inc/$set updates to
+both, so the dashboard reads a single document instead of aggregating
+quiz_attempts. rebuild_from_attempts recomputes the quiz-derived fields
+from the raw attempts (see scripts/rebuild_user_progress.py).
+"""
+
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from .base import BaseRepository
+from .quiz_attempt_repository import quiz_attempt_repository
+
+logger = logging.getLogger(__name__)
+
+# Quiz-derived counters, zeroed on the daily documents before a rebuild
+DAILY_QUIZ_FIELDS = ("quizzes_attempted", "questions_answered", "correct_answers", "score_total", "quiz_seconds")
+
+
+def topic_key(name: Optional[str]) -> str:
+    """
+    Encode a topic or plan name for use as a field name. MongoDB field
+    paths can't contain "." or start with "$", so those (and "%", the
+    escape character) are percent-encoded; the original name is stored
+    alongside the counters.
+
+    Args:
+        name: Topic name
+
+    Returns:
+        str: Safe field name
+    """
+    name = (name or "").strip() or "untitled"
+    return name.replace("%", "%25").replace(".", "%2E").replace("$", "%24").replace("\x00", "%00")
+
+
+def _day(moment: datetime) -> datetime:
+    return datetime(moment.year, moment.month, moment.day)
+
+
+def _daily_id(user_id: str, day: datetime) -> str:
+    return f"{user_id}:{day.date().isoformat()}"
+
+
+def _overall_id(user_id: str) -> str:
+    return f"{user_id}:overall"
+
+
+def _streaks(days: List[datetime]) -> Dict[str, Any]:
+    """Current (ending on the last active day) and longest run of consecutive days."""
+    current = longest = 0
+    previous = None
+    for day in sorted(days):
+        current = current + 1 if previous is not None and day - previous == timedelta(days=1) else 1
+        longest = max(longest, current)
+        previous = day
+    return {"current_study_streak": current, "longest_study_streak": longest, "last_active_date": previous}
+
+
+class ProgressRepository(BaseRepository):
+    """
+    Documents:
+        daily:   {_id: "<user_id>:<YYYY-MM-DD>", scope: "daily", user_id, date,
+                  daily_stats: {quizzes_attempted, questions_answered, correct_answers,
+                  score_total, quiz_seconds, study_minutes, sessions_completed,
+                  topics: {<key>: {name, questions, correct}}}, created_at, updated_at}
+        overall: {_id: "<user_id>:overall", scope: "overall", user_id, date: None,
+                  totals: {...same counters...}, topics: {<key>: {name, attempts, questions, correct}},
+                  plans: {<key>: {days_completed, total_days, completed_days: [day numbers]}},
+                  streaks: {current_study_streak, longest_study_streak, last_active_date},
+                  created_at, updated_at}
+    """
+
+    collection_name = "user_progress"
+
+    async def _apply(self, activities: List[Tuple[str, datetime, Dict[str, Dict], Dict[str, Dict]]]):
+        """
+        Apply activities' updates to their day's and their user's overall
+        document in one bulk write, extending streaks on new days.
+
+        Args:
+            activities: (user_id, at, daily update, overall update) per activity
+        """
+        operations = []
+        for user_id, at, daily, overall in activities:
+            day = _day(at)
+            operations.append(UpdateOne({"_id": _daily_id(user_id, day)}, {
+                **daily,
+                "$set": {**daily.get("$set", {}), "updated_at": at},
+                "$setOnInsert": {"user_id": user_id, "scope": "daily", "date": day, "created_at": at},
+            }, upsert=True))
+            operations.append(UpdateOne({"_id": _overall_id(user_id)}, {
+                **overall,
+                "$set": {**overall.get("$set", {}), "updated_at": at},
+                "$setOnInsert": {"user_id": user_id, "scope": "overall", "date": None, "created_at": at},
+            }, upsert=True))
+        result = await self.collection.bulk_write(operations)
+        # Only the first activity of a day creates its document, so the streak moves once per day
+        for index, (user_id, at, _, _) in enumerate(activities):
+            if 2 * index in result.upserted_ids:
+                await self._extend_streak(user_id, _day(at))
+
+    async def _extend_streak(self, user_id: str, day: datetime):
+        overall_id = _overall_id(user_id)
+        yesterday = day - timedelta(days=1)
+        document = await self.collection.find_one_and_update(
+            {"_id": overall_id, "streaks.last_active_date": yesterday},
+            {"$inc": {"streaks.current_study_streak": 1}, "$set": {"streaks.last_active_date": day}},
+            projection={"streaks.current_study_streak": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if document is not None:
+            current = document["streaks"]["current_study_streak"]
+        else:
+            # Not active yesterday (or never): a new streak starts today
+            current = 1
+            await self.collection.update_one(
+                {"_id": overall_id, "streaks.last_active_date": {"$nin": [yesterday, day]}},
+                {"$set": {"streaks.current_study_streak": 1, "streaks.last_active_date": day}}
+            )
+        await self.collection.update_one(
+            {"_id": overall_id}, {"$max": {"streaks.longest_study_streak": current}}
+        )
+
+    @staticmethod
+    def _quiz_updates(topic: Optional[str], correct: int, total: int, seconds: int) -> Tuple[Dict, Dict]:
+        key = topic_key(topic)
+        counters = {
+            "quizzes_attempted": 1,
+            "questions_answered": total,
+            "correct_answers": correct,
+            "score_total": (correct / total) * 100 if total else 0.0,
+            "quiz_seconds": seconds,
+        }
+        daily = {
+            "$inc": {
+                **{f"daily_stats.{field}": amount for field, amount in counters.items()},
+                f"daily_stats.topics.{key}.questions": total,
+                f"daily_stats.topics.{key}.correct": correct,
+            },
+            "$set": {f"daily_stats.topics.{key}.name": topic},
+        }
+        overall = {
+            "$inc": {
+                **{f"totals.{field}": amount for field, amount in counters.items()},
+                f"topics.{key}.attempts": 1,
+                f"topics.{key}.questions": total,
+                f"topics.{key}.correct": correct,
+            },
+            "$set": {f"topics.{key}.name": topic},
+        }
+        return daily, overall
+
+    async def record_quiz_attempt(self, user_id: str, topic: Optional[str], correct: int, total: int,
+                                  seconds: int = 0, at: Optional[datetime] = None):
+        """
+        Add a graded quiz attempt to the user's rollups.
+
+        Args:
+            user_id: User identifier
+            topic: Quiz topic
+            correct: Correct answers
+            total: Questions in the quiz
+            seconds: Time taken
+            at: Submission time (defaults to now)
+        """
+        await self._apply([(user_id, at or datetime.utcnow(), *self._quiz_updates(topic, correct, total, seconds))])
+
+    async def record_quiz_attempts(self, attempts: List[Dict[str, Any]]):
+        """
+        Add many graded attempts (quiz_attempts documents) to their users'
+        rollups with one bulk write.
+
+        Args:
+            attempts: Attempt documents with user_id, topic, results and created_at
+        """
+        if not attempts:
+            return
+        await self._apply([
+            (
+                attempt["user_id"], attempt["created_at"],
+                *self._quiz_updates(
+                    attempt.get("topic"), attempt["results"]["correct_answers"],
+                    attempt["results"]["total_questions"], attempt["results"].get("time_taken_seconds", 0)
+                )
+            )
+            for attempt in attempts
+        ])
+
+    async def record_study_day(self, user_id: str, plan_id: str, day_number: int, total_days: Optional[int],
+                               minutes: int = 0, at: Optional[datetime] = None) -> bool:
+        """
+        Add a completed study plan day to the user's rollups. Each plan day
+        counts once, so a retried or repeated request changes nothing.
+
+        Args:
+            user_id: User identifier
+            plan_id: Study plan ID
+            day_number: Plan day that was completed
+            total_days: Plan length
+            minutes: Minutes studied
+            at: Completion time (defaults to now)
+
+        Returns:
+            bool: False if the day had already been recorded
+        """
+        key = topic_key(plan_id)
+        at = at or datetime.utcnow()
+        # Claim the day first: only the request that adds it to the set goes on to count it
+        try:
+            claimed = await self.collection.update_one(
+                {"_id": _overall_id(user_id), f"plans.{key}.completed_days": {"$ne": day_number}},
+                {
+                    "$addToSet": {f"plans.{key}.completed_days": day_number},
+                    "$setOnInsert": {"user_id": user_id, "scope": "overall", "date": None, "created_at": at},
+                },
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # The document exists and already lists the day, so the upsert tried to create it again
+            return False
+        if not claimed.matched_count and claimed.upserted_id is None:
+            return False
+        await self._apply([(
+            user_id, at,
+            {"$inc": {"daily_stats.sessions_completed": 1, "daily_stats.study_minutes": minutes}},
+            {
+                "$inc": {"totals.sessions_completed": 1, "totals.study_minutes": minutes},
+                "$max": {f"plans.{key}.days_completed": day_number},
+                "$set": {f"plans.{key}.total_days": total_days},
+            }
+        )])
+        return True
+
+    async def get_overall(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Return the user's overall rollup (one _id lookup), or None if they have no activity."""
+        return await self.get(_overall_id(user_id))
+
+    async def get_daily(self, user_id: str, days: int, today: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """
+        Return the user's daily rollups for the last `days` days, newest
+        first (one range scan on the user_id/date index).
+
+        Args:
+            user_id: User identifier
+            days: Number of days including today
+            today: Reference day (defaults to today, UTC)
+
+        Returns:
+            list: Daily documents for the days with activity
+        """
+        since = _day(today or datetime.utcnow()) - timedelta(days=days - 1)
+        return await self.collection.find(
+            {"user_id": user_id, "date": {"$gte": since}}
+        ).sort("date", -1).to_list(length=days)
+
+    async def rebuild_from_attempts(self, user_id: Optional[str] = None) -> int:
+        """
+        Recompute the quiz-derived rollup fields (counters, topics, streaks)
+        from quiz_attempts, for one user or every user. Study plan minutes
+        and sessions aren't recorded anywhere else, so they are kept.
+
+        Args:
+            user_id: Only rebuild this user (default: all users with attempts)
+
+        Returns:
+            int: Number of users rebuilt
+        """
+        # Attempts arrive grouped by user; one user's attempts are held at a time
+        current_user, rows, rebuilt = None, [], 0
+        async for attempt in quiz_attempt_repository.iter_by_user(user_id):
+            if attempt["user_id"] != current_user and rows:
+                await self._rebuild_user(current_user, rows)
+                rebuilt += 1
+                rows = []
+            current_user = attempt["user_id"]
+            rows.append(attempt)
+        if rows:
+            await self._rebuild_user(current_user, rows)
+            rebuilt += 1
+        return rebuilt
+
+    async def _rebuild_user(self, user_id: str, attempts: List[Dict[str, Any]]):
+        now = datetime.utcnow()
+        daily: Dict[datetime, Dict[str, Any]] = {}
+        totals = dict.fromkeys(DAILY_QUIZ_FIELDS, 0)
+        topics: Dict[str, Dict[str, Any]] = {}
+        for attempt in attempts:
+            results = attempt.get("results", {})
+            total = results.get("total_questions", 0)
+            correct = results.get("correct_answers", 0)
+            counters = {
+                "quizzes_attempted": 1,
+                "questions_answered": total,
+                "correct_answers": correct,
+                "score_total": results.get("score_percentage", 0.0),
+                "quiz_seconds": results.get("time_taken_seconds", 0),
+            }
+            key = topic_key(attempt.get("topic"))
+            day = daily.setdefault(_day(attempt["created_at"]), {**dict.fromkeys(DAILY_QUIZ_FIELDS, 0), "topics": {}})
+            day_topic = day["topics"].setdefault(key, {"name": attempt.get("topic"), "questions": 0, "correct": 0})
+            topic = topics.setdefault(key, {"name": attempt.get("topic"), "attempts": 0, "questions": 0, "correct": 0})
+            for field, amount in counters.items():
+                day[field] += amount
+                totals[field] += amount
+            day_topic["questions"] += total
+            day_topic["correct"] += correct
+            topic["attempts"] += 1
+            topic["questions"] += total
+            topic["correct"] += correct
+
+        await self.collection.update_many(
+            {"user_id": user_id, "scope": "daily"},
+            {"$set": {f"daily_stats.{field}": 0 for field in DAILY_QUIZ_FIELDS},
+             "$unset": {"daily_stats.topics": ""}}
+        )
+        operations = [
+            UpdateOne(
+                {"_id": _daily_id(user_id, day)},
+                {
+                    "$set": {**{f"daily_stats.{field}": value for field, value in stats.items()}, "updated_at": now},
+                    "$setOnInsert": {"user_id": user_id, "scope": "daily", "date": day, "created_at": now},
+                },
+                upsert=True
+            )
+            for day, stats in daily.items()
+        ]
+        await self.collection.bulk_write(operations, ordered=False)
+
+        # Streaks count every active day, including days with only study plan activity
+        active_days = await self.collection.find(
+            {"user_id": user_id, "scope": "daily"}, {"date": 1}
+        ).to_list(length=None)
+        await self.collection.update_one(
+            {"_id": _overall_id(user_id)},
+            {
+                "$set": {
+                    **{f"totals.{field}": value for field, value in totals.items()},
+                    "topics": topics,
+                    "streaks": _streaks([document["date"] for document in active_days]),
+                    "updated_at": now,
+                },
+                "$setOnInsert": {"user_id": user_id, "scope": "overall", "date": None, "created_at": now},
+            },
+            upsert=True
+        )
+        logger.info(f"Rebuilt progress for user {user_id} from {len(attempts)} attempts")
+
+
+progress_repository = ProgressRepository()
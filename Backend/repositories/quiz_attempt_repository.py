@@ -0,0 +1,145 @@
+"""
+quiz_attempt_repository.py
+Submitted quiz attempts, read back as keyset-paginated history
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+from .base import BaseRepository
+
+# History rows don't need the per-question answers
+HISTORY_PROJECTION = {"quiz_id": 1, "topic": 1, "results": 1, "created_at": 1}
+# Newest first; _id breaks ties between attempts created in the same millisecond
+HISTORY_SORT = [("created_at", -1), ("_id", -1)]
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a history cursor can't be decoded."""
+
+
+def encode_cursor(created_at: datetime, attempt_id: ObjectId) -> str:
+    """
+    Encode the sort key of the last row of a page as an opaque cursor.
+
+    Args:
+        created_at: Attempt creation time
+        attempt_id: Attempt _id
+
+    Returns:
+        str: URL-safe cursor
+    """
+    raw = json.dumps({"t": created_at.isoformat(), "id": str(attempt_id)})
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    """
+    Decode a cursor from encode_cursor.
+
+    Returns:
+        (created_at, attempt_id)
+
+    Raises:
+        InvalidCursorError: If the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        return datetime.fromisoformat(data["t"]), ObjectId(data["id"])
+    except (ValueError, KeyError, TypeError, InvalidId) as e:
+        raise InvalidCursorError(f"Invalid cursor: {e}")
+
+
+class QuizAttemptRepository(BaseRepository):
+    """
+    Documents: {_id: ObjectId, user_id, quiz_id, topic, answers: [...],
+    results: {total_questions, correct_answers, score_percentage}, status, created_at}
+    """
+
+    collection_name = "quiz_attempts"
+
+    async def insert(self, attempt: Dict[str, Any]) -> ObjectId:
+        """
+        Store one attempt.
+
+        Returns:
+            ObjectId: The attempt id
+        """
+        result = await self.collection.insert_one(attempt)
+        return result.inserted_id
+
+    async def insert_many(self, attempts: List[Dict[str, Any]]) -> List[ObjectId]:
+        """
+        Store many attempts in one round trip.
+
+        Returns:
+            list: Attempt ids in input order
+        """
+        if not attempts:
+            return []
+        result = await self.collection.insert_many(attempts, ordered=False)
+        return list(result.inserted_ids)
+
+    async def list_for_user(self, user_id: str, limit: int = 20,
+                            cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        One page of a user's attempts, newest first. Seeks past the cursor on
+        the (user_id, created_at, _id) index instead of skipping, so every
+        page costs the same however deep it is.
+
+        Args:
+            user_id: User identifier
+            limit: Page size
+            cursor: Cursor returned with the previous page (None for the first page)
+
+        Returns:
+            (attempts, next_cursor) where next_cursor is None on the last page
+
+        Raises:
+            InvalidCursorError: If the cursor is malformed
+        """
+        query: Dict[str, Any] = {"user_id": user_id}
+        if cursor:
+            created_at, attempt_id = decode_cursor(cursor)
+            query["$or"] = [
+                {"created_at": {"$lt": created_at}},
+                {"created_at": created_at, "_id": {"$lt": attempt_id}},
+            ]
+        # One extra row tells whether another page exists
+        rows = await self.collection.find(query, HISTORY_PROJECTION).sort(HISTORY_SORT).limit(limit + 1).to_list(
+            length=limit + 1
+        )
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["_id"])
+        return rows, next_cursor
+
+    def iter_by_user(self, user_id: Optional[str] = None):
+        """
+        Iterate over attempts (summary fields only) grouped by user, newest
+        first within a user, walking the (user_id, created_at, _id) index.
+
+        Args:
+            user_id: Only this user's attempts (default: every user's)
+
+        Returns:
+            Async cursor of attempt documents
+        """
+        query = {"user_id": user_id} if user_id else {"user_id": {"$ne": None}}
+        return self.collection.find(query, {"user_id": 1, **HISTORY_PROJECTION}).sort(
+            [("user_id", 1), *HISTORY_SORT]
+        )
+
+    async def count_for_user(self, user_id: str) -> int:
+        """Number of attempts by a user (counted on the user_id index prefix)."""
+        return await self.collection.count_documents({"user_id": user_id})
+
+
+quiz_attempt_repository = QuizAttemptRepository()
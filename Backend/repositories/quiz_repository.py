@@ -0,0 +1,46 @@
+"""
+quiz_repository.py
+Generated quizzes, kept so submissions can be graded
+"""
+
+from typing import Any, Dict, Optional
+
+from utils.store_utils import get_store
+
+from .base import BaseRepository
+
+# Quizzes don't change once generated, so answer keys are cached per worker
+ANSWER_KEY_CACHE = "quiz_answer_keys"
+get_store().configure(ANSWER_KEY_CACHE, max_entries=2048, max_bytes=8 * 1024 * 1024, ttl_seconds=2 * 3600)
+
+
+class QuizRepository(BaseRepository):
+    """Documents: {_id: quiz_id, quiz_data, topic, created_at}"""
+
+    collection_name = "quizzes"
+
+    async def save(self, document_id: str, document: Dict[str, Any]):
+        await super().save(document_id, document)
+        get_store().set(ANSWER_KEY_CACHE, document_id, {
+            "topic": document["topic"],
+            "quiz_data": {"questions": [
+                {"correct_answer": question["correct_answer"]} for question in document["quiz_data"]["questions"]
+            ]},
+        })
+
+    async def get_answer_key(self, quiz_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Fetch only what grading needs (cached).
+
+        Returns:
+            {"topic", "quiz_data": {"questions": [{"correct_answer"}, ...]}} or None
+        """
+        answer_key = get_store().get(ANSWER_KEY_CACHE, quiz_id)
+        if answer_key is None:
+            answer_key = await self.get(quiz_id, {"topic": 1, "quiz_data.questions.correct_answer": 1})
+            if answer_key is not None:
+                get_store().set(ANSWER_KEY_CACHE, quiz_id, answer_key)
+        return answer_key
+
+
+quiz_repository = QuizRepository()
@@ -0,0 +1,45 @@
+"""
+study_plan_repository.py
+Generated study plans
+"""
+
+from typing import Any, Dict, Optional
+
+from .base import BaseRepository
+
+
+class StudyPlanRepository(BaseRepository):
+    """Documents: {_id: plan_id, plan_data, original_request, created_at}"""
+
+    collection_name = "study_plans"
+
+    async def get_plan_data(self, plan_id: str) -> Optional[Dict[str, Any]]:
+        """Return the stored StudyPlanData dict, or None if not found."""
+        document = await self.get(plan_id, {"plan_data": 1})
+        return document["plan_data"] if document else None
+
+    async def get_day(self, plan_id: str, day: str) -> Optional[Dict[str, Any]]:
+        """
+        Fetch the plan length and hours and one day's tasks, not the whole plan.
+
+        Args:
+            plan_id: Plan ID
+            day: Day key, e.g. "Day 3"
+
+        Returns:
+            {"total_days", "total_hours", "tasks"} (tasks None if the plan has no such day) or None
+        """
+        document = await self.get(plan_id, {
+            "plan_data.total_days": 1, "plan_data.total_hours": 1, f"plan_data.daily_plans.{day}": 1
+        })
+        if document is None:
+            return None
+        plan_data = document.get("plan_data", {})
+        return {
+            "total_days": plan_data.get("total_days"),
+            "total_hours": plan_data.get("total_hours"),
+            "tasks": plan_data.get("daily_plans", {}).get(day),
+        }
+
+
+study_plan_repository = StudyPlanRepository()
@@ -0,0 +1,35 @@
+"""
+syllabus_repository.py
+Parsed syllabi, stored with their section fingerprints for incremental re-parsing
+"""
+
+from typing import Any, Dict, Optional
+
+from .base import BaseRepository
+
+# What a re-parse needs from the previous version (not the raw text)
+REPARSE_PROJECTION = {
+    "syllabus_data.syllabus_id": 1,
+    "syllabus_data.version": 1,
+    "syllabus_data.structured_topics": 1,
+    "sections": 1,
+    "created_at": 1,
+}
+
+
+class SyllabusRepository(BaseRepository):
+    """Documents: {_id: syllabus_id, syllabus_data, sections, created_at, updated_at}"""
+
+    collection_name = "syllabi"
+
+    async def get_syllabus_data(self, syllabus_id: str) -> Optional[Dict[str, Any]]:
+        """Return the stored SyllabusData dict, or None if not found."""
+        document = await self.get(syllabus_id, {"syllabus_data": 1})
+        return document["syllabus_data"] if document else None
+
+    async def get_for_reparse(self, syllabus_id: str) -> Optional[Dict[str, Any]]:
+        """Return the previous version's topics, version and section fingerprints."""
+        return await self.get(syllabus_id, REPARSE_PROJECTION)
+
+
+syllabus_repository = SyllabusRepository()
@@ -0,0 +1,59 @@
+"""
+topic_performance_repository.py
+Running per-(user, topic) quiz aggregates behind utils/memory_utils.py
+"""
+
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from .base import BaseRepository, get_write_batcher
+from .progress_repository import topic_key
+
+AGGREGATE_PROJECTION = {"topic": 1, "count": 1, "ratio_sum": 1, "ewma": 1}
+
+
+class TopicPerformanceRepository(BaseRepository):
+    """Documents: {_id: "<user_id>:<topic key>", user_id, topic, count, ratio_sum, ewma, updated_at}"""
+
+    collection_name = "topic_performance"
+
+    async def get_for_user(self, user_id: str) -> List[Dict[str, Any]]:
+        """Return every topic aggregate of a user (one scan of the user_id index)."""
+        return await self.collection.find({"user_id": user_id}, AGGREGATE_PROJECTION).to_list(length=None)
+
+    @staticmethod
+    def _update(user_id: str, topic: Optional[str], ratio: float, alpha: float) -> Tuple[Dict, List[Dict]]:
+        # An update pipeline, so the recent score is decayed from the stored value:
+        # results recorded by different workers all count, in the order they're applied
+        count = {"$ifNull": ["$count", 0]}
+        return {"_id": f"{user_id}:{topic_key(topic)}"}, [{"$set": {
+            "user_id": {"$literal": user_id},
+            "topic": {"$literal": topic},
+            "count": {"$add": [count, 1]},
+            "ratio_sum": {"$add": [{"$ifNull": ["$ratio_sum", 0]}, ratio]},
+            "ewma": {"$cond": [{"$gt": [count, 0]},
+                               {"$add": [alpha * ratio, {"$multiply": [1 - alpha, "$ewma"]}]},
+                               ratio]},
+            "updated_at": datetime.utcnow(),
+        }}]
+
+    def record(self, user_id: str, topic: Optional[str], ratio: float, alpha: float):
+        """
+        Queue one result for a topic (sent with the next write batch).
+
+        Args:
+            user_id: User identifier
+            topic: Topic name
+            ratio: Score of this result (0-1)
+            alpha: Weight of this result in the decayed recent score
+        """
+        get_write_batcher().add(self.collection_name, UpdateOne(*self._update(user_id, topic, ratio, alpha), upsert=True))
+
+    async def record_now(self, user_id: str, topic: Optional[str], ratio: float, alpha: float):
+        """Write one result for a topic immediately (same arguments as record)."""
+        await self.collection.update_one(*self._update(user_id, topic, ratio, alpha), upsert=True)
+
+
+topic_performance_repository = TopicPerformanceRepository()
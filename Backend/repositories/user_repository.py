@@ -0,0 +1,110 @@
+"""
+user_repository.py
+User accounts for authentication and profiles
+"""
+
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import UpdateOne
+
+from .base import BaseRepository, get_write_batcher
+
+# Everything a profile response needs; never includes the password hash
+USER_PROFILE_PROJECTION = {
+    "full_name": 1,
+    "email": 1,
+    "created_at": 1,
+    "is_active": 1,
+    "study_preferences": 1,
+    "study_stats": 1,
+}
+# Login additionally needs the hash to verify against
+USER_LOGIN_PROJECTION = {**USER_PROFILE_PROJECTION, "password_hash": 1}
+
+
+def _object_id(user_id: Any) -> Optional[ObjectId]:
+    if isinstance(user_id, ObjectId):
+        return user_id
+    try:
+        return ObjectId(user_id)
+    except (InvalidId, TypeError):
+        return None
+
+
+class UserRepository(BaseRepository):
+    """Documents follow the users schema; _id is an ObjectId."""
+
+    collection_name = "users"
+
+    async def get_by_id(self, user_id: Any, projection: Optional[Dict[str, Any]] = None) -> Optional[Dict]:
+        """
+        Fetch a user by id.
+
+        Args:
+            user_id: ObjectId or its hex string
+            projection: Fields to return (defaults to the profile fields)
+
+        Returns:
+            dict or None if the id is invalid or unknown
+        """
+        object_id = _object_id(user_id)
+        if object_id is None:
+            return None
+        return await self.collection.find_one({"_id": object_id}, projection or USER_PROFILE_PROJECTION)
+
+    async def get_by_email(self, email: str, projection: Optional[Dict[str, Any]] = None) -> Optional[Dict]:
+        """
+        Fetch a user by email (uses the unique email index).
+
+        Args:
+            email: Email address (matched lower-cased)
+            projection: Fields to return (defaults to the profile fields)
+
+        Returns:
+            dict or None
+        """
+        return await self.collection.find_one({"email": email.lower()}, projection or USER_PROFILE_PROJECTION)
+
+    async def email_exists(self, email: str) -> bool:
+        """Whether an account uses this email (reads only the _id)."""
+        return await self.collection.find_one({"email": email.lower()}, {"_id": 1}) is not None
+
+    async def insert(self, user_doc: Dict[str, Any]) -> ObjectId:
+        """
+        Insert a new user.
+
+        Returns:
+            ObjectId: The new user's id
+
+        Raises:
+            DuplicateKeyError: If the email is already registered
+        """
+        result = await self.collection.insert_one(user_doc)
+        return result.inserted_id
+
+    async def update_fields(self, user_id: Any, fields: Dict[str, Any]) -> bool:
+        """
+        Set fields on a user.
+
+        Returns:
+            bool: Whether a user was modified
+        """
+        object_id = _object_id(user_id)
+        if object_id is None:
+            return False
+        result = await self.collection.update_one({"_id": object_id}, {"$set": fields})
+        return result.modified_count > 0
+
+    def record_activity(self, user_id: Any):
+        """Queue a last-activity timestamp update (sent with the next write batch)."""
+        object_id = _object_id(user_id)
+        if object_id is not None:
+            get_write_batcher().add(self.collection_name, UpdateOne(
+                {"_id": object_id}, {"$set": {"study_stats.last_activity": datetime.utcnow()}}
+            ))
+
+
+user_repository = UserRepository()
@@ -14,6 +14,7 @@ import json
 from models.base import SuccessResponse
 from middleware.error_handling import create_success_response
 from utils import llm_utils
+from repositories.ai_repository import chat_session_repository, syllabus_analysis_repository
 from pydantic import BaseModel
 
 router = APIRouter(prefix="/api/ai", tags=["AI Features"])
@@ -61,10 +62,6 @@ class QuizGeneration(BaseModel):
     by_difficulty: Dict
     quizzes: List[Dict]
 
-# In-memory storage for demo (replace with database in production)
-_chat_sessions: Dict[str, List[ChatMessage]] = {}
-_processed_syllabi: Dict[str, Dict] = {}
-
 @router.post("/chat", response_model=SuccessResponse)
 async def ai_study_buddy_chat(request: ChatRequest):
     """
@@ -73,23 +70,17 @@ async def ai_study_buddy_chat(request: ChatRequest):
     try:
         # Get or create chat session
         session_id = request.user_id or "anonymous"
-        if session_id not in _chat_sessions:
-            _chat_sessions[session_id] = []
 
-        # Add user message to history
         user_message = ChatMessage(
             id=str(uuid.uuid4()),
             type="user",
             content=request.message,
             timestamp=datetime.now()
         )
-        _chat_sessions[session_id].append(user_message)
 
-        # Prepare context from chat history
-        chat_context = ""
-        if len(_chat_sessions[session_id]) > 1:
-            recent_messages = _chat_sessions[session_id][-6:]  # Last 6 messages for context
-            chat_context = "\n".join([f"{msg.type}: {msg.content}" for msg in recent_messages[:-1]])
+        # Prepare context from chat history (last 5 messages before this one)
+        recent_messages = await chat_session_repository.get_recent_messages(session_id, 5)
+        chat_context = "\n".join([f"{msg['type']}: {msg['content']}" for msg in recent_messages])
 
         # Generate AI response using LLM utils
         ai_response = await generate_study_buddy_response(request.message, chat_context, request.context)
@@ -101,7 +92,9 @@ async def ai_study_buddy_chat(request: ChatRequest):
             content=ai_response["response"],
             timestamp=datetime.now()
         )
-        _chat_sessions[session_id].append(ai_message)
+
+        # Save both messages to history in one write
+        await chat_session_repository.append_messages(session_id, [user_message.dict(), ai_message.dict()])
 
         return create_success_response({
             "response": ai_response["response"],
@@ -126,12 +119,12 @@ async def analyze_syllabus_with_ai(request: SyllabusProcessRequest):
         
         # Store for later use
         analysis_id = str(uuid.uuid4())
-        _processed_syllabi[analysis_id] = {
+        await syllabus_analysis_repository.save(analysis_id, {
             "analysis": analysis,
             "original_content": request.file_content,
             "processed_at": datetime.now(),
             "file_name": request.file_name
-        }
+        })
 
         return create_success_response({
             "analysis_id": analysis_id,
@@ -147,12 +140,12 @@ async def generate_ai_study_plan(analysis_id: str, exam_days: int = 30, hours_pe
     Generate AI-powered personalized study plan from analyzed syllabus
     """
     try:
-        if analysis_id not in _processed_syllabi:
+        analysis = await syllabus_analysis_repository.get_analysis(analysis_id)
+        if analysis is None:
             raise HTTPException(status_code=404, detail="Syllabus analysis not found")
 
-        syllabus_data = _processed_syllabi[analysis_id]
         study_plan = await generate_intelligent_study_plan(
-            syllabus_data["analysis"], 
+            analysis, 
             exam_days, 
             hours_per_day
         )
@@ -162,6 +155,8 @@ async def generate_ai_study_plan(analysis_id: str, exam_days: int = 30, hours_pe
             "generated_at": datetime.now()
         })
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Study plan generation error: {str(e)}")
 
@@ -171,12 +166,12 @@ async def generate_ai_flashcards(analysis_id: str, max_cards: int = 50):
     Generate AI-powered flashcards from analyzed syllabus
     """
     try:
-        if analysis_id not in _processed_syllabi:
+        analysis = await syllabus_analysis_repository.get_analysis(analysis_id)
+        if analysis is None:
             raise HTTPException(status_code=404, detail="Syllabus analysis not found")
 
-        syllabus_data = _processed_syllabi[analysis_id]
         flashcards = await generate_intelligent_flashcards(
-            syllabus_data["analysis"], 
+            analysis, 
             max_cards
         )
 
@@ -185,6 +180,8 @@ async def generate_ai_flashcards(analysis_id: str, max_cards: int = 50):
             "generated_at": datetime.now()
         })
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Flashcard generation error: {str(e)}")
 
@@ -194,12 +191,12 @@ async def generate_ai_quizzes(analysis_id: str, num_quizzes: int = 5):
     Generate AI-powered adaptive quizzes from analyzed syllabus
     """
     try:
-        if analysis_id not in _processed_syllabi:
+        analysis = await syllabus_analysis_repository.get_analysis(analysis_id)
+        if analysis is None:
             raise HTTPException(status_code=404, detail="Syllabus analysis not found")
 
-        syllabus_data = _processed_syllabi[analysis_id]
         quizzes = await generate_intelligent_quizzes(
-            syllabus_data["analysis"], 
+            analysis, 
             num_quizzes
         )
 
@@ -208,6 +205,8 @@ async def generate_ai_quizzes(analysis_id: str, num_quizzes: int = 5):
             "generated_at": datetime.now()
         })
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Quiz generation error: {str(e)}")
 
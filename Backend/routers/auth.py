@@ -14,6 +14,7 @@ from utils.auth_utils import (
     update_user_profile, format_user_response, create_access_token,
     decode_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
 )
+from utils.executor_utils import ExecutorBusyError, ExecutorTimeoutError
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 security = HTTPBearer()
@@ -38,7 +39,7 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
             detail="Invalid token payload"
         )
     
-    user = get_user_by_id(user_id)
+    user = await get_user_by_id(user_id)
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -59,7 +60,7 @@ async def register_user(user_data: UserRegistration):
     """
     try:
         # Create user in database
-        user_doc = create_user_in_db(user_data)
+        user_doc = await create_user_in_db(user_data)
         
         # Generate access token
         access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -94,7 +95,14 @@ async def login_user(user_credentials: UserLogin):
     """
     try:
         # Authenticate user
-        user = authenticate_user(user_credentials.email, user_credentials.password)
+        try:
+            user = await authenticate_user(user_credentials.email, user_credentials.password)
+        except (ExecutorBusyError, ExecutorTimeoutError):
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many logins in progress, please retry shortly",
+                headers={"Retry-After": "1"},
+            )
         
         if not user:
             raise HTTPException(
@@ -159,7 +167,7 @@ async def update_current_user_profile(
             )
         
         # Update user in database
-        success = update_user_profile(user_id, filtered_data)
+        success = await update_user_profile(user_id, filtered_data)
         
         if not success:
             raise HTTPException(
@@ -167,8 +175,8 @@ async def update_current_user_profile(
                 detail="Failed to update profile"
             )
         
-        # Get updated user
-        updated_user = get_user_by_id(user_id)
+        # Get updated user (straight from the database)
+        updated_user = await get_user_by_id(user_id, use_cache=False)
         return format_user_response(updated_user)
         
     except HTTPException:
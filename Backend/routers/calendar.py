@@ -8,6 +8,7 @@ from pydantic import BaseModel
 from datetime import datetime
 from typing import Optional, Dict, Any
 from utils.calendar_utils import sync_study_plan_to_calendar, remove_study_plan_from_calendar
+from utils.executor_utils import run_io
 
 router = APIRouter(prefix="/api/calendar", tags=["calendar"])
 
@@ -41,7 +42,7 @@ async def sync_study_plan(request: CalendarSyncRequest):
                     detail="Invalid date format. Please use YYYY-MM-DD format."
                 )
         
-        result = sync_study_plan_to_calendar(request.study_plan, start_date)
+        result = await run_io(sync_study_plan_to_calendar, request.study_plan, start_date)
         
         if not result["success"]:
             raise HTTPException(status_code=500, detail=result["message"])
@@ -62,7 +63,7 @@ async def remove_study_events():
         CalendarResponse: Success status and message
     """
     try:
-        result = remove_study_plan_from_calendar()
+        result = await run_io(remove_study_plan_from_calendar)
         
         if not result["success"]:
             raise HTTPException(status_code=500, detail=result["message"])
@@ -0,0 +1,121 @@
+"""
+progress.py
+API router for progress dashboard endpoints
+"""
+
+from fastapi import APIRouter, Query
+from datetime import datetime, timedelta
+from typing import Dict
+
+from models.progress import (
+    TopicProgress, ProgressDashboardData, DailyProgress, DailyProgressData, WeakTopic, WeakTopicsData
+)
+from models.base import SuccessResponse
+from middleware.error_handling import create_success_response
+from repositories.progress_repository import progress_repository
+from utils.memory_utils import get_weakest_topics, load_user_performance
+
+router = APIRouter(prefix="/api/progress", tags=["Progress"])
+
+def _percentage(part: float, whole: float) -> float:
+    return (part / whole) * 100 if whole else 0.0
+
+def _minutes(stats: Dict) -> float:
+    return stats.get("study_minutes", 0) + stats.get("quiz_seconds", 0) / 60
+
+@router.get("/dashboard/{user_id}", response_model=SuccessResponse)
+async def get_dashboard(user_id: str):
+    """
+    Get a user's overall progress (one rollup document read)
+    """
+    document = await progress_repository.get_overall(user_id) or {}
+    totals = document.get("totals", {})
+    streaks = document.get("streaks", {})
+
+    # The stored streak only moves on activity; one not extended yesterday or today has lapsed
+    last_active = streaks.get("last_active_date")
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    current_streak = streaks.get("current_study_streak", 0)
+    if last_active is None or last_active < today - timedelta(days=1):
+        current_streak = 0
+
+    topics = sorted(
+        (
+            TopicProgress(
+                topic=topic.get("name"),
+                attempts=topic.get("attempts", 0),
+                questions=topic.get("questions", 0),
+                correct=topic.get("correct", 0),
+                accuracy_percentage=_percentage(topic.get("correct", 0), topic.get("questions", 0))
+            )
+            for topic in document.get("topics", {}).values()
+        ),
+        key=lambda topic: topic.accuracy_percentage
+    )
+
+    dashboard = ProgressDashboardData(
+        user_id=user_id,
+        quizzes_attempted=totals.get("quizzes_attempted", 0),
+        questions_answered=totals.get("questions_answered", 0),
+        correct_answers=totals.get("correct_answers", 0),
+        accuracy_percentage=_percentage(totals.get("correct_answers", 0), totals.get("questions_answered", 0)),
+        average_score=totals.get("score_total", 0.0) / totals["quizzes_attempted"] if totals.get("quizzes_attempted") else 0.0,
+        minutes_studied=_minutes(totals),
+        sessions_completed=totals.get("sessions_completed", 0),
+        current_study_streak=current_streak,
+        longest_study_streak=streaks.get("longest_study_streak", 0),
+        last_active_date=last_active.date().isoformat() if last_active else None,
+        topics=topics
+    )
+    return create_success_response(
+        data=dashboard.dict(),
+        message="Progress dashboard retrieved successfully"
+    )
+
+@router.get("/daily/{user_id}", response_model=SuccessResponse)
+async def get_daily_progress(
+    user_id: str,
+    days: int = Query(7, ge=1, le=90, description="Number of days including today")
+):
+    """
+    Get a user's activity per day over the last days, newest first
+    """
+    documents = await progress_repository.get_daily(user_id, days)
+
+    daily = []
+    for document in documents:
+        stats = document.get("daily_stats", {})
+        quizzes = stats.get("quizzes_attempted", 0)
+        daily.append(DailyProgress(
+            date=document["date"].date().isoformat(),
+            quizzes_attempted=quizzes,
+            questions_answered=stats.get("questions_answered", 0),
+            correct_answers=stats.get("correct_answers", 0),
+            average_score=stats.get("score_total", 0.0) / quizzes if quizzes else 0.0,
+            minutes_studied=_minutes(stats),
+            sessions_completed=stats.get("sessions_completed", 0),
+            topics_studied=[topic.get("name") or "untitled" for topic in stats.get("topics", {}).values()]
+        ))
+
+    return create_success_response(
+        data=DailyProgressData(user_id=user_id, days=daily).dict(),
+        message="Daily progress retrieved successfully"
+    )
+
+@router.get("/weak-topics/{user_id}", response_model=SuccessResponse)
+async def get_weak_topics_endpoint(
+    user_id: str,
+    k: int = Query(5, ge=1, le=50, description="Number of topics")
+):
+    """
+    Get the topics with the lowest average quiz score, weakest first
+    """
+    await load_user_performance(user_id)
+    weak_topics = [
+        WeakTopic(topic=topic, average_score=average * 100)
+        for topic, average in get_weakest_topics(user_id, k)
+    ]
+    return create_success_response(
+        data=WeakTopicsData(user_id=user_id, weak_topics=weak_topics).dict(),
+        message="Weak topics retrieved successfully"
+    )
@@ -3,23 +3,51 @@ quiz.py
 API router for quiz-related endpoints
 """
 
-from fastapi import APIRouter, HTTPException
-from typing import Dict
+from fastapi import APIRouter, HTTPException, Query
+from typing import Dict, List, Optional
+import asyncio
 import uuid
 from datetime import datetime
 
+import numpy as np
+
 from models.quiz import (
     QuizGenerateRequest, QuizData, QuizQuestion,
-    QuizSubmitRequest, QuizResult
+    QuizSubmitRequest, QuizResult, QuizAttemptSummary, QuizHistoryData,
+    QuizBatchSubmitRequest, QuizBatchRejection, QuestionStatistics, QuizBatchStatistics, QuizBatchResult
 )
 from models.base import SuccessResponse
 from middleware.error_handling import create_success_response, LLMQuotaExceededException
 from utils.llm_utils import generate_quiz
+from utils.executor_utils import run_io
+from utils.grading_utils import grade_submissions, item_statistics
+from repositories.quiz_repository import quiz_repository
+from repositories.quiz_attempt_repository import InvalidCursorError, quiz_attempt_repository
+from repositories.progress_repository import progress_repository
 
 router = APIRouter(prefix="/api/quiz", tags=["Quiz"])
 
-# In-memory storage for demo (replace with database later)
-_quiz_storage: Dict[str, Dict] = {}
+def _attempt_document(quiz_id: str, user_id: str, topic: Optional[str], answers: List[str],
+                      correct_answers: List[bool], score: int, time_taken: Optional[int] = None) -> Dict:
+    """Build a quiz_attempts document for a graded submission"""
+    total = len(correct_answers)
+    return {
+        "user_id": user_id,
+        "quiz_id": quiz_id,
+        "topic": topic,
+        "answers": [
+            {"question_id": index + 1, "user_answer": answer, "is_correct": is_correct}
+            for index, (answer, is_correct) in enumerate(zip(answers, correct_answers))
+        ],
+        "results": {
+            "total_questions": total,
+            "correct_answers": score,
+            "score_percentage": (score / total) * 100 if total else 0.0,
+            "time_taken_seconds": time_taken or 0
+        },
+        "status": "completed",
+        "created_at": datetime.utcnow()
+    }
 
 @router.post("/generate", response_model=SuccessResponse)
 async def generate_quiz_endpoint(request: QuizGenerateRequest):
@@ -41,7 +69,7 @@ async def generate_quiz_endpoint(request: QuizGenerateRequest):
             }
         else:
             # Generate quiz using LLM utils
-            llm_response = generate_quiz(request.topic)
+            llm_response = await run_io(generate_quiz, request.topic)
             
             # Parse JSON response from LLM
             import json
@@ -78,11 +106,11 @@ async def generate_quiz_endpoint(request: QuizGenerateRequest):
         )
         
         # Store quiz for later submission
-        _quiz_storage[quiz_id] = {
+        await quiz_repository.save(quiz_id, {
             "quiz_data": response_data.dict(),
             "created_at": datetime.utcnow().isoformat(),
             "topic": request.topic
-        }
+        })
         
         return create_success_response(
             data=response_data.dict(),
@@ -108,12 +136,12 @@ async def submit_quiz_endpoint(request: QuizSubmitRequest):
     """
     Submit quiz answers and get results
     """
-    # Check if quiz exists
-    if request.quiz_id not in _quiz_storage:
+    # Check if quiz exists (only the answer key and topic are read)
+    quiz = await quiz_repository.get_answer_key(request.quiz_id)
+    if quiz is None:
         raise HTTPException(status_code=404, detail="Quiz not found")
     
-    quiz_data = _quiz_storage[request.quiz_id]["quiz_data"]
-    questions = quiz_data["questions"]
+    questions = quiz["quiz_data"]["questions"]
     
     # Validate number of answers
     if len(request.answers) != len(questions):
@@ -142,18 +170,28 @@ async def submit_quiz_endpoint(request: QuizSubmitRequest):
         score=score,
         total_questions=len(questions),
         percentage=percentage,
-        correct_answers=correct_answers
+        correct_answers=correct_answers,
+        time_taken=request.time_taken
     )
     
-    # Store result if user_id provided (for memory tracking)
+    # Store result if user_id provided (history, progress rollups and memory tracking)
     if request.user_id:
-        # This would typically go to a database
-        # For now, we can integrate with memory_utils
+        attempt = _attempt_document(
+            request.quiz_id, request.user_id, quiz["topic"], request.answers, correct_answers, score,
+            request.time_taken
+        )
+        attempt_id = await quiz_attempt_repository.insert(attempt)
+        result.attempt_id = str(attempt_id)
+        await progress_repository.record_quiz_attempt(
+            request.user_id, quiz["topic"], score, len(questions),
+            seconds=request.time_taken or 0, at=attempt["created_at"]
+        )
         try:
-            from utils.memory_utils import record_quiz_result
+            from utils.memory_utils import load_user_performance, record_quiz_result
+            await load_user_performance(request.user_id)
             record_quiz_result(
                 user_id=request.user_id,
-                topic=_quiz_storage[request.quiz_id]["topic"],
+                topic=quiz["topic"],
                 score=score,
                 total=len(questions)
             )
@@ -165,18 +203,159 @@ async def submit_quiz_endpoint(request: QuizSubmitRequest):
         message=f"Quiz submitted successfully. Score: {score}/{len(questions)} ({percentage:.1f}%)"
     )
 
+@router.post("/submit-batch", response_model=SuccessResponse)
+async def submit_quiz_batch_endpoint(request: QuizBatchSubmitRequest):
+    """
+    Grade many submissions at once (e.g. a whole class at the end of a timed
+    quiz) and return per-question class statistics
+    """
+    submissions = request.submissions
+    
+    # Stack the answer keys of every quiz in the batch into one matrix
+    quiz_ids = list(dict.fromkeys(submission.quiz_id for submission in submissions))
+    quizzes = await asyncio.gather(*(quiz_repository.get_answer_key(quiz_id) for quiz_id in quiz_ids))
+    found = {quiz_id: quiz for quiz_id, quiz in zip(quiz_ids, quizzes) if quiz is not None}
+    key_quiz_ids = [quiz_id for quiz_id in quiz_ids if quiz_id in found]
+    position = {quiz_id: index for index, quiz_id in enumerate(key_quiz_ids)}
+    answer_keys = [
+        [question["correct_answer"] for question in found[quiz_id]["quiz_data"]["questions"]]
+        for quiz_id in key_quiz_ids
+    ]
+    
+    # Submissions that can't be graded are reported instead of failing the batch
+    accepted, rejected = [], []
+    for index, submission in enumerate(submissions):
+        if submission.quiz_id not in position:
+            rejected.append(QuizBatchRejection(index=index, quiz_id=submission.quiz_id, detail="Quiz not found"))
+            continue
+        expected = len(answer_keys[position[submission.quiz_id]])
+        if len(submission.answers) != expected:
+            rejected.append(QuizBatchRejection(
+                index=index, quiz_id=submission.quiz_id,
+                detail=f"Expected {expected} answers, got {len(submission.answers)}"
+            ))
+            continue
+        accepted.append(submission)
+    
+    results, statistics = [], []
+    if accepted:
+        # One comparison grades the whole batch
+        quiz_index = np.array([position[submission.quiz_id] for submission in accepted], dtype=np.intp)
+        correct = grade_submissions(answer_keys, quiz_index, [submission.answers for submission in accepted])
+        scores = correct.sum(axis=1)
+        totals = np.array([len(key) for key in answer_keys])[quiz_index]
+        percentages = np.divide(scores * 100, totals, out=np.zeros(len(accepted)), where=totals > 0)
+        
+        attempts = []
+        for row, submission in enumerate(accepted):
+            total = int(totals[row])
+            correct_answers = correct[row, :total].tolist()
+            result = QuizResult(
+                quiz_id=submission.quiz_id,
+                user_id=submission.user_id,
+                score=int(scores[row]),
+                total_questions=total,
+                percentage=float(percentages[row]),
+                correct_answers=correct_answers,
+                time_taken=submission.time_taken
+            )
+            results.append(result)
+            if submission.user_id:
+                attempts.append((result, _attempt_document(
+                    submission.quiz_id, submission.user_id, found[submission.quiz_id]["topic"],
+                    submission.answers, correct_answers, result.score, submission.time_taken
+                )))
+        
+        # Store every attempt with one bulk write, then update rollups and memory tracking
+        if attempts:
+            attempt_ids = await quiz_attempt_repository.insert_many([document for _, document in attempts])
+            for (result, _), attempt_id in zip(attempts, attempt_ids):
+                result.attempt_id = str(attempt_id)
+            await progress_repository.record_quiz_attempts([document for _, document in attempts])
+            try:
+                from utils.memory_utils import load_user_performance, record_quiz_result
+                user_ids = list(dict.fromkeys(document["user_id"] for _, document in attempts))
+                await asyncio.gather(*(load_user_performance(user_id) for user_id in user_ids))
+                for result, document in attempts:
+                    record_quiz_result(
+                        user_id=document["user_id"],
+                        topic=document["topic"],
+                        score=result.score,
+                        total=result.total_questions
+                    )
+            except ImportError:
+                pass  # Skip if memory utils not available
+        
+        # Class statistics per quiz, from the same correctness matrix
+        for index, quiz_id in enumerate(key_quiz_ids):
+            rows = quiz_index == index
+            if not rows.any():
+                continue
+            num_questions = len(answer_keys[index])
+            difficulty, discrimination = item_statistics(correct[rows, :num_questions])
+            statistics.append(QuizBatchStatistics(
+                quiz_id=quiz_id,
+                topic=found[quiz_id]["topic"],
+                submissions=int(rows.sum()),
+                average_percentage=float(percentages[rows].mean()),
+                questions=[
+                    QuestionStatistics(
+                        question_id=question + 1,
+                        difficulty_index=float(difficulty[question]),
+                        discrimination_index=None if discrimination is None else float(discrimination[question])
+                    )
+                    for question in range(num_questions)
+                ]
+            ))
+    
+    response_data = QuizBatchResult(
+        graded=len(results),
+        results=results,
+        rejected=rejected,
+        statistics=statistics
+    )
+    return create_success_response(
+        data=response_data.dict(),
+        message=f"Graded {len(results)} submissions ({len(rejected)} rejected)"
+    )
+
 @router.get("/history/{user_id}", response_model=SuccessResponse)
-async def get_quiz_history(user_id: str):
+async def get_quiz_history(
+    user_id: str,
+    limit: int = Query(20, ge=1, le=100, description="Attempts per page"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page")
+):
     """
-    Get quiz history for a user (placeholder for future implementation)
+    Get a user's quiz history, newest first, one page at a time
     """
-    # This would query the database for user's quiz history
-    # For now, return empty history
+    try:
+        rows, next_cursor = await quiz_attempt_repository.list_for_user(user_id, limit, cursor)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    history = [
+        QuizAttemptSummary(
+            attempt_id=str(row["_id"]),
+            quiz_id=row["quiz_id"],
+            topic=row.get("topic"),
+            score=row["results"]["correct_answers"],
+            total_questions=row["results"]["total_questions"],
+            percentage=row["results"]["score_percentage"],
+            created_at=row["created_at"].isoformat() + "Z"
+        )
+        for row in rows
+    ]
+    # Counting every attempt isn't constant-cost, so only the first page reports the total
+    total_quizzes = await quiz_attempt_repository.count_for_user(user_id) if cursor is None else None
+    
+    response_data = QuizHistoryData(
+        user_id=user_id,
+        total_quizzes=total_quizzes,
+        quiz_history=history,
+        next_cursor=next_cursor,
+        has_more=next_cursor is not None
+    )
     return create_success_response(
-        data={
-            "user_id": user_id,
-            "total_quizzes": 0,
-            "quiz_history": []
-        },
+        data=response_data.dict(),
         message="Quiz history retrieved successfully"
-    )
\ No newline at end of file
+    )
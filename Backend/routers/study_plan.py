@@ -4,7 +4,6 @@ API router for study plan generation endpoints
 """
 
 from fastapi import APIRouter, HTTPException
-from typing import Dict
 import uuid
 import json
 from datetime import datetime
@@ -16,12 +15,12 @@ from models.study_plan import (
 from models.base import SuccessResponse
 from middleware.error_handling import create_success_response
 from utils.llm_utils import generate_study_plan as llm_generate_study_plan
+from utils.executor_utils import run_io
+from repositories.study_plan_repository import study_plan_repository
+from repositories.progress_repository import progress_repository
 
 router = APIRouter(prefix="/api/study-plan", tags=["Study Plan"])
 
-# In-memory storage for demo (replace with database later)
-_plan_storage: Dict[str, Dict] = {}
-
 @router.post("/generate", response_model=SuccessResponse)
 async def generate_study_plan_endpoint(request: StudyPlanRequest):
     """
@@ -72,7 +71,7 @@ async def generate_study_plan_endpoint(request: StudyPlanRequest):
             # Generate study plan using LLM utils
             import json
             syllabus_json_str = json.dumps(request.syllabus)
-            llm_response = llm_generate_study_plan(syllabus_json_str, request.exam_days)
+            llm_response = await run_io(llm_generate_study_plan, syllabus_json_str, request.exam_days)
             
             # Parse JSON response from LLM (or handle as text)
             try:
@@ -151,11 +150,11 @@ async def generate_study_plan_endpoint(request: StudyPlanRequest):
         )
         
         # Store plan
-        _plan_storage[plan_id] = {
+        await study_plan_repository.save(plan_id, {
             "plan_data": response_data.dict(),
             "original_request": request.dict(),
             "created_at": datetime.utcnow().isoformat()
-        }
+        })
         
         return create_success_response(
             data=response_data.dict(),
@@ -180,11 +179,10 @@ async def get_study_plan(plan_id: str):
     """
     Retrieve a specific study plan by ID
     """
-    if plan_id not in _plan_storage:
+    plan_data = await study_plan_repository.get_plan_data(plan_id)
+    if plan_data is None:
         raise HTTPException(status_code=404, detail="Study plan not found")
     
-    plan_data = _plan_storage[plan_id]["plan_data"]
-    
     return create_success_response(
         data=plan_data,
         message="Study plan retrieved successfully"
@@ -195,28 +193,30 @@ async def update_progress(request: StudyProgressRequest):
     """
     Update study progress for a user
     """
-    # Check if plan exists
-    if request.plan_id not in _plan_storage:
-        raise HTTPException(status_code=404, detail="Study plan not found")
-    
-    # In a real implementation, this would update the database
-    # For now, we'll just calculate and return progress
-    
-    plan_data = _plan_storage[request.plan_id]["plan_data"]
-    total_days = plan_data["total_days"]
-    
     # Extract day number from completed_day (e.g., "Day 1" -> 1)
     try:
         day_number = int(request.completed_day.split()[-1])
     except (ValueError, IndexError):
         raise HTTPException(status_code=400, detail="Invalid day format. Expected 'Day X'")
     
+    # Read the plan length and the next day's tasks only, not the whole plan
+    next_day = f"Day {day_number + 1}"
+    plan_day = await study_plan_repository.get_day(request.plan_id, next_day)
+    if plan_day is None:
+        raise HTTPException(status_code=404, detail="Study plan not found")
+    
+    total_days = plan_day["total_days"]
+    
+    # Add the day to the user's progress rollups (each plan day counts once, so retries are harmless)
+    minutes = request.minutes_studied
+    if minutes is None:
+        minutes = round((plan_day["total_hours"] or 0) * 60 / total_days) if total_days else 0
+    await progress_repository.record_study_day(request.user_id, request.plan_id, day_number, total_days, minutes)
+    
     # Calculate progress
     completion_percentage = (day_number / total_days) * 100
     
-    # Get next tasks (this would come from database in real implementation)
-    next_day = f"Day {day_number + 1}"
-    next_tasks = plan_data["daily_plans"].get(next_day, ["Course completed!"])
+    next_tasks = plan_day["tasks"] if plan_day["tasks"] is not None else ["Course completed!"]
     
     progress_data = StudyProgressData(
         plan_id=request.plan_id,
@@ -3,26 +3,217 @@ syllabus.py
 API router for syllabus parsing and flashcard generation endpoints
 """
 
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
-from typing import Dict, Optional
+from fastapi import APIRouter, HTTPException, Request, UploadFile
+from starlette.datastructures import FormData
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import json
 import uuid
-import tempfile
-import os
 from datetime import datetime
 
 from models.syllabus import (
-    SyllabusParseRequest, SyllabusData, SyllabusImageParseRequest,
+    SyllabusParseRequest, SyllabusData, SyllabusChanges, SyllabusImageParseRequest, OCRMethod,
     FlashcardRequest, FlashcardData, Flashcard
 )
 from models.base import SuccessResponse
 from middleware.error_handling import create_success_response
-from utils.llm_utils import parse_syllabus_text, extract_text_from_pdf
+from utils.llm_utils import parse_syllabus_text, extract_text_from_pdf_async, extract_text_from_image_async
 import utils.llm_utils as llm_utils
+from utils.cache_utils import EXTRACTED_TEXT, STRUCTURED_TOPICS, content_hash, get_content_cache
+from utils.executor_utils import ExecutorBusyError, ExecutorTimeoutError, run_io
+from utils.upload_utils import UploadTooLargeError, read_upload_form, spool_upload, upload_form_openapi
+from utils.syllabus_utils import (
+    SECTION_PARSE_CONCURRENCY, assign_topics_to_sections, diff_topics, match_sections, merge_topics,
+    split_into_sections
+)
+from repositories.syllabus_repository import syllabus_repository
 
 router = APIRouter(prefix="/api/syllabus", tags=["Syllabus"])
 
-# In-memory storage for demo
-_syllabus_storage: Dict[str, Dict] = {}
+# Multi-page photo uploads
+MAX_IMAGES_PER_REQUEST = 20
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp", ".bmp", ".tif", ".tiff")
+
+def _form_files(form: FormData, name: str) -> List[UploadFile]:
+    """The files uploaded under a form name (422 if there are none)"""
+    files = [value for value in form.getlist(name) if isinstance(value, UploadFile)]
+    if not files:
+        raise HTTPException(status_code=422, detail=f"Missing file upload '{name}'")
+    return files
+
+def _form_flag(value) -> bool:
+    """A boolean form field, as FastAPI parses them"""
+    return isinstance(value, str) and value.strip().lower() in ("1", "true", "on", "yes")
+
+def _structure_llm_response(llm_response: str) -> Dict[str, List[str]]:
+    """
+    Turn the LLM's JSON syllabus answer into {topic_name: [subtopics]},
+    falling back to a simple structure when the answer isn't the expected JSON
+    """
+    try:
+        parsed_json = json.loads(llm_response)
+    except json.JSONDecodeError:
+        # Create simple structure if not JSON
+        return {"Parsed Content": [llm_response[:100] + "..."]}
+    
+    # Handle the expected JSON structure with topics array
+    if not (isinstance(parsed_json, dict) and isinstance(parsed_json.get("topics"), list)):
+        # Fallback for unexpected JSON structure
+        return {"Parsed Content": [str(parsed_json)[:100] + "..."]}
+    
+    structured_data = {}
+    for topic_obj in parsed_json["topics"]:
+        if isinstance(topic_obj, dict) and "topic_name" in topic_obj:
+            topic_name = topic_obj["topic_name"]
+            subtopics = topic_obj.get("subtopics", [])
+            # Ensure subtopics is a list of strings
+            if isinstance(subtopics, list):
+                structured_data[topic_name] = [str(sub) for sub in subtopics]
+            else:
+                structured_data[topic_name] = [str(subtopics)]
+        else:
+            # Fallback for unexpected topic structure
+            structured_data[str(topic_obj)] = ["Topic details"]
+    return structured_data
+
+async def _parse_topics_cached(text: str) -> Tuple[Dict[str, List[str]], bool]:
+    """
+    Parse syllabus text with the LLM, reusing the result for identical text
+    Returns:
+        (structured_topics, cache_hit)
+    """
+    cache = get_content_cache()
+    key = content_hash(text)
+    structured_data = cache.get(STRUCTURED_TOPICS, key)
+    if structured_data is not None:
+        return structured_data, True
+    
+    llm_response = await llm_utils.parse_syllabus_text(text)
+    structured_data = _structure_llm_response(llm_response)
+    cache.set(STRUCTURED_TOPICS, key, structured_data)
+    return structured_data, False
+
+async def _get_previous_syllabus(syllabus_id: Optional[str]) -> Optional[Dict]:
+    """Look up the stored syllabus a re-parse updates (None for a new syllabus)"""
+    if not syllabus_id:
+        return None
+    previous = await syllabus_repository.get_for_reparse(syllabus_id)
+    if previous is None:
+        raise HTTPException(status_code=404, detail=f"Syllabus {syllabus_id} not found")
+    return previous
+
+async def _parse_sections(text: str, previous: Optional[Dict] = None):
+    """
+    Parse syllabus text into topics. On a re-parse, sections whose
+    fingerprint matches a section of the previous version keep their
+    topics and only the rest are parsed (a few at a time, each through the
+    topic cache). A new syllabus, or one with no unchanged section, is
+    parsed in a single call over the whole text.
+    Returns:
+        (structured_topics, sections, topics_cache_hit, changes)
+    """
+    sections = split_into_sections(text)
+    reused, summary = match_sections(previous.get("sections", []) if previous else [], sections)
+    
+    if not reused:
+        structured_data, topics_cache_hit = await _parse_topics_cached(text)
+        section_topics = assign_topics_to_sections(structured_data, sections)
+        sections_reparsed = 0 if topics_cache_hit else len(sections)
+    else:
+        semaphore = asyncio.Semaphore(SECTION_PARSE_CONCURRENCY)
+        
+        async def parse_section(index: int):
+            async with semaphore:
+                return await _parse_topics_cached(sections[index]["text"])
+        
+        to_parse = [index for index in range(len(sections)) if index not in reused]
+        results = await asyncio.gather(*(parse_section(index) for index in to_parse))
+        by_index = dict(reused)
+        for index, (topics, _) in zip(to_parse, results):
+            by_index[index] = topics
+        section_topics = [by_index[index] for index in range(len(sections))]
+        structured_data = merge_topics(section_topics)
+        # True when no section needed a fresh LLM call
+        topics_cache_hit = all(hit for _, hit in results)
+        sections_reparsed = sum(1 for _, hit in results if not hit)
+    
+    stored_sections = [
+        {"heading": section["heading"], "fingerprint": section["fingerprint"], "topics": section_topics[index]}
+        for index, section in enumerate(sections)
+    ]
+    
+    changes = None
+    if previous is not None:
+        topic_diff = diff_topics(previous["syllabus_data"]["structured_topics"], structured_data)
+        changes = SyllabusChanges(
+            added_topics=topic_diff["added"],
+            removed_topics=topic_diff["removed"],
+            changed_topics=topic_diff["changed"],
+            sections_total=len(sections),
+            sections_reparsed=sections_reparsed,
+            sections_unchanged=summary["unchanged"],
+            sections_changed=summary["changed"],
+            sections_added=summary["added"],
+            sections_removed=summary["removed"]
+        )
+    return structured_data, stored_sections, topics_cache_hit, changes
+
+async def _store_syllabus(input_method: str, raw_text: str, structured_topics: Dict[str, List[str]],
+                    confidence_score: float, topics_cache_hit: bool, text_cache_hit: Optional[bool] = None,
+                    sections: Optional[List[Dict]] = None, previous: Optional[Dict] = None,
+                    changes: Optional[SyllabusChanges] = None) -> SyllabusData:
+    """
+    Build the response model for a parsed syllabus and keep it in storage.
+    text_cache_hit is None for text input, which has no extraction step.
+    """
+    if previous is not None:
+        # Re-parse: same syllabus, next version
+        syllabus_id = previous["syllabus_data"]["syllabus_id"]
+        version = previous["syllabus_data"].get("version", 1) + 1
+    else:
+        # Generate unique syllabus ID
+        syllabus_id = str(uuid.uuid4())
+        version = 1
+    # Calculate statistics
+    total_subjects = len(structured_topics)
+    total_topics = sum(len(topics) for topics in structured_topics.values())
+    
+    # Create response data
+    response_data = SyllabusData(
+        syllabus_id=syllabus_id,
+        input_method=input_method,
+        raw_text=raw_text,
+        structured_topics=structured_topics,
+        total_subjects=total_subjects,
+        total_topics=total_topics,
+        confidence_score=confidence_score,
+        cache_hit=topics_cache_hit and text_cache_hit is not False,
+        text_cache_hit=text_cache_hit,
+        topics_cache_hit=topics_cache_hit,
+        version=version,
+        changes=changes
+    )
+    
+    # Store syllabus (with section fingerprints for the next re-parse)
+    now = datetime.utcnow().isoformat()
+    await syllabus_repository.save(syllabus_id, {
+        "syllabus_data": response_data.dict(),
+        "sections": sections or [],
+        "created_at": previous["created_at"] if previous else now,
+        "updated_at": now
+    })
+    return response_data
+
+def _parse_message(prefix: str, response_data: SyllabusData) -> str:
+    """Success message with topic counts, plus what changed on a re-parse"""
+    message = (f"{prefix} parsed successfully. Found {response_data.total_subjects} subjects "
+               f"with {response_data.total_topics} topics")
+    changes = response_data.changes
+    if changes is not None:
+        message += (f". Version {response_data.version}: {len(changes.added_topics)} added, "
+                    f"{len(changes.removed_topics)} removed, {len(changes.changed_topics)} changed topics; "
+                    f"re-parsed {changes.sections_reparsed} of {changes.sections_total} sections")
+    return message
 
 @router.post("/parse/text", response_model=SuccessResponse)
 async def parse_syllabus_text_endpoint(request: SyllabusParseRequest):
@@ -30,181 +221,212 @@ async def parse_syllabus_text_endpoint(request: SyllabusParseRequest):
     Parse syllabus from text input
     """
     try:
+        previous = await _get_previous_syllabus(request.syllabus_id)
+        
         # Parse the syllabus text using LLM utils
+        topics_cache_hit, sections, changes = False, None, None
         if request.use_mock:
             # Mock parsing for testing
             structured_data = {"General Topics": [request.text[:50] + "...", "Additional topics"]}
         else:
-            llm_response = await llm_utils.parse_syllabus_text(request.text)
-            # Try to parse JSON response, fallback to simple structure
-            import json
-            try:
-                parsed_json = json.loads(llm_response)
-                structured_data = {}
-                
-                # Handle the expected JSON structure with topics array
-                if "topics" in parsed_json and isinstance(parsed_json["topics"], list):
-                    for topic_obj in parsed_json["topics"]:
-                        if isinstance(topic_obj, dict) and "topic_name" in topic_obj:
-                            topic_name = topic_obj["topic_name"]
-                            subtopics = topic_obj.get("subtopics", [])
-                            # Ensure subtopics is a list of strings
-                            if isinstance(subtopics, list):
-                                structured_data[topic_name] = [str(sub) for sub in subtopics]
-                            else:
-                                structured_data[topic_name] = [str(subtopics)]
-                        else:
-                            # Fallback for unexpected topic structure
-                            structured_data[str(topic_obj)] = ["Topic details"]
-                else:
-                    # Fallback for unexpected JSON structure
-                    structured_data = {"Parsed Content": [str(parsed_json)[:100] + "..."]}
-                    
-            except json.JSONDecodeError:
-                # Create simple structure if not JSON
-                structured_data = {"Parsed Content": [llm_response[:100] + "..."]}
-        
-        # No need for additional normalization since we handled it above
-
-        # Generate unique syllabus ID
-        syllabus_id = str(uuid.uuid4())
-        structured_topics = structured_data
-        # Calculate statistics
-        total_subjects = len(structured_topics)
-        total_topics = sum(len(topics) for topics in structured_topics.values())
+            structured_data, sections, topics_cache_hit, changes = await _parse_sections(request.text, previous)
         
-        # Create response data
-        response_data = SyllabusData(
-            syllabus_id=syllabus_id,
-            input_method="text",
-            raw_text=request.text,
-            structured_topics=structured_topics,
-            total_subjects=total_subjects,
-            total_topics=total_topics,
-            confidence_score=0.9  # High confidence for text input
+        response_data = await _store_syllabus(
+            "text", request.text, structured_data,
+            confidence_score=0.9,  # High confidence for text input
+            topics_cache_hit=topics_cache_hit,
+            sections=sections, previous=previous, changes=changes
         )
         
-        # Store syllabus
-        _syllabus_storage[syllabus_id] = {
-            "syllabus_data": response_data.dict(),
-            "created_at": datetime.utcnow().isoformat()
-        }
-        
         return create_success_response(
             data=response_data.dict(),
-            message=f"Syllabus parsed successfully. Found {total_subjects} subjects with {total_topics} topics"
+            message=_parse_message("Syllabus", response_data)
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Syllabus parsing failed: {str(e)}")
 
-@router.post("/parse/pdf", response_model=SuccessResponse)
-async def parse_syllabus_pdf(file: UploadFile = File(...), use_mock: bool = Form(False)):
-    # Ensure use_mock is a boolean (handle string from form data)
-    if isinstance(use_mock, str):
-        use_mock = use_mock.lower() == "true"
+@router.post("/parse/pdf", response_model=SuccessResponse, openapi_extra=upload_form_openapi(
+    {"file": False},
+    {"use_mock": {"type": "boolean", "default": False}, "syllabus_id": {"type": "string"}},
+    ["file"]
+))
+async def parse_syllabus_pdf(request: Request):
     """
-    Parse syllabus from PDF file
+    Parse syllabus from PDF file (form fields: file, use_mock, syllabus_id)
     """
+    # Read here rather than declared as File/Form parameters, so the upload is
+    # hashed and size-checked as it streams in (see utils/upload_utils.py)
+    form = await read_upload_form(request)
+    try:
+        return await _parse_pdf_upload(_form_files(form, "file")[0], _form_flag(form.get("use_mock")),
+                                       form.get("syllabus_id") or None)
+    finally:
+        await form.close()
+
+async def _parse_pdf_upload(file: UploadFile, use_mock: bool, syllabus_id: Optional[str]):
     if not file.filename.lower().endswith('.pdf'):
         raise HTTPException(status_code=400, detail="Only PDF files are supported")
     
     try:
+        previous = await _get_previous_syllabus(syllabus_id)
+        
+        # Size limit and SHA-256 were applied while the upload streamed in
+        upload = await spool_upload(file)
         
-        # Save uploaded file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
-            content = await file.read()
-            temp_file.write(content)
-            temp_path = temp_file.name
+        # Byte-identical uploads reuse the extracted (and possibly OCR'd) text
+        cache = get_content_cache()
+        extracted_text = cache.get(EXTRACTED_TEXT, upload.sha256)
+        text_cache_hit = extracted_text is not None
+        if extracted_text is None:
+            # Extract text off the event loop; a large upload is read by the worker from its spool file
+            extracted_text = await extract_text_from_pdf_async(await upload.worker_source())
+            if extracted_text.strip():
+                cache.set(EXTRACTED_TEXT, upload.sha256, extracted_text)
+        
+        if not extracted_text.strip():
+            raise HTTPException(status_code=400, detail="No text could be extracted from the PDF")
+        
+        # Parse the extracted text using LLM utils
+        topics_cache_hit, sections, changes = False, None, None
+        if use_mock:
+            structured_data = {"PDF Content": [extracted_text[:100] + "...", "Additional topics"]}
+        else:
+            structured_data, sections, topics_cache_hit, changes = await _parse_sections(extracted_text, previous)
+        
+        response_data = await _store_syllabus(
+            "pdf", extracted_text, structured_data,
+            confidence_score=0.8,  # Slightly lower confidence for PDF
+            topics_cache_hit=topics_cache_hit, text_cache_hit=text_cache_hit,
+            sections=sections, previous=previous, changes=changes
+        )
+        
+        return create_success_response(
+            data=response_data.dict(),
+            message=_parse_message("PDF syllabus", response_data)
+        )
         
+    except HTTPException:
+        raise
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ExecutorBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ExecutorTimeoutError:
+        raise HTTPException(status_code=504, detail="PDF processing took too long")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"PDF parsing failed: {str(e)}")
+
+async def _ocr_image_upload(file: UploadFile, ocr_method: OCRMethod) -> Tuple[str, bool]:
+    """
+    OCR one uploaded image, reusing the text of a byte-identical earlier upload
+    Returns:
+        (extracted_text, cache_hit)
+    """
+    upload = await spool_upload(file)
+    cache = get_content_cache()
+    # Engines recognize differently, so the method is part of the key
+    cache_key = f"{upload.sha256}:{ocr_method.value}"
+    extracted_text = cache.get(EXTRACTED_TEXT, cache_key)
+    if extracted_text is not None:
+        return extracted_text, True
+    extracted_text = await extract_text_from_image_async(await upload.worker_source(), ocr_method.value)
+    if not extracted_text.startswith("Error"):
+        cache.set(EXTRACTED_TEXT, cache_key, extracted_text)
+    return extracted_text, False
+
+@router.post("/parse/images", response_model=SuccessResponse, openapi_extra=upload_form_openapi(
+    {"files": True},
+    {
+        "ocr_method": {"type": "string", "enum": [method.value for method in OCRMethod], "default": OCRMethod.AUTO.value},
+        "use_mock": {"type": "boolean", "default": False},
+        "syllabus_id": {"type": "string"},
+    },
+    ["files"]
+))
+async def parse_syllabus_images(request: Request):
+    """
+    Parse a syllabus photographed over several pages (form fields: files,
+    ocr_method, use_mock, syllabus_id).
+    All images are OCR'd concurrently on the worker pool, their text is
+    merged in upload order and parsed once.
+    """
+    form = await read_upload_form(request)
+    try:
         try:
-            # Extract text from PDF
-            extracted_text = extract_text_from_pdf(temp_path)
-            
-            if not extracted_text.strip():
-                raise HTTPException(status_code=400, detail="No text could be extracted from the PDF")
-            
-            # Parse the extracted text using LLM utils
-            if use_mock:
-                structured_data = {"PDF Content": [extracted_text[:100] + "...", "Additional topics"]}
-            else:
-                from models.syllabus import SyllabusParseRequest
-                llm_response = await llm_utils.parse_syllabus_text(extracted_text)
-                # Try to parse JSON response
-                import json
-                try:
-                    parsed_json = json.loads(llm_response)
-                    structured_data = {}
-                    
-                    # Handle the expected JSON structure with topics array
-                    if "topics" in parsed_json and isinstance(parsed_json["topics"], list):
-                        for topic_obj in parsed_json["topics"]:
-                            if isinstance(topic_obj, dict) and "topic_name" in topic_obj:
-                                topic_name = topic_obj["topic_name"]
-                                subtopics = topic_obj.get("subtopics", [])
-                                # Ensure subtopics is a list of strings
-                                if isinstance(subtopics, list):
-                                    structured_data[topic_name] = [str(sub) for sub in subtopics]
-                                else:
-                                    structured_data[topic_name] = [str(subtopics)]
-                            else:
-                                # Fallback for unexpected topic structure
-                                structured_data[str(topic_obj)] = ["Topic details"]
-                    else:
-                        # Fallback for unexpected JSON structure
-                        structured_data = {"Parsed Content": [str(parsed_json)[:100] + "..."]}
-                        
-                except json.JSONDecodeError:
-                    structured_data = {"Parsed Content": [llm_response[:100] + "..."]}
-            
-            # No need for additional normalization since we handled it above
+            ocr_method = OCRMethod(form.get("ocr_method") or OCRMethod.AUTO.value)
+        except ValueError:
+            raise HTTPException(status_code=422, detail=f"Unknown ocr_method '{form.get('ocr_method')}'")
+        return await _parse_image_uploads(_form_files(form, "files"), ocr_method, _form_flag(form.get("use_mock")),
+                                          form.get("syllabus_id") or None)
+    finally:
+        await form.close()
 
-            # Generate unique syllabus ID
-            syllabus_id = str(uuid.uuid4())
-            structured_topics = structured_data
-            # Calculate statistics
-            total_subjects = len(structured_topics)
-            total_topics = sum(len(topics) for topics in structured_topics.values())
-            
-            # Create response data
-            response_data = SyllabusData(
-                syllabus_id=syllabus_id,
-                input_method="pdf",
-                raw_text=extracted_text,
-                structured_topics=structured_topics,
-                total_subjects=total_subjects,
-                total_topics=total_topics,
-                confidence_score=0.8  # Slightly lower confidence for PDF
-            )
-            
-            # Store syllabus
-            _syllabus_storage[syllabus_id] = {
-                "syllabus_data": response_data.dict(),
-                "created_at": datetime.utcnow().isoformat()
-            }
-            
-            return create_success_response(
-                data=response_data.dict(),
-                message=f"PDF syllabus parsed successfully. Found {total_subjects} subjects with {total_topics} topics"
-            )
-            
-        finally:
-            # Clean up temporary file
-            os.unlink(temp_path)
-            
+async def _parse_image_uploads(files: List[UploadFile], ocr_method: OCRMethod, use_mock: bool,
+                               syllabus_id: Optional[str]):
+    if len(files) > MAX_IMAGES_PER_REQUEST:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_IMAGES_PER_REQUEST} images per request")
+    for file in files:
+        if not (file.content_type or "").startswith("image/") and \
+                not file.filename.lower().endswith(IMAGE_EXTENSIONS):
+            raise HTTPException(status_code=400, detail=f"'{file.filename}' is not a supported image file")
+    
+    try:
+        previous = await _get_previous_syllabus(syllabus_id)
+        
+        # Wall-clock time follows the slowest image, not the sum
+        ocr_results = await asyncio.gather(*(_ocr_image_upload(file, ocr_method) for file in files))
+        page_texts = [text for text, _ in ocr_results]
+        text_cache_hit = all(hit for _, hit in ocr_results)
+        
+        failed = [file.filename for file, text in zip(files, page_texts) if text.startswith("Error")]
+        extracted_text = "\n\n".join(text for text in page_texts if not text.startswith("Error"))
+        if not extracted_text.strip():
+            raise HTTPException(status_code=400, detail=f"No text could be extracted from the images: {page_texts[0]}")
+        
+        # Parse the merged text once
+        topics_cache_hit, sections, changes = False, None, None
+        if use_mock:
+            structured_data = {"Image Content": [extracted_text[:100] + "...", "Additional topics"]}
+        else:
+            structured_data, sections, topics_cache_hit, changes = await _parse_sections(extracted_text, previous)
+        
+        response_data = await _store_syllabus(
+            "image", extracted_text, structured_data,
+            confidence_score=0.7,  # OCR text is the least reliable input
+            topics_cache_hit=topics_cache_hit, text_cache_hit=text_cache_hit,
+            sections=sections, previous=previous, changes=changes
+        )
+        
+        message = _parse_message(
+            f"Image syllabus ({len(files) - len(failed)} of {len(files)} images)", response_data
+        )
+        if failed:
+            message += f". No text found in: {', '.join(failed)}"
+        return create_success_response(data=response_data.dict(), message=message)
+        
+    except HTTPException:
+        raise
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ExecutorBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ExecutorTimeoutError:
+        raise HTTPException(status_code=504, detail="Image processing took too long")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"PDF parsing failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Image parsing failed: {str(e)}")
 
 @router.get("/{syllabus_id}", response_model=SuccessResponse)
 async def get_syllabus(syllabus_id: str):
     """
     Retrieve a specific syllabus by ID
     """
-    if syllabus_id not in _syllabus_storage:
+    syllabus_data = await syllabus_repository.get_syllabus_data(syllabus_id)
+    if syllabus_data is None:
         raise HTTPException(status_code=404, detail="Syllabus not found")
     
-    syllabus_data = _syllabus_storage[syllabus_id]["syllabus_data"]
-    
     return create_success_response(
         data=syllabus_data,
         message="Syllabus retrieved successfully"
@@ -230,7 +452,7 @@ async def generate_flashcards(request: FlashcardRequest):
                 flashcards.append(flashcard)
         else:
             # Generate flashcards using LLM utils
-            llm_response = llm_utils.generate_flashcards(request.topic, request.num_cards)
+            llm_response = await run_io(llm_utils.generate_flashcards, request.topic, request.num_cards)
             
             # Parse flashcards from LLM response
             import json
@@ -0,0 +1,41 @@
+"""
+kv_stand_in.py
+Runs the local Redis-protocol stand-in (utils/state_utils.KVStandInServer)
+so several API workers can share state with STATE_BACKEND=redis without a
+Redis install. Development and tests only: one database, nothing persisted.
+
+Usage (from the Backend directory):
+    python scripts/kv_stand_in.py               # listens on 127.0.0.1:6379
+    python scripts/kv_stand_in.py --port 6380
+Then start the API with STATE_BACKEND=redis and STATE_REDIS_URL set to the printed URL.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.state_utils import KVStandInServer  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on")
+    parser.add_argument("--port", type=int, default=6379, help="Port to listen on")
+    args = parser.parse_args()
+
+    server = KVStandInServer(args.host, args.port).start()
+    print(f"KV stand-in listening on {server.url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
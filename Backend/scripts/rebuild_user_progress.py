@@ -0,0 +1,51 @@
+"""
+rebuild_user_progress.py
+Backfill job that rebuilds the user_progress rollups from quiz_attempts.
+Quiz submissions keep the rollups up to date incrementally; run this once
+for attempts stored before the rollups existed, or to repair rollups after
+a failed write. Quiz counters, per-topic accuracy and streaks are
+recomputed; study plan minutes and sessions are kept as they are.
+
+Usage (from the Backend directory):
+    python scripts/rebuild_user_progress.py              # every user
+    python scripts/rebuild_user_progress.py --user-id U  # one user
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv  # noqa: E402
+
+load_dotenv()
+
+from database import close_mongo_connection, connect_to_mongo  # noqa: E402
+from repositories.progress_repository import progress_repository  # noqa: E402
+
+
+async def rebuild(user_id):
+    await connect_to_mongo()
+    try:
+        started = time.perf_counter()
+        users = await progress_repository.rebuild_from_attempts(user_id)
+        print(f"Rebuilt progress for {users} user(s) in {time.perf_counter() - started:.1f}s")
+    finally:
+        await close_mongo_connection()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user-id", help="Only rebuild this user")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(rebuild(args.user_id))
+
+
+if __name__ == "__main__":
+    main()
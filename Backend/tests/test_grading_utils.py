@@ -0,0 +1,43 @@
+"""
+test_grading_utils.py
+Checks for vectorized quiz grading and item statistics (run from the Backend directory: python -m pytest tests)
+"""
+
+import numpy as np
+
+from utils.grading_utils import grade_submissions, item_statistics
+
+
+def test_grade_submissions_against_each_quiz_key():
+    keys = [["A", "B", "C"], ["D"]]
+    correct = grade_submissions(keys, [0, 1, 0], [["A", "C", "C"], ["D"], ["B", "B", "A"]])
+    assert correct.tolist() == [
+        [True, False, True],
+        [True, False, False],
+        [False, True, False],
+    ]
+
+
+def test_padding_is_never_correct():
+    # An empty answer in the padding must not match the empty padding of the key
+    correct = grade_submissions([["A", "B"], ["C"]], [1], [["C"]])
+    assert correct.shape == (1, 2)
+    assert correct.tolist() == [[True, False]]
+
+
+def test_item_statistics():
+    correct = np.array([
+        [True, True, False],
+        [True, False, False],
+        [True, True, True],
+        [False, False, False],
+    ])
+    difficulty, discrimination = item_statistics(correct, group_fraction=0.25)
+    assert difficulty.tolist() == [0.75, 0.5, 0.25]
+    assert discrimination.tolist() == [1.0, 1.0, 1.0]
+
+
+def test_item_statistics_without_enough_submissions():
+    difficulty, discrimination = item_statistics(np.array([[True, False]]))
+    assert difficulty.tolist() == [1.0, 0.0]
+    assert discrimination is None
@@ -0,0 +1,24 @@
+"""
+test_quiz_attempt_repository.py
+Checks for the quiz history keyset cursors (run from the Backend directory: python -m pytest tests)
+"""
+
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from repositories.quiz_attempt_repository import InvalidCursorError, decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    created_at, attempt_id = datetime(2024, 5, 1, 12, 30, 15, 250000), ObjectId()
+    cursor = encode_cursor(created_at, attempt_id)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (created_at, attempt_id)
+
+
+@pytest.mark.parametrize("cursor", ["", "not a cursor", encode_cursor(datetime(2024, 5, 1), ObjectId())[:-6]])
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(cursor)
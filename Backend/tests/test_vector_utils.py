@@ -0,0 +1,78 @@
+"""
+test_vector_utils.py
+Checks for VectorDatabase source replacement and persistence (run from the Backend directory: python -m pytest tests)
+"""
+
+import hashlib
+
+import numpy as np
+import pytest
+
+pytest.importorskip("faiss")
+pytest.importorskip("streamlit")
+pytest.importorskip("langchain")
+pytest.importorskip("sentence_transformers")
+
+from utils import vector_utils  # noqa: E402
+
+
+class _HashEngine:
+    """Deterministic stand-in for the embedding model."""
+    dimension = 8
+
+    def encode(self, texts):
+        vectors = np.array([np.frombuffer(hashlib.sha256(text.encode()).digest()[:8], dtype=np.uint8)
+                            for text in texts], dtype=np.float32) + 1.0
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@pytest.fixture
+def database(monkeypatch):
+    monkeypatch.setattr(vector_utils, "get_embedding_engine", lambda *args: _HashEngine())
+    monkeypatch.setattr(vector_utils, "get_query_batcher", lambda *args: _HashEngine())
+    database = vector_utils.VectorDatabase()
+    database.replace_source([f"old chunk {i}" for i in range(4)],
+                            [{"filename": "notes.pdf", "position": i} for i in range(4)], filename="notes.pdf")
+    return database
+
+
+def _snapshot(database):
+    return {chunk_id: (database.documents[chunk_id], database.metadata[chunk_id])
+            for chunk_id in database.find_ids(filename="notes.pdf")}
+
+
+def test_replace_source_stream_keeps_unchanged_chunks(database):
+    before = _snapshot(database)
+    counts = database.replace_source(["old chunk 0", "new chunk"],
+                                     [{"filename": "notes.pdf", "position": 9}] * 2, filename="notes.pdf")
+    assert counts == {"kept": 1, "added": 1, "removed": 3}
+    kept_id = next(chunk_id for chunk_id, (text, _) in before.items() if text == "old chunk 0")
+    assert database.metadata[kept_id]["position"] == 9
+
+
+def test_failing_stream_leaves_source_unchanged(database):
+    before = _snapshot(database)
+
+    def chunks():
+        yield "old chunk 1", {"filename": "notes.pdf", "position": 7}
+        for i in range(5):
+            yield f"new chunk {i}", {"filename": "notes.pdf", "position": i}
+        raise RuntimeError("extraction failed")
+
+    with pytest.raises(RuntimeError):
+        database.replace_source_stream(chunks(), filename="notes.pdf", batch_size=2)
+    assert _snapshot(database) == before
+    assert len(database) == len(before)
+
+
+def test_save_and_load_keep_sparse_metadata(database, tmp_path):
+    database.replace_source([f"old chunk {i}" for i in range(4)] + ["extra chunk"],
+                            [{"filename": "notes.pdf", "position": i} for i in range(4)]
+                            + [{"filename": "notes.pdf", "page": 3}], filename="notes.pdf")
+    before = _snapshot(database)
+    database.save_database(str(tmp_path / "vectors"))
+
+    loaded = vector_utils.VectorDatabase()
+    loaded.load_database(str(tmp_path / "vectors"))
+    assert len(before) == 5 and _snapshot(loaded) == before
+    assert all(loaded.metadata.get_field(chunk_id, "page") == before[chunk_id][1].get("page") for chunk_id in before)
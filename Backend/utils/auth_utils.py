@@ -1,41 +1,48 @@
 """
 Authentication utilities for StudyMentor
 Handles user registration, login, JWT tokens, and password hashing
+User data goes through the async user repository on the shared Motor client
+(database.py), so nothing here touches the network at import time.
 """
 
 import os
+import time
 import jwt
 import bcrypt
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
-from pymongo import MongoClient
 from pymongo.errors import DuplicateKeyError
 from fastapi import HTTPException, status
 from pydantic import BaseModel, EmailStr, Field
 import re
 
-# MongoDB connection (optional for demo mode)
-MONGODB_URL = os.getenv("MONGODB_URL", "mongodb://localhost:27017/")
-try:
-    client = MongoClient(MONGODB_URL, serverSelectionTimeoutMS=5000)  # 5 second timeout
-    # Test connection
-    client.server_info()
-    db = client.studymentor
-    users_collection = db.users
-    MONGODB_AVAILABLE = True
-    print("MongoDB connected successfully")
-except Exception as e:
-    print(f"MongoDB not available, running in demo mode: {e}")
-    MONGODB_AVAILABLE = False
-    client = None
-    db = None
-    users_collection = None
+from repositories.user_repository import USER_LOGIN_PROJECTION, user_repository
+from .executor_utils import ExecutorBusyError, ExecutorTimeoutError, run_bcrypt
+from .store_utils import get_store
 
 # JWT Configuration
 JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-super-secret-jwt-key-change-in-production")
 JWT_ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 1440  # 24 hours
 
+# bcrypt work factor (each +1 doubles hashing time). Hashes with a different
+# cost are upgraded transparently the next time their user logs in.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+# Per-worker caches so authenticated requests skip the database: resolved
+# users by id, and decoded payloads of already-verified tokens. A profile
+# update drops its user from this worker's cache; other workers pick the
+# change up within the principal TTL.
+AUTH_PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("AUTH_PRINCIPAL_CACHE_TTL_SECONDS", "60"))
+AUTH_TOKEN_CACHE_TTL_SECONDS = float(os.getenv("AUTH_TOKEN_CACHE_TTL_SECONDS", "300"))
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))
+PRINCIPAL_CACHE = "auth_principals"
+TOKEN_CACHE = "auth_verified_tokens"
+get_store().configure(PRINCIPAL_CACHE, max_entries=AUTH_CACHE_MAX_ENTRIES, max_bytes=32 * 1024 * 1024,
+                      ttl_seconds=AUTH_PRINCIPAL_CACHE_TTL_SECONDS)
+get_store().configure(TOKEN_CACHE, max_entries=AUTH_CACHE_MAX_ENTRIES, max_bytes=16 * 1024 * 1024,
+                      ttl_seconds=AUTH_TOKEN_CACHE_TTL_SECONDS)
+
 # Pydantic Models
 class UserRegistration(BaseModel):
     full_name: str = Field(..., min_length=2, max_length=100)
@@ -61,9 +68,11 @@ class AuthResponse(BaseModel):
     user: UserResponse
 
 # Password utilities
-def hash_password(password: str) -> str:
-    """Hash a password using bcrypt"""
-    salt = bcrypt.gensalt()
+# The sync versions are CPU-bound (~0.1-0.3 s each at cost 12); async code
+# must use the *_async versions, which run them in the bcrypt worker pool
+def hash_password(password: str, rounds: Optional[int] = None) -> str:
+    """Hash a password using bcrypt (at BCRYPT_ROUNDS unless given)"""
+    salt = bcrypt.gensalt(rounds=rounds or BCRYPT_ROUNDS)
     hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
     return hashed.decode('utf-8')
 
@@ -71,6 +80,21 @@ def verify_password(password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
     return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
 
+async def hash_password_async(password: str) -> str:
+    """Hash a password off the event loop"""
+    return await run_bcrypt(hash_password, password)
+
+async def verify_password_async(password: str, hashed_password: str) -> bool:
+    """Verify a password off the event loop"""
+    return await run_bcrypt(verify_password, password, hashed_password)
+
+def password_needs_rehash(hashed_password: str, rounds: Optional[int] = None) -> bool:
+    """Whether a bcrypt hash ("$2b$<cost>$...") was made with a different cost than configured"""
+    try:
+        return int(hashed_password.split("$")[2]) != (rounds or BCRYPT_ROUNDS)
+    except (IndexError, ValueError):
+        return False
+
 def validate_password_strength(password: str) -> bool:
     """Validate password strength"""
     if len(password) < 6:
@@ -94,33 +118,30 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 def decode_access_token(token: str) -> Optional[Dict]:
-    """Decode and validate JWT token"""
+    """Decode and validate JWT token (verified tokens are cached until they expire)"""
+    payload = get_store().get(TOKEN_CACHE, token)
+    if payload is not None:
+        return payload
     try:
         payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
-        return payload
     except jwt.ExpiredSignatureError:
         return None
-    except jwt.JWTError:
+    except jwt.InvalidTokenError:
         return None
+    # Never cache a token past its own expiry
+    ttl = AUTH_TOKEN_CACHE_TTL_SECONDS
+    if payload.get("exp") is not None:
+        ttl = min(ttl, payload["exp"] - time.time())
+    if ttl > 0:
+        get_store().set(TOKEN_CACHE, token, payload, ttl_seconds=ttl)
+    return payload
 
-# User database operations
-def create_user_in_db(user_data: UserRegistration) -> Dict:
-    """Create a new user in MongoDB or return demo user"""
-    if not MONGODB_AVAILABLE:
-        # Return a demo user for testing
-        return {
-            "_id": "demo_user_id",
-            "full_name": user_data.full_name,
-            "email": user_data.email.lower(),
-            "created_at": datetime.utcnow(),
-            "study_preferences": user_data.study_preferences or {},
-            "study_stats": {"total_study_time": 0, "completed_sessions": 0}
-        }
-    
+# User database operations (MongoDB, or in-memory storage in demo mode)
+async def create_user_in_db(user_data: UserRegistration) -> Dict:
+    """Create a new user"""
     try:
         # Check if user already exists
-        existing_user = users_collection.find_one({"email": user_data.email.lower()})
-        if existing_user:
+        if await user_repository.email_exists(user_data.email):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Email already registered"
@@ -134,7 +155,7 @@ def create_user_in_db(user_data: UserRegistration) -> Dict:
             )
         
         # Hash password
-        hashed_password = hash_password(user_data.password)
+        hashed_password = await hash_password_async(user_data.password)
         
         # Prepare user document
         user_doc = {
@@ -160,8 +181,7 @@ def create_user_in_db(user_data: UserRegistration) -> Dict:
         }
         
         # Insert user
-        result = users_collection.insert_one(user_doc)
-        user_doc["_id"] = result.inserted_id
+        user_doc["_id"] = await user_repository.insert(user_doc)
         
         return user_doc
         
@@ -170,60 +190,73 @@ def create_user_in_db(user_data: UserRegistration) -> Dict:
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
+    except HTTPException:
+        raise
+    except (ExecutorBusyError, ExecutorTimeoutError):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many sign-ups in progress, please retry shortly"
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to create user: {str(e)}"
         )
 
-def authenticate_user(email: str, password: str) -> Optional[Dict]:
+async def authenticate_user(email: str, password: str) -> Optional[Dict]:
     """Authenticate user login"""
     try:
-        user = users_collection.find_one({"email": email.lower()})
+        user = await user_repository.get_by_email(email, USER_LOGIN_PROJECTION)
         if not user:
             return None
         
-        if not verify_password(password, user["password_hash"]):
+        password_hash = user.pop("password_hash")
+        if not await verify_password_async(password, password_hash):
             return None
         
-        # Update last activity
-        users_collection.update_one(
-            {"_id": user["_id"]},
-            {"$set": {"study_stats.last_activity": datetime.utcnow()}}
-        )
+        # The password is known now, so a hash with an outdated cost can be replaced
+        if password_needs_rehash(password_hash):
+            await user_repository.update_fields(user["_id"], {"password_hash": await hash_password_async(password)})
+        
+        # Update last activity (batched; the login doesn't wait for it)
+        user_repository.record_activity(user["_id"])
         
         return user
         
+    except (ExecutorBusyError, ExecutorTimeoutError):
+        # Overloaded, not a wrong password: let the caller answer 503
+        raise
     except Exception as e:
         print(f"Authentication error: {e}")
         return None
 
-def get_user_by_id(user_id: str) -> Optional[Dict]:
-    """Get user by ID"""
+async def get_user_by_id(user_id: str, use_cache: bool = True) -> Optional[Dict]:
+    """Get user by ID (profile fields only), from the principal cache when possible"""
     try:
-        from bson import ObjectId
-        user = users_collection.find_one({"_id": ObjectId(user_id)})
+        if use_cache:
+            user = get_store().get(PRINCIPAL_CACHE, str(user_id))
+            if user is not None:
+                return user
+        user = await user_repository.get_by_id(user_id)
+        if user is not None:
+            get_store().set(PRINCIPAL_CACHE, str(user_id), user)
         return user
     except Exception as e:
         print(f"Get user error: {e}")
         return None
 
-def update_user_profile(user_id: str, update_data: Dict) -> bool:
+async def update_user_profile(user_id: str, update_data: Dict) -> bool:
     """Update user profile"""
     try:
-        from bson import ObjectId
-        
         # Remove sensitive fields that shouldn't be updated directly
         update_data.pop("password_hash", None)
         update_data.pop("_id", None)
         update_data["updated_at"] = datetime.utcnow()
         
-        result = users_collection.update_one(
-            {"_id": ObjectId(user_id)},
-            {"$set": update_data}
-        )
-        
-        return result.modified_count > 0
+        updated = await user_repository.update_fields(user_id, update_data)
+        # Drop the cached principal so the next request sees the new profile
+        get_store().delete(PRINCIPAL_CACHE, str(user_id))
+        return updated
         
     except Exception as e:
         print(f"Update user error: {e}")
@@ -238,20 +271,4 @@ def format_user_response(user_doc: Dict) -> UserResponse:
         created_at=user_doc["created_at"],
         study_preferences=user_doc.get("study_preferences", {}),
         study_stats=user_doc.get("study_stats", {})
-    )
-
-# Initialize database indexes
-def init_db_indexes():
-    """Initialize database indexes for better performance"""
-    try:
-        # Create unique index on email
-        users_collection.create_index("email", unique=True)
-        print("Database indexes initialized successfully")
-    except Exception as e:
-        print(f"Index initialization error: {e}")
-
-# Call this when the module is imported (optional for demo mode)
-try:
-    init_db_indexes()
-except Exception as e:
-    print(f"Warning: Database not available, running in demo mode: {e}")
\ No newline at end of file
+    )
\ No newline at end of file
@@ -0,0 +1,102 @@
+"""
+cache_utils.py
+Content-addressed cache for syllabus uploads and parse results.
+Byte-identical uploads (same SHA-256) reuse the extracted text, and identical
+text reuses the parsed topics, so repeats skip extraction, OCR and the LLM call.
+"""
+
+import hashlib
+import os
+from typing import Any, Dict, Optional, Union
+
+from .store_utils import BoundedStore, get_store
+
+# Entries kept per namespace before the least recently used are evicted
+CONTENT_CACHE_MAX_ENTRIES = int(os.getenv("CONTENT_CACHE_MAX_ENTRIES", "512"))
+# Approximate memory cap per namespace (extracted text of large PDFs adds up)
+CONTENT_CACHE_MAX_BYTES = int(os.getenv("CONTENT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# Results are reused for this long; 0 keeps them until evicted
+CONTENT_CACHE_TTL_SECONDS = float(os.getenv("CONTENT_CACHE_TTL_SECONDS", str(24 * 3600)))
+
+# Namespaces
+EXTRACTED_TEXT = "extracted_text"      # sha256(upload bytes) -> extracted text
+STRUCTURED_TOPICS = "structured_topics"  # sha256(syllabus text) -> structured topics
+
+
+def content_hash(content: Union[bytes, str]) -> str:
+    """
+    SHA-256 hex digest of uploaded bytes or of text (UTF-8, surrounding whitespace stripped).
+
+    Args:
+        content: Raw upload bytes or syllabus text
+
+    Returns:
+        str: Hex digest used as cache key
+    """
+    if isinstance(content, str):
+        content = content.strip().encode("utf-8")
+    return hashlib.sha256(content).hexdigest()
+
+
+class ContentCache:
+    """
+    Content-addressed cache partitioned into namespaces, kept in the bounded
+    store (LRU, size-capped, TTL). Values are copied on the way in and out so
+    callers can't mutate cached entries.
+    """
+
+    def __init__(self, store: BoundedStore, max_entries: int = CONTENT_CACHE_MAX_ENTRIES,
+                 max_bytes: int = CONTENT_CACHE_MAX_BYTES, ttl_seconds: float = CONTENT_CACHE_TTL_SECONDS):
+        """
+        Args:
+            store: Store holding the entries
+            max_entries: Maximum entries per namespace
+            max_bytes: Maximum approximate size per namespace
+            ttl_seconds: Time to live of an entry (0 for no expiry)
+        """
+        self.store = store
+        self.namespaces = (EXTRACTED_TEXT, STRUCTURED_TOPICS)
+        for namespace in self.namespaces:
+            store.configure(namespace, max_entries=max_entries, max_bytes=max_bytes,
+                            ttl_seconds=ttl_seconds or None)
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        """
+        Look up a cached value.
+
+        Args:
+            namespace: Cache namespace (e.g. EXTRACTED_TEXT)
+            key: Content hash
+
+        Returns:
+            A copy of the cached value, or None on a miss
+        """
+        return self.store.get(namespace, key)
+
+    def set(self, namespace: str, key: str, value: Any):
+        """
+        Store a value, evicting the least recently used entries of the namespace if full.
+
+        Args:
+            namespace: Cache namespace
+            key: Content hash
+            value: Value to cache
+        """
+        self.store.set(namespace, key, value)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Return size and hit/miss/eviction counters per namespace."""
+        return {namespace: self.store.stats(namespace).get(namespace, {}) for namespace in self.namespaces}
+
+
+_content_cache = ContentCache(get_store())
+
+
+def get_content_cache() -> ContentCache:
+    """
+    Get the process-wide content cache.
+
+    Returns:
+        ContentCache instance
+    """
+    return _content_cache
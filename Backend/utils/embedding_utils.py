@@ -0,0 +1,217 @@
+"""
+embedding_utils.py
+CPU-optimized sentence embedding engines and a micro-batching queue for query embeddings.
+
+Backends (select with the EMBEDDING_BACKEND environment variable):
+- "torch": plain sentence-transformers model (reference implementation)
+- "onnx":  ONNX Runtime via sentence-transformers' ONNX backend; set
+           EMBEDDING_ONNX_FILE (e.g. "onnx/model_qint8_avx2.onnx") to use a
+           pre-quantized graph. Requires: pip install "sentence-transformers[onnx]"
+- "int8":  PyTorch model with Linear layers dynamically quantized to int8
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+EMBEDDING_BACKENDS = ("torch", "onnx", "int8")
+
+DEFAULT_EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE")
+EMBEDDING_BATCH_MAX_SIZE = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "32"))
+EMBEDDING_BATCH_MAX_WAIT_MS = float(os.getenv("EMBEDDING_BATCH_MAX_WAIT_MS", "5"))
+
+
+class EmbeddingEngine:
+    """
+    A sentence embedding model running on one of the CPU backends.
+    """
+
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2", backend: str = DEFAULT_EMBEDDING_BACKEND):
+        """
+        Load the model for the requested backend.
+
+        Args:
+            model_name: Name of the sentence transformer model to use
+            backend: One of EMBEDDING_BACKENDS
+        """
+        if backend not in EMBEDDING_BACKENDS:
+            raise ValueError(f"Unknown embedding backend '{backend}'. Use one of: {', '.join(EMBEDDING_BACKENDS)}")
+
+        self.model_name = model_name
+        self.backend = backend
+
+        if backend == "onnx":
+            model_kwargs = {"file_name": EMBEDDING_ONNX_FILE} if EMBEDDING_ONNX_FILE else None
+            self.model = SentenceTransformer(model_name, backend="onnx", model_kwargs=model_kwargs)
+        else:
+            self.model = SentenceTransformer(model_name, device="cpu")
+            if backend == "int8":
+                import torch
+                self.model = torch.quantization.quantize_dynamic(
+                    self.model, {torch.nn.Linear}, dtype=torch.qint8
+                )
+
+        self.dimension = self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts: List[str], batch_size: int = 64) -> np.ndarray:
+        """
+        Create L2-normalized float32 embeddings for a list of texts.
+
+        Args:
+            texts: List of texts
+            batch_size: Encoder batch size
+
+        Returns:
+            Numpy array of shape (len(texts), dimension)
+        """
+        embeddings = self.model.encode(
+            texts, batch_size=batch_size, convert_to_numpy=True, normalize_embeddings=True
+        )
+        return np.ascontiguousarray(embeddings, dtype=np.float32)
+
+
+class MicroBatcher:
+    """
+    Collects concurrent single-text embedding requests for a few milliseconds
+    and encodes them as one batch on a dedicated worker thread.
+    """
+
+    def __init__(self, encode_fn: Callable[[List[str]], np.ndarray],
+                 max_batch_size: int = EMBEDDING_BATCH_MAX_SIZE,
+                 max_wait_ms: float = EMBEDDING_BATCH_MAX_WAIT_MS):
+        """
+        Args:
+            encode_fn: Function embedding a list of texts into a 2-D array
+            max_batch_size: Maximum number of texts encoded together
+            max_wait_ms: How long the first request in a batch waits for company
+        """
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._stats = {"requests": 0, "batches": 0, "max_batch_size": 0}
+        self._worker = threading.Thread(target=self._run, name="embedding-microbatcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, text: str) -> Future:
+        """
+        Queue one text for embedding.
+
+        Args:
+            text: Text to embed
+
+        Returns:
+            Future resolving to a 1-D embedding vector
+        """
+        future: Future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed texts through the batching queue, blocking until done.
+
+        Args:
+            texts: List of texts
+
+        Returns:
+            Numpy array of embeddings
+        """
+        futures = [self.submit(text) for text in texts]
+        return np.vstack([future.result() for future in futures])
+
+    def stats(self) -> Dict[str, float]:
+        """Return request/batch counters for monitoring and benchmarks."""
+        stats = dict(self._stats)
+        stats["avg_batch_size"] = stats["requests"] / stats["batches"] if stats["batches"] else 0.0
+        stats["queue_depth"] = self._queue.qsize()
+        return stats
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            texts = [text for text, _ in batch]
+            try:
+                embeddings = self.encode_fn(texts)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            for (_, future), embedding in zip(batch, embeddings):
+                future.set_result(embedding)
+
+            self._stats["requests"] += len(batch)
+            self._stats["batches"] += 1
+            self._stats["max_batch_size"] = max(self._stats["max_batch_size"], len(batch))
+
+
+# Process-wide engines, one per (model, backend)
+_engines: Dict[tuple, EmbeddingEngine] = {}
+_batchers: Dict[tuple, MicroBatcher] = {}
+_engines_lock = threading.Lock()
+
+
+def get_embedding_engine(model_name: str = "all-MiniLM-L6-v2",
+                         backend: Optional[str] = None) -> EmbeddingEngine:
+    """
+    Get or create the shared embedding engine for a model and backend.
+
+    Falls back to the reference "torch" backend if the optimized one cannot be loaded.
+
+    Args:
+        model_name: Name of the sentence transformer model to use
+        backend: One of EMBEDDING_BACKENDS (defaults to EMBEDDING_BACKEND)
+
+    Returns:
+        EmbeddingEngine instance
+    """
+    backend = backend or DEFAULT_EMBEDDING_BACKEND
+    key = (model_name, backend)
+    with _engines_lock:
+        if key not in _engines:
+            try:
+                _engines[key] = EmbeddingEngine(model_name, backend)
+            except Exception as e:
+                if backend == "torch":
+                    raise
+                print(f"Embedding backend '{backend}' unavailable, falling back to 'torch': {e}")
+                _engines[key] = _engines.get((model_name, "torch")) or EmbeddingEngine(model_name, "torch")
+        return _engines[key]
+
+
+def get_query_batcher(model_name: str = "all-MiniLM-L6-v2",
+                      backend: Optional[str] = None) -> MicroBatcher:
+    """
+    Get or create the shared micro-batching queue for query embeddings.
+
+    Args:
+        model_name: Name of the sentence transformer model to use
+        backend: One of EMBEDDING_BACKENDS (defaults to EMBEDDING_BACKEND)
+
+    Returns:
+        MicroBatcher instance
+    """
+    engine = get_embedding_engine(model_name, backend)
+    key = (engine.model_name, engine.backend)
+    with _engines_lock:
+        if key not in _batchers:
+            _batchers[key] = MicroBatcher(engine.encode)
+        return _batchers[key]
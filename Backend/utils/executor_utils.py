@@ -0,0 +1,337 @@
+"""
+executor_utils.py
+Shared executors that keep blocking work off the asyncio event loop.
+
+- "cpu": process pool for OCR and PDF parsing (CPU-bound, GIL-heavy)
+- "io":  thread pool for blocking SDK calls (LLM providers, Google Calendar)
+- "bcrypt": thread pool for password hashing (bcrypt releases the GIL while
+  hashing, so threads run in parallel without pickling overhead)
+- "state": thread pool for the shared state backends (SQLite file, Redis
+  socket), whose calls and lock waits block
+
+Each executor admits at most workers + queue size tasks at once and rejects
+the rest with ExecutorBusyError instead of queueing without bound, enforces a
+per-task timeout, and keeps queue-wait/run-time metrics. A task holds its
+slot until the pool is done with it, even if the caller timed out or was
+cancelled, so admission bounds the work actually running.
+"""
+
+import asyncio
+import functools
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from concurrent.futures.thread import BrokenThreadPool
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+_cpu_count = os.cpu_count() or 2
+
+EXECUTOR_CPU_WORKERS = int(os.getenv("EXECUTOR_CPU_WORKERS", str(max(1, _cpu_count - 1))))
+EXECUTOR_CPU_QUEUE_SIZE = int(os.getenv("EXECUTOR_CPU_QUEUE_SIZE", "32"))
+EXECUTOR_CPU_TIMEOUT_SECONDS = float(os.getenv("EXECUTOR_CPU_TIMEOUT_SECONDS", "120"))
+
+EXECUTOR_IO_WORKERS = int(os.getenv("EXECUTOR_IO_WORKERS", str(min(32, _cpu_count * 4))))
+EXECUTOR_IO_QUEUE_SIZE = int(os.getenv("EXECUTOR_IO_QUEUE_SIZE", "128"))
+EXECUTOR_IO_TIMEOUT_SECONDS = float(os.getenv("EXECUTOR_IO_TIMEOUT_SECONDS", "60"))
+
+# Kept separate from "io" so a login storm can't starve LLM calls (or the reverse)
+EXECUTOR_BCRYPT_WORKERS = int(os.getenv("EXECUTOR_BCRYPT_WORKERS", str(_cpu_count)))
+EXECUTOR_BCRYPT_QUEUE_SIZE = int(os.getenv("EXECUTOR_BCRYPT_QUEUE_SIZE", "64"))
+EXECUTOR_BCRYPT_TIMEOUT_SECONDS = float(os.getenv("EXECUTOR_BCRYPT_TIMEOUT_SECONDS", "10"))
+
+# Short shared-state calls, kept apart from "io" so they don't wait behind slow LLM calls
+EXECUTOR_STATE_WORKERS = int(os.getenv("EXECUTOR_STATE_WORKERS", str(min(16, _cpu_count * 2))))
+EXECUTOR_STATE_QUEUE_SIZE = int(os.getenv("EXECUTOR_STATE_QUEUE_SIZE", "512"))
+EXECUTOR_STATE_TIMEOUT_SECONDS = float(os.getenv("EXECUTOR_STATE_TIMEOUT_SECONDS", "30"))
+
+# True inside the "cpu" pool's worker processes, where starting another pool would nest
+_IN_WORKER_PROCESS = False
+
+
+class ExecutorBusyError(RuntimeError):
+    """Raised when an executor's queue is full and the task was not accepted."""
+
+
+class ExecutorTimeoutError(TimeoutError):
+    """Raised when a task exceeds its timeout."""
+
+
+def _init_worker_process(initializers: Tuple[Callable, ...]):
+    global _IN_WORKER_PROCESS
+    _IN_WORKER_PROCESS = True
+    for initializer in initializers:
+        try:
+            initializer()
+        except Exception as e:
+            print(f"Worker initializer {getattr(initializer, '__name__', initializer)} failed: {e}")
+
+
+def _ready() -> bool:
+    return True
+
+
+def in_worker_process() -> bool:
+    """Whether the caller runs inside a "cpu" pool worker process."""
+    return _IN_WORKER_PROCESS
+
+
+def _timed_call(fn: Callable, args: tuple, kwargs: dict):
+    # Wall-clock timestamps, so they compare across processes
+    started = time.time()
+    result = fn(*args, **kwargs)
+    return started, time.time() - started, result
+
+
+class ManagedExecutor:
+    """
+    A thread or process pool with admission control, timeouts and metrics.
+    """
+
+    def __init__(self, name: str, kind: str, max_workers: int, max_queue: int, timeout: float):
+        """
+        Args:
+            name: Name used in metrics and thread/process names
+            kind: "process" or "thread"
+            max_workers: Pool size
+            max_queue: Tasks allowed to wait for a free worker
+            timeout: Default per-task timeout in seconds
+        """
+        self.name = name
+        self.kind = kind
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._executor: Optional[Executor] = None
+        self._initializers: List[Callable] = []
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._stats = {
+            "submitted": 0, "completed": 0, "failed": 0, "cancelled": 0, "rejected": 0, "timed_out": 0,
+            "peak_in_flight": 0, "queue_wait_seconds": 0.0, "run_seconds": 0.0, "max_run_seconds": 0.0,
+        }
+
+    @property
+    def executor(self) -> Executor:
+        """The underlying concurrent.futures executor, created on first use."""
+        with self._lock:
+            if self._executor is None:
+                if self.kind == "process":
+                    # "spawn": the parent holds threads (torch, EasyOCR, this pool's
+                    # feeders) that don't survive fork()
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.max_workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                        initializer=_init_worker_process,
+                        initargs=(tuple(self._initializers),),
+                    )
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name)
+            return self._executor
+
+    def add_initializer(self, fn: Callable):
+        """
+        Run fn in every worker process of this pool when it starts.
+        Only affects pools created afterwards, so register at import time.
+
+        Args:
+            fn: Module-level, argument-less function (pickled by reference)
+        """
+        with self._lock:
+            self._initializers.append(fn)
+
+    def prestart(self):
+        """
+        Start every worker process now instead of on first use (process pools
+        spawn workers on demand), so their initializers run before the first
+        request arrives.
+        """
+        if self.kind != "process":
+            return
+        executor = self.executor
+        # Submitted together, each task finds no idle worker and spawns a new one
+        for future in [executor.submit(_ready) for _ in range(self.max_workers)]:
+            future.add_done_callback(lambda f: f.exception())
+
+    def _admit(self):
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_queue:
+                self._stats["rejected"] += 1
+                raise ExecutorBusyError(f"The {self.name} executor is at capacity, please retry shortly")
+            self._in_flight += 1
+            self._stats["submitted"] += 1
+            self._stats["peak_in_flight"] = max(self._stats["peak_in_flight"], self._in_flight)
+
+    def _submit(self, fn: Callable, args: tuple, kwargs: dict) -> Future:
+        # The slot taken here is released when the pool finishes the task (or drops
+        # it unstarted), not when the caller stops waiting, so abandoned work still counts
+        self._admit()
+        submitted = time.time()
+        try:
+            future = self.executor.submit(_timed_call, fn, args, kwargs)
+        except BaseException:
+            self._record("failed")
+            raise
+        future.add_done_callback(functools.partial(self._on_done, submitted))
+        return future
+
+    def _on_done(self, submitted: float, future: Future):
+        if future.cancelled():
+            self._record("cancelled")
+        elif future.exception() is not None:
+            self._record("failed")
+        else:
+            started, run_seconds, _ = future.result()
+            self._record("completed", max(0.0, started - submitted), run_seconds)
+
+    async def run(self, fn: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """
+        Run a blocking function on the pool and await its result.
+
+        Args:
+            fn: Function to run (module-level and picklable for the process pool)
+            *args: Positional arguments for fn
+            timeout: Seconds to wait before giving up (defaults to the executor's timeout).
+                A timed-out or cancelled task that has started is abandoned, not
+                interrupted, and keeps its slot until it finishes.
+            **kwargs: Keyword arguments for fn
+
+        Returns:
+            The function's return value
+        """
+        future = self._submit(fn, args, kwargs)
+        try:
+            _, _, result = await asyncio.wait_for(asyncio.wrap_future(future), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self._stats["timed_out"] += 1
+            raise ExecutorTimeoutError(f"{getattr(fn, '__name__', 'task')} timed out on the {self.name} executor")
+        except (BrokenProcessPool, BrokenThreadPool):
+            # A crashed worker breaks the whole pool; drop it so the next task gets a fresh one
+            self.shutdown()
+            raise
+        return result
+
+    def map(self, fn: Callable, items) -> list:
+        """
+        Blocking, order-preserving map over the pool for synchronous callers.
+        Every item takes an admission slot; if the pool can't take them all,
+        the items already queued are cancelled and ExecutorBusyError is raised.
+
+        Args:
+            fn: Function to apply
+            items: Iterable of single arguments
+
+        Returns:
+            list: Results in input order
+        """
+        futures = []
+        try:
+            for item in items:
+                futures.append(self._submit(fn, (item,), {}))
+            deadline = time.monotonic() + self.timeout
+            return [future.result(timeout=max(0.0, deadline - time.monotonic()))[2] for future in futures]
+        except FuturesTimeoutError:
+            with self._lock:
+                self._stats["timed_out"] += 1
+            raise ExecutorTimeoutError(f"{getattr(fn, '__name__', 'task')} timed out on the {self.name} executor")
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def _record(self, outcome: str, queue_wait: float = 0.0, run_seconds: float = 0.0):
+        with self._lock:
+            self._in_flight -= 1
+            self._stats[outcome] += 1
+            self._stats["queue_wait_seconds"] += queue_wait
+            self._stats["run_seconds"] += run_seconds
+            self._stats["max_run_seconds"] = max(self._stats["max_run_seconds"], run_seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return task counters, current load and average queue wait/run time."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = self._in_flight
+        # Tasks admitted but still waiting for a free worker
+        stats["queue_depth"] = max(0, stats["in_flight"] - self.max_workers)
+        completed = stats["completed"] or 1
+        stats["avg_queue_wait_ms"] = stats.pop("queue_wait_seconds") / completed * 1000.0
+        stats["avg_run_ms"] = stats.pop("run_seconds") / completed * 1000.0
+        stats["max_run_ms"] = stats.pop("max_run_seconds") * 1000.0
+        stats.update(kind=self.kind, max_workers=self.max_workers, max_queue=self.max_queue)
+        return stats
+
+    def shutdown(self):
+        """Stop the pool; a later task creates a fresh one."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+_executors = {
+    "cpu": ManagedExecutor("cpu", "process", EXECUTOR_CPU_WORKERS, EXECUTOR_CPU_QUEUE_SIZE,
+                           EXECUTOR_CPU_TIMEOUT_SECONDS),
+    "io": ManagedExecutor("io", "thread", EXECUTOR_IO_WORKERS, EXECUTOR_IO_QUEUE_SIZE,
+                          EXECUTOR_IO_TIMEOUT_SECONDS),
+    "bcrypt": ManagedExecutor("bcrypt", "thread", EXECUTOR_BCRYPT_WORKERS, EXECUTOR_BCRYPT_QUEUE_SIZE,
+                              EXECUTOR_BCRYPT_TIMEOUT_SECONDS),
+    "state": ManagedExecutor("state", "thread", EXECUTOR_STATE_WORKERS, EXECUTOR_STATE_QUEUE_SIZE,
+                             EXECUTOR_STATE_TIMEOUT_SECONDS),
+}
+
+
+def get_executor(name: str) -> ManagedExecutor:
+    """
+    Get a shared executor.
+
+    Args:
+        name: "cpu", "io", "bcrypt" or "state"
+
+    Returns:
+        ManagedExecutor instance
+    """
+    return _executors[name]
+
+
+async def run_cpu(fn: Callable, *args, **kwargs) -> Any:
+    """Run a CPU-bound function in the process pool (see ManagedExecutor.run)."""
+    return await _executors["cpu"].run(fn, *args, **kwargs)
+
+
+async def run_io(fn: Callable, *args, **kwargs) -> Any:
+    """Run a blocking I/O or SDK call in the thread pool (see ManagedExecutor.run)."""
+    return await _executors["io"].run(fn, *args, **kwargs)
+
+
+async def run_bcrypt(fn: Callable, *args, **kwargs) -> Any:
+    """Run password hashing or verification in the bcrypt pool (see ManagedExecutor.run)."""
+    return await _executors["bcrypt"].run(fn, *args, **kwargs)
+
+
+async def run_state(fn: Callable, *args, **kwargs) -> Any:
+    """Run a shared state backend call in the state pool (see ManagedExecutor.run)."""
+    return await _executors["state"].run(fn, *args, **kwargs)
+
+
+def start_executors():
+    """Create the pools and start their workers up front so the first request doesn't pay for worker start-up."""
+    for executor in _executors.values():
+        if executor.kind == "process":
+            executor.prestart()
+        else:
+            executor.executor
+
+
+def shutdown_executors():
+    """Shut down all pools."""
+    for executor in _executors.values():
+        executor.shutdown()
+
+
+def executor_stats() -> Dict[str, Dict[str, Any]]:
+    """Return metrics for every shared executor."""
+    return {name: executor.stats() for name, executor in _executors.items()}
@@ -0,0 +1,66 @@
+"""
+grading_utils.py
+Vectorized grading of many quiz submissions at once. Answer keys of every
+quiz in a batch are stacked into one padded matrix, so grading the whole
+batch is a single elementwise comparison against the key row of each
+submission's quiz. Item statistics (difficulty and discrimination indices)
+are computed from the same correctness matrix.
+"""
+
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+# Share of submissions in each of the upper and lower scoring groups used
+# for the discrimination index (27% is the conventional choice)
+DISCRIMINATION_GROUP_FRACTION = 0.27
+
+
+def _padded(rows: Sequence[Sequence[str]], width: int) -> np.ndarray:
+    return np.array([list(row) + [""] * (width - len(row)) for row in rows], dtype=str).reshape(len(rows), width)
+
+
+def grade_submissions(answer_keys: Sequence[Sequence[str]], quiz_index: Sequence[int],
+                      answers: Sequence[Sequence[str]]) -> np.ndarray:
+    """
+    Grade submissions against their quizzes' answer keys.
+
+    Args:
+        answer_keys: Correct answers per quiz (quizzes may differ in length)
+        quiz_index: For each submission, the position of its quiz in answer_keys
+        answers: Submitted answers; each as long as its quiz's key
+
+    Returns:
+        np.ndarray: Boolean matrix (submissions x longest quiz); padding
+        beyond a quiz's last question is False
+    """
+    width = max((len(key) for key in answer_keys), default=0)
+    keys = _padded(answer_keys, width)
+    asked = np.arange(width) < np.array([len(key) for key in answer_keys])[:, None]
+    index = np.asarray(quiz_index, dtype=np.intp)
+    return (_padded(answers, width) == keys[index]) & asked[index]
+
+
+def item_statistics(correct: np.ndarray,
+                    group_fraction: float = DISCRIMINATION_GROUP_FRACTION) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Classical item analysis for one quiz.
+
+    Args:
+        correct: Boolean matrix (submissions x questions)
+        group_fraction: Size of the upper and lower groups as a share of submissions
+
+    Returns:
+        (difficulty, discrimination): per question, the share of submissions
+        answering correctly, and that share in the top-scoring group minus
+        the bottom-scoring group (None with fewer than two submissions)
+    """
+    difficulty = correct.mean(axis=0)
+    count = correct.shape[0]
+    if count < 2:
+        return difficulty, None
+    group = max(1, int(round(count * group_fraction)))
+    # Stable sort so ties keep submission order and the result is reproducible
+    order = np.argsort(correct.sum(axis=1), kind="stable")
+    discrimination = correct[order[-group:]].mean(axis=0) - correct[order[:group]].mean(axis=0)
+    return difficulty, discrimination
@@ -21,8 +21,7 @@ SWITCHING BETWEEN LLM PROVIDERS:
 from langchain_groq import ChatGroq
 import dotenv
 import os
-import PyPDF2
-import tempfile
+import io
 from PIL import Image
 import numpy as np
 
@@ -33,18 +32,19 @@ try:
 except ImportError:
     PYTESSERACT_AVAILABLE = False
 
-try:
-    import easyocr
-    EASYOCR_AVAILABLE = True
-except ImportError:
-    EASYOCR_AVAILABLE = False
-
 try:
     import cv2
     OPENCV_AVAILABLE = True
 except ImportError:
     OPENCV_AVAILABLE = False
 
+import asyncio
+
+from .executor_utils import run_cpu, run_io
+from .ocr_utils import (
+    EASYOCR_AVAILABLE, get_ocr_pool, ocr_image_bytes, ocr_images_parallel, preprocess_for_ocr, split_pdf_pages, tesseract_best_text
+)
+
 dotenv.load_dotenv()
 
 # Groq Configuration (Currently Active)
@@ -82,59 +82,116 @@ llm = ChatGoogleGenerativeAI(
 
 
 # llm = ChatGroq(api_key=groq_api_key, model='gemma2-9b-it')
-def extract_text_from_pdf(pdf_path: str) -> str:
+def _read_pdf_bytes(pdf_source) -> bytes:
+    """Return the raw bytes of a PDF given as bytes, a path or a binary file-like object."""
+    if isinstance(pdf_source, (bytes, bytearray, memoryview)):
+        return bytes(pdf_source)
+    if isinstance(pdf_source, (str, os.PathLike)):
+        with open(pdf_source, "rb") as f:
+            return f.read()
+    return pdf_source.getvalue() if hasattr(pdf_source, "getvalue") else pdf_source.read()
+
+def _merge_ocr_pages(page_texts: list, scanned: list, ocr_texts: list) -> list:
+    """Put OCR results for scanned pages back in their place, keeping page order."""
+    for (index, _), text in zip(scanned, ocr_texts):
+        if text.strip():
+            page_texts[index] = text.strip() + "\n"
+    return page_texts
+
+def extract_pdf_pages(pdf_source, ocr_scanned_pages: bool = True) -> list:
+    """
+    Extracts the text of each PDF page. Pages with a text layer take the fast
+    PyPDF2 path; image-only (scanned) pages are OCR'd in parallel worker processes.
+    Args:
+        pdf_source: Path to the PDF file, the PDF bytes, or a binary file-like object
+        ocr_scanned_pages (bool): OCR pages without a usable text layer
+    Returns:
+        list: Text per page, in page order
+    """
+    # Read straight from memory - no temp file round trip
+    ocr_scanned_pages = ocr_scanned_pages and (PYTESSERACT_AVAILABLE or EASYOCR_AVAILABLE)
+    page_texts, scanned = split_pdf_pages(_read_pdf_bytes(pdf_source), rasterize_scanned=ocr_scanned_pages)
+    # All scanned pages run at once, so the PDF takes about as long as its slowest page
+    ocr_texts = ocr_images_parallel([image for _, image in scanned])
+    return _merge_ocr_pages(page_texts, scanned, ocr_texts)
+
+def extract_text_from_pdf(pdf_source) -> str:
     """
-    Extracts all text from a PDF file.
+    Extracts all text from a PDF file, OCR-ing scanned pages.
     Args:
-        pdf_path (str): Path to the PDF file
+        pdf_source: Path to the PDF file, the PDF bytes, or a binary file-like object
     Returns:
         str: Extracted text
     """
-    text = ""
-    with open(pdf_path, "rb") as f:
-        reader = PyPDF2.PdfReader(f)
-        for page in reader.pages:
-            text += page.extract_text() or ""
-    return text
+    # Join once instead of repeated string concatenation (quadratic on large PDFs)
+    return "".join(extract_pdf_pages(pdf_source))
 
-def preprocess_image_for_ocr(image_path: str) -> str:
+async def extract_text_from_pdf_async(pdf_source) -> str:
+    """
+    Async variant of extract_text_from_pdf for request handlers: parsing and
+    OCR run on the "cpu" worker processes so the event loop stays free.
+    Args:
+        pdf_source: Path to the PDF file, the PDF bytes, or a binary file-like object
+    Returns:
+        str: Extracted text
+    """
+    rasterize = PYTESSERACT_AVAILABLE or EASYOCR_AVAILABLE
+    # A path is handed over as is, so the worker reads the file instead of this process
+    source = os.fspath(pdf_source) if isinstance(pdf_source, (str, os.PathLike)) else _read_pdf_bytes(pdf_source)
+    page_texts, scanned = await run_cpu(split_pdf_pages, source, rasterize)
+    # One task per scanned page, gathered in page order
+    ocr_texts = await asyncio.gather(*(run_cpu(ocr_image_bytes, image) for _, image in scanned))
+    return "".join(_merge_ocr_pages(page_texts, scanned, ocr_texts))
+
+def decode_image(image_bytes: bytes) -> np.ndarray:
+    """
+    Decode an encoded image (PNG, JPEG, ...) held in memory.
+    Args:
+        image_bytes (bytes): Encoded image data
+    Returns:
+        np.ndarray: Decoded image (BGR with OpenCV, RGB with the PIL fallback)
+    """
+    if OPENCV_AVAILABLE:
+        image = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            raise ValueError("Unsupported or corrupt image data")
+        return image
+    return np.array(Image.open(io.BytesIO(image_bytes)).convert("RGB"))
+
+def _as_image_array(image) -> np.ndarray:
+    """Accept a numpy image, encoded image bytes or a file path and return a numpy image."""
+    if isinstance(image, np.ndarray):
+        return image
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return decode_image(bytes(image))
+    with open(image, "rb") as f:
+        return decode_image(f.read())
+
+def preprocess_image_for_ocr(image) -> np.ndarray:
     """
     Preprocess image for better OCR results using OpenCV.
     Args:
-        image_path (str): Path to the image file
+        image: Decoded image array, encoded image bytes or a file path
     Returns:
-        str: Path to the processed image
+        np.ndarray: The processed image
     """
+    image = _as_image_array(image)
     if not OPENCV_AVAILABLE:
-        return image_path  # Return original if OpenCV not available
+        return image  # Return original if OpenCV not available
     
     try:
-        # Read image
-        img = cv2.imread(image_path)
-        
-        # Convert to grayscale
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        
-        # Apply denoising
-        denoised = cv2.fastNlMeansDenoising(gray)
-        
-        # Apply threshold to get better contrast
-        _, thresh = cv2.threshold(denoised, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-        
-        # Save processed image
-        processed_path = image_path.replace('.', '_processed.')
-        cv2.imwrite(processed_path, thresh)
-        
-        return processed_path
+        # Scale, denoise and binarize only as much as this image needs
+        processed, _report = preprocess_for_ocr(image)
+        return processed
     except Exception as e:
         print(f"Image preprocessing failed: {e}")
-        return image_path  # Return original on error
+        return image  # Return original on error
 
-def extract_text_from_image_pytesseract(image_path: str) -> str:
+def extract_text_from_image_pytesseract(image) -> str:
     """
     Extract text from image using Pytesseract OCR.
     Args:
-        image_path (str): Path to the image file
+        image: Decoded image array, encoded image bytes or a file path
     Returns:
         str: Extracted text
     """
@@ -151,43 +208,23 @@ def extract_text_from_image_pytesseract(image_path: str) -> str:
                    "Mac: brew install tesseract\n" + \
                    "Linux: apt-get install tesseract-ocr"
         
-        # Preprocess image for better OCR
-        processed_path = preprocess_image_for_ocr(image_path)
-        
-        # Open image with PIL
-        image = Image.open(processed_path)
+        # Preprocess image for better OCR (stays in memory)
+        processed = preprocess_image_for_ocr(image)
         
-        # Extract text using Pytesseract with multiple PSM modes for better results
-        configs = [
-            '--psm 6',  # Uniform block of text
-            '--psm 4',  # Variable-size text blocks
-            '--psm 3',  # Fully automatic page segmentation
-            '--psm 1'   # Automatic page segmentation with OSD
-        ]
-        
-        best_text = ""
-        for config in configs:
-            try:
-                text = pytesseract.image_to_string(image, config=config)
-                if len(text.strip()) > len(best_text.strip()):
-                    best_text = text
-            except Exception:
-                continue
-        
-        # Clean up processed image if it was created
-        if processed_path != image_path and os.path.exists(processed_path):
-            os.remove(processed_path)
+        # Run the page segmentation candidates in parallel; stops early once one is confident enough
+        best = tesseract_best_text(processed)
+        best_text = best["text"] if best else ""
         
         return best_text.strip() if best_text.strip() else "Error: No text could be extracted from the image"
         
     except Exception as e:
         return f"Error extracting text with Pytesseract: {str(e)}"
 
-def extract_text_from_image_easyocr(image_path: str) -> str:
+def extract_text_from_image_easyocr(image) -> str:
     """
     Extract text from image using EasyOCR.
     Args:
-        image_path (str): Path to the image file
+        image: Decoded image array, encoded image bytes or a file path
     Returns:
         str: Extracted text
     """
@@ -195,11 +232,8 @@ def extract_text_from_image_easyocr(image_path: str) -> str:
         return "Error: EasyOCR not available. Please install: pip install easyocr"
     
     try:
-        # Initialize EasyOCR reader (English by default)
-        reader = easyocr.Reader(['en'])
-        
-        # Extract text
-        results = reader.readtext(image_path)
+        # Shared, already-initialized reader (English by default)
+        results = get_ocr_pool().readtext(image, languages=("en",))
         
         # Combine all detected text
         text_parts = [result[1] for result in results if result[2] > 0.5]  # Confidence > 0.5
@@ -240,33 +274,37 @@ def extract_text_from_image(image_file, ocr_method: str = "auto") -> str:
     """
     Extract text from uploaded image file using OCR.
     Args:
-        image_file: Streamlit uploaded file object
+        image_file: Uploaded file object (anything with getvalue() or read()) or the image bytes
         ocr_method: OCR method to use ("pytesseract", "easyocr", or "auto")
     Returns:
         str: Extracted text
     """
     try:
-        # Create temporary file for the image
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".png") as tmp_file:
-            tmp_file.write(image_file.getvalue())
-            temp_path = tmp_file.name
+        # Decode once in memory; both OCR engines take the numpy array directly
+        if isinstance(image_file, (bytes, bytearray, memoryview)):
+            image_bytes = bytes(image_file)
+        elif hasattr(image_file, "getvalue"):
+            image_bytes = image_file.getvalue()
+        else:
+            image_bytes = image_file.read()
+        image = decode_image(image_bytes)
         
         extracted_text = ""
         
         if ocr_method == "pytesseract":
-            extracted_text = extract_text_from_image_pytesseract(temp_path)
+            extracted_text = extract_text_from_image_pytesseract(image)
         elif ocr_method == "easyocr":
-            extracted_text = extract_text_from_image_easyocr(temp_path)
+            extracted_text = extract_text_from_image_easyocr(image)
         elif ocr_method == "auto":
             # Smart auto-selection: Try EasyOCR first (more reliable), then Pytesseract
             extracted_text = ""
             
             if EASYOCR_AVAILABLE:
-                extracted_text = extract_text_from_image_easyocr(temp_path)
+                extracted_text = extract_text_from_image_easyocr(image)
                 
             # If EasyOCR failed or not available, try Pytesseract
             if (not extracted_text or extracted_text.startswith("Error")) and PYTESSERACT_AVAILABLE:
-                pytesseract_result = extract_text_from_image_pytesseract(temp_path)
+                pytesseract_result = extract_text_from_image_pytesseract(image)
                 if pytesseract_result and not pytesseract_result.startswith("Error"):
                     extracted_text = pytesseract_result
             
@@ -281,15 +319,39 @@ def extract_text_from_image(image_file, ocr_method: str = "auto") -> str:
         else:
             extracted_text = f"Error: Unknown OCR method '{ocr_method}'. Use 'auto', 'pytesseract', or 'easyocr'"
         
-        # Clean up temporary file
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
-        
         return extracted_text
         
     except Exception as e:
         return f"Error processing image: {str(e)}"
 
+# Engine order per OCR method; "auto" prefers EasyOCR like extract_text_from_image
+_OCR_ENGINE_ORDER = {
+    "auto": ("easyocr", "pytesseract"),
+    "easyocr": ("easyocr",),
+    "pytesseract": ("pytesseract",),
+}
+
+async def extract_text_from_image_async(image_bytes, ocr_method: str = "auto") -> str:
+    """
+    Async variant of extract_text_from_image for request handlers: reading,
+    decoding, preprocessing and OCR run on the "cpu" worker processes.
+    Args:
+        image_bytes (bytes or str): Encoded image data, or the path of the image file
+        ocr_method: OCR method to use ("pytesseract", "easyocr", or "auto")
+    Returns:
+        str: Extracted text, or a message starting with "Error"
+    """
+    engines = _OCR_ENGINE_ORDER.get(ocr_method)
+    if engines is None:
+        return f"Error: Unknown OCR method '{ocr_method}'. Use 'auto', 'pytesseract', or 'easyocr'"
+    if not (EASYOCR_AVAILABLE or PYTESSERACT_AVAILABLE):
+        return "Error: No OCR libraries available. Please install either:\n" + \
+               "1. EasyOCR: pip install easyocr (Recommended - no additional setup)\n" + \
+               "2. Pytesseract: pip install pytesseract + install Tesseract engine"
+    
+    extracted_text = await run_cpu(ocr_image_bytes, image_bytes, engines)
+    return extracted_text.strip() if extracted_text.strip() else "Error: No text could be detected in the image"
+
 async def parse_syllabus_text(text: str) -> str:
     """Send syllabus text to LLM and get structured topics JSON"""
     # Validate input
@@ -329,8 +391,8 @@ INSTRUCTIONS:
 Please respond ONLY with the JSON structure, no additional text.
 """
     
-    # Current implementation (Groq/LangChain)
-    response = llm.predict(prompt)
+    # Current implementation (Groq/LangChain); the blocking SDK call runs on the I/O pool
+    response = await run_io(llm.predict, prompt)
     return response
     
     # Alternative Gemini implementation (Commented - Ready to Switch)
@@ -348,8 +410,8 @@ Please respond ONLY with the JSON structure, no additional text.
 async def call_llm_async(prompt: str) -> str:
     """Generic async LLM call function for AI features"""
     try:
-        # Current implementation (Groq/LangChain)
-        response = llm.predict(prompt)
+        # Current implementation (Groq/LangChain); the blocking SDK call runs on the I/O pool
+        response = await run_io(llm.predict, prompt)
         return response
         
         # Alternative Gemini implementation (Commented - Ready to Switch)
@@ -1,13 +1,163 @@
 """
 memory_utils.py
 MemoryToolAgent for StudyMentor: tracks user performance, weak topics, and quiz history.
-This version uses in-memory storage for testing; swap with Firestore integration later.
+Each (user, topic) keeps a running aggregate (attempts, sum of score ratios
+and an exponentially weighted recent score) updated in O(1) per result, and
+each user has a heap ordered by average score, so the weakest k topics are
+found in O(k log n) without rescanning every result. Aggregates live in a
+bounded per-worker store and are persisted through the topic_performance
+repository; call load_user_performance before use in an async context so
+a worker starts from the stored values. The stored aggregates are updated
+in the database (the recent score is decayed from the stored value), so
+results recorded by every worker count. A worker's copy is reloaded once
+it is MEMORY_CACHE_TTL_SECONDS old; when several workers share state
+(STATE_BACKEND), each result also bumps a per-user version in the shared
+store once it is written, and a worker whose copy predates it reloads it.
 """
 
-from collections import defaultdict
+import asyncio
+import heapq
+import os
+import threading
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+from repositories.topic_performance_repository import topic_performance_repository
+from .executor_utils import run_state
+from .state_utils import get_shared_store, is_state_shared
+from .store_utils import get_store
+
+# Weight of the newest result in the recent score (0-1; higher reacts faster)
+MEMORY_EWMA_ALPHA = float(os.getenv("MEMORY_EWMA_ALPHA", "0.3"))
+# Users whose aggregates are kept in memory per worker (least recently used are reloaded on demand)
+MEMORY_MAX_USERS = int(os.getenv("MEMORY_MAX_USERS", "10000"))
+# Seconds a worker keeps a user's aggregates before reloading them (picks up results recorded by other workers)
+MEMORY_CACHE_TTL_SECONDS = float(os.getenv("MEMORY_CACHE_TTL_SECONDS", "30"))
+
+USER_TOPICS = "user_topic_performance"
+get_store().configure(USER_TOPICS, max_entries=MEMORY_MAX_USERS, max_bytes=64 * 1024 * 1024,
+                      ttl_seconds=MEMORY_CACHE_TTL_SECONDS, copy_values=False)
+
+# user_id -> version of the stored aggregates, shared between workers
+USER_TOPIC_VERSIONS = "user_topic_performance_versions"
+get_shared_store().configure(USER_TOPIC_VERSIONS, max_entries=MEMORY_MAX_USERS, max_bytes=16 * 1024 * 1024,
+                             ttl_seconds=None)
+
+_lock = threading.Lock()
+_pending_writes = set()
+
+
+class TopicAggregate:
+    """Running results for one topic."""
+
+    def __init__(self, count: int = 0, ratio_sum: float = 0.0, ewma: float = 0.0):
+        self.count = count
+        self.ratio_sum = ratio_sum
+        self.ewma = ewma
+
+    @property
+    def average(self) -> float:
+        return self.ratio_sum / self.count if self.count else 0.0
+
+    def add(self, ratio: float):
+        self.count += 1
+        self.ratio_sum += ratio
+        self.ewma = ratio if self.count == 1 else MEMORY_EWMA_ALPHA * ratio + (1 - MEMORY_EWMA_ALPHA) * self.ewma
+
+
+class UserTopics:
+    """
+    A user's topic aggregates plus a min-heap of (average, version, topic).
+    An update pushes a new entry instead of moving the old one; entries
+    whose version is no longer current are skipped when met and dropped
+    when the heap is rebuilt.
+    """
+
+    def __init__(self):
+        self.topics: Dict[str, TopicAggregate] = {}
+        self._versions: Dict[str, int] = {}
+        self._heap: List[Tuple[float, int, str]] = []
+        # Shared version these aggregates reflect (None when state isn't shared)
+        self.version: Optional[str] = None
+        # Whether these started from the stored aggregates (not just results recorded here)
+        self.loaded = False
+
+    def set(self, topic: str, aggregate: TopicAggregate):
+        self.topics[topic] = aggregate
+        self._push(topic)
+
+    def add(self, topic: str, ratio: float) -> TopicAggregate:
+        aggregate = self.topics.setdefault(topic, TopicAggregate())
+        aggregate.add(ratio)
+        self._push(topic)
+        return aggregate
+
+    def _push(self, topic: str):
+        version = self._versions.get(topic, 0) + 1
+        self._versions[topic] = version
+        heapq.heappush(self._heap, (self.topics[topic].average, version, topic))
+        # Bound the stale entries to a constant factor of the live ones
+        if len(self._heap) > 2 * len(self.topics) + 16:
+            self._heap = [(aggregate.average, self._versions[name], name) for name, aggregate in self.topics.items()]
+            heapq.heapify(self._heap)
+
+    def weakest(self, k: int, below: Optional[float] = None) -> List[Tuple[str, float]]:
+        """Up to k (topic, average) pairs, lowest average first, optionally only those below a threshold."""
+        found, kept = [], []
+        while self._heap and len(found) < k:
+            entry = heapq.heappop(self._heap)
+            average, version, topic = entry
+            if self._versions.get(topic) != version:
+                continue
+            kept.append(entry)
+            if below is not None and average >= below:
+                break
+            found.append((topic, average))
+        for entry in kept:
+            heapq.heappush(self._heap, entry)
+        return found
+
+
+def _user_topics(user_id, create: bool = False) -> UserTopics:
+    user_topics = get_store().get(USER_TOPICS, user_id)
+    if user_topics is None:
+        user_topics = UserTopics()
+        if create:
+            get_store().set(USER_TOPICS, user_id, user_topics)
+    return user_topics
+
+
+async def load_user_performance(user_id):
+    """
+    Load a user's stored aggregates into this worker if they aren't cached
+    (or have expired, or, with shared state, if another worker has recorded
+    results since).
+    Args:
+        user_id (str): Unique user identifier
+    """
+    cached = get_store().get(USER_TOPICS, user_id)
+    version = await run_state(get_shared_store().get, USER_TOPIC_VERSIONS, user_id) if is_state_shared() else None
+    if cached is not None and cached.loaded and cached.version == version:
+        return
+    rows = await topic_performance_repository.get_for_user(user_id)
+    user_topics = UserTopics()
+    user_topics.version = version
+    user_topics.loaded = True
+    for row in rows:
+        user_topics.set(row["topic"], TopicAggregate(row["count"], row["ratio_sum"], row["ewma"]))
+    with _lock:
+        # A result recorded in this worker while loading wins over the stored snapshot
+        current = get_store().get(USER_TOPICS, user_id)
+        if current is None or current is cached:
+            get_store().set(USER_TOPICS, user_id, user_topics)
+
+
+async def _write_and_publish(user_id, topic, ratio):
+    await topic_performance_repository.record_now(user_id, topic, ratio, MEMORY_EWMA_ALPHA)
+    # Every worker, this one included, reloads on its next load_user_performance;
+    # the stored aggregates then also include results recorded elsewhere meanwhile
+    await run_state(get_shared_store().set, USER_TOPIC_VERSIONS, user_id, uuid.uuid4().hex)
 
-# In-memory mock database: {user_id: {topic: [scores]}}
-_user_memory = defaultdict(lambda: defaultdict(list))
 
 def record_quiz_result(user_id, topic, score, total):
     """
@@ -18,8 +168,42 @@ def record_quiz_result(user_id, topic, score, total):
         score (int): Number of correct answers
         total (int): Total number of questions
     """
-    if total > 0:
-        _user_memory[user_id][topic].append((score, total))
+    if total <= 0:
+        return
+    topic = topic or "untitled"
+    ratio = score / total
+    with _lock:
+        _user_topics(user_id, create=True).add(topic, ratio)
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return  # No event loop (e.g. called from the Streamlit UI): kept in memory only
+    if not is_state_shared():
+        topic_performance_repository.record(user_id, topic, ratio, MEMORY_EWMA_ALPHA)
+        return
+    # Other workers only see the new version once the write it describes is stored
+    task = loop.create_task(_write_and_publish(user_id, topic, ratio))
+    _pending_writes.add(task)
+    task.add_done_callback(_pending_writes.discard)
+
+
+async def drain_pending_writes():
+    """Wait for results still being written and published, e.g. at shutdown."""
+    while _pending_writes:
+        await asyncio.gather(*list(_pending_writes), return_exceptions=True)
+
+
+def get_weakest_topics(user_id, k=5):
+    """
+    Get the k topics with the lowest average score.
+    Args:
+        user_id (str): Unique user identifier
+        k (int): Number of topics
+    Returns:
+        list: (topic, average score) pairs, weakest first
+    """
+    with _lock:
+        return _user_topics(user_id).weakest(k)
 
 
 def get_weak_topics(user_id, threshold=0.6):
@@ -29,15 +213,11 @@ def get_weak_topics(user_id, threshold=0.6):
         user_id (str): Unique user identifier
         threshold (float): Weakness threshold (default 0.6)
     Returns:
-        list: List of weak topic names
+        list: List of weak topic names, weakest first
     """
-    weak = []
-    for topic, results in _user_memory[user_id].items():
-        if results:
-            avg = sum(s/t for s, t in results) / len(results)
-            if avg < threshold:
-                weak.append(topic)
-    return weak
+    with _lock:
+        user_topics = _user_topics(user_id)
+        return [topic for topic, _ in user_topics.weakest(len(user_topics.topics), below=threshold)]
 
 
 def get_user_performance(user_id):
@@ -46,12 +226,10 @@ def get_user_performance(user_id):
     Args:
         user_id (str): Unique user identifier
     Returns:
-        dict: {topic: {'attempts': int, 'avg_score': float}}
-    """
-    summary = {}
-    for topic, results in _user_memory[user_id].items():
-        if results:
-            attempts = len(results)
-            avg = sum(s/t for s, t in results) / attempts
-            summary[topic] = {'attempts': attempts, 'avg_score': avg}
-    return summary
+        dict: {topic: {'attempts': int, 'avg_score': float, 'recent_score': float}}
+    """
+    with _lock:
+        return {
+            topic: {'attempts': aggregate.count, 'avg_score': aggregate.average, 'recent_score': aggregate.ewma}
+            for topic, aggregate in _user_topics(user_id).topics.items()
+        }
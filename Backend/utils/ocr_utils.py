@@ -0,0 +1,601 @@
+"""
+ocr_utils.py
+Process-wide OCR engine management for StudyMentor.
+Keeps initialized EasyOCR readers cached per language set, warms them up
+in each "cpu" worker process as it starts (OCR never runs in the API
+process), and caps concurrent inferences to a CPU budget.
+Runs Tesseract's page-segmentation candidates in parallel with early exit,
+and adapts image preprocessing (scale, denoising, binarization) per image.
+Splits PDFs into text-layer and scanned pages; scanned pages are OCR'd in
+parallel on the shared "cpu" worker processes.
+"""
+
+import io
+import os
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import PyPDF2
+
+from .executor_utils import get_executor, in_worker_process
+
+try:
+    import easyocr
+    EASYOCR_AVAILABLE = True
+except ImportError:
+    EASYOCR_AVAILABLE = False
+
+try:
+    import pytesseract
+    PYTESSERACT_AVAILABLE = True
+except ImportError:
+    PYTESSERACT_AVAILABLE = False
+
+try:
+    import cv2
+    OPENCV_AVAILABLE = True
+except ImportError:
+    OPENCV_AVAILABLE = False
+
+try:
+    import pypdfium2 as pdfium
+    PDFIUM_AVAILABLE = True
+except ImportError:
+    PDFIUM_AVAILABLE = False
+
+# Languages warmed at startup, e.g. "en" or "en,hi"
+OCR_LANGUAGES = tuple(lang.strip() for lang in os.getenv("OCR_LANGUAGES", "en").split(",") if lang.strip())
+# Concurrent OCR inferences allowed in this process
+OCR_MAX_CONCURRENCY = int(os.getenv("OCR_MAX_CONCURRENCY", str(max(1, (os.cpu_count() or 2) // 2))))
+# Load models when each "cpu" worker process starts instead of on its first upload
+OCR_WARMUP = os.getenv("OCR_WARMUP", "true").lower() == "true"
+
+# Tesseract page segmentation modes tried per image, in order of preference
+TESSERACT_PSM_MODES = (
+    6,  # Uniform block of text
+    4,  # Variable-size text blocks
+    3,  # Fully automatic page segmentation
+    1,  # Automatic page segmentation with OSD
+)
+# Wall-clock budget for all Tesseract candidates of one image
+OCR_TIME_BUDGET_SECONDS = float(os.getenv("OCR_TIME_BUDGET_SECONDS", "20"))
+# A candidate this confident and this long ends the search early
+OCR_EARLY_EXIT_CONFIDENCE = float(os.getenv("OCR_EARLY_EXIT_CONFIDENCE", "80"))
+OCR_EARLY_EXIT_MIN_CHARS = int(os.getenv("OCR_EARLY_EXIT_MIN_CHARS", "40"))
+
+# Resolution images are scaled down to before OCR, assuming a letter/A4 page fills the frame
+OCR_TARGET_DPI = int(os.getenv("OCR_TARGET_DPI", "200"))
+OCR_PAGE_LONG_SIDE_INCHES = 11.0
+# Estimated noise (standard deviation, 0-255) above which the image is denoised
+OCR_DENOISE_SIGMA = float(os.getenv("OCR_DENOISE_SIGMA", "4.0"))
+# Background brightness spread (0-1) above which adaptive thresholding replaces Otsu
+OCR_ILLUMINATION_SPREAD = float(os.getenv("OCR_ILLUMINATION_SPREAD", "0.2"))
+
+# PDF pages with less extractable text than this (and an image on them) are treated as scanned
+OCR_PDF_MIN_PAGE_CHARS = int(os.getenv("OCR_PDF_MIN_PAGE_CHARS", "20"))
+
+
+class OCREnginePool:
+    """
+    Cache of initialized EasyOCR readers, one per language set.
+
+    Building an ``easyocr.Reader`` loads the detection and recognition
+    models from disk, which takes seconds; readers here are built once per
+    process and shared. A semaphore bounds how many inferences run at once.
+    """
+
+    def __init__(self, max_concurrency: int = OCR_MAX_CONCURRENCY):
+        """
+        Args:
+            max_concurrency: Maximum number of simultaneous OCR inferences
+        """
+        self.max_concurrency = max_concurrency
+        self._readers: Dict[Tuple[str, ...], "easyocr.Reader"] = {}
+        self._init_locks: Dict[Tuple[str, ...], threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._stats = {"readers_loaded": 0, "load_seconds": 0.0, "inferences": 0, "waiting": 0}
+
+    @staticmethod
+    def _key(languages: Iterable[str]) -> Tuple[str, ...]:
+        return tuple(sorted(languages))
+
+    def get_reader(self, languages: Iterable[str] = ("en",)):
+        """
+        Get the shared reader for a language set, loading it on first use.
+
+        Args:
+            languages: EasyOCR language codes
+
+        Returns:
+            easyocr.Reader instance
+        """
+        if not EASYOCR_AVAILABLE:
+            raise RuntimeError("EasyOCR not available. Please install: pip install easyocr")
+
+        key = self._key(languages)
+        reader = self._readers.get(key)
+        if reader is not None:
+            return reader
+
+        with self._lock:
+            init_lock = self._init_locks.setdefault(key, threading.Lock())
+
+        # Per-language lock: concurrent first uses load the models only once
+        with init_lock:
+            reader = self._readers.get(key)
+            if reader is None:
+                start = time.perf_counter()
+                reader = easyocr.Reader(list(key), gpu=False)
+                self._stats["load_seconds"] += time.perf_counter() - start
+                self._stats["readers_loaded"] += 1
+                self._readers[key] = reader
+        return reader
+
+    def readtext(self, image, languages: Iterable[str] = ("en",), **kwargs):
+        """
+        Run EasyOCR on an image within the concurrency budget.
+
+        Args:
+            image: File path, encoded image bytes or numpy array
+            languages: EasyOCR language codes
+            **kwargs: Passed through to ``easyocr.Reader.readtext``
+
+        Returns:
+            list: EasyOCR results as (bbox, text, confidence) tuples
+        """
+        reader = self.get_reader(languages)
+        self._stats["waiting"] += 1
+        with self._slots:
+            self._stats["waiting"] -= 1
+            self._stats["inferences"] += 1
+            return reader.readtext(image, **kwargs)
+
+    def warm_up(self, languages: Optional[Iterable[str]] = None):
+        """
+        Load the reader for a language set and run one tiny inference so the
+        first real upload doesn't pay model loading or first-call overhead.
+
+        Args:
+            languages: EasyOCR language codes (defaults to OCR_LANGUAGES)
+        """
+        if not EASYOCR_AVAILABLE:
+            return
+        try:
+            self.readtext(np.full((32, 96), 255, dtype=np.uint8), languages or OCR_LANGUAGES)
+        except Exception as e:
+            print(f"OCR warm-up failed: {e}")
+
+    def stats(self) -> dict:
+        """Return loader and inference counters."""
+        return {
+            **self._stats,
+            "languages_loaded": ["+".join(key) for key in self._readers],
+            "max_concurrency": self.max_concurrency,
+        }
+
+
+_ocr_pool: Optional[OCREnginePool] = None
+_ocr_pool_lock = threading.Lock()
+
+
+def get_ocr_pool() -> OCREnginePool:
+    """
+    Get or create the process-wide OCR engine pool.
+
+    Returns:
+        OCREnginePool instance
+    """
+    global _ocr_pool
+    if _ocr_pool is None:
+        with _ocr_pool_lock:
+            if _ocr_pool is None:
+                _ocr_pool = OCREnginePool()
+    return _ocr_pool
+
+
+def start_ocr_warm_up() -> Optional[threading.Thread]:
+    """
+    Warm this process's OCR pool on a background thread, so the worker can
+    take Tesseract-only tasks while the models load. Registered as an
+    initializer of the "cpu" worker processes.
+
+    Returns:
+        The warm-up thread, or None if warm-up is disabled or EasyOCR is missing
+    """
+    if not (OCR_WARMUP and EASYOCR_AVAILABLE):
+        return None
+    thread = threading.Thread(target=get_ocr_pool().warm_up, name="ocr-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+if OCR_WARMUP and EASYOCR_AVAILABLE:
+    get_executor("cpu").add_initializer(start_ocr_warm_up)
+
+
+def parse_tesseract_tsv(tsv: str) -> Dict[str, float]:
+    """
+    Rebuild text and confidence from Tesseract's TSV output.
+
+    Args:
+        tsv: Output of ``tesseract ... tsv``
+
+    Returns:
+        dict: "text", "confidence" (character-weighted mean word confidence,
+        0-100) and "score" (characters weighted by confidence)
+    """
+    lines: Dict[Tuple[int, int, int], List[str]] = {}
+    weighted_conf = 0.0
+    chars = 0
+    for row in tsv.splitlines()[1:]:
+        fields = row.split("\t")
+        if len(fields) < 12 or fields[0] != "5":  # level 5 rows are words
+            continue
+        word = fields[11].strip()
+        conf = float(fields[10])
+        if not word or conf < 0:
+            continue
+        block, par, line = int(fields[2]), int(fields[3]), int(fields[4])
+        lines.setdefault((block, par, line), []).append(word)
+        weighted_conf += conf * len(word)
+        chars += len(word)
+
+    text_lines = []
+    previous_paragraph = None
+    for (block, par, line), words in sorted(lines.items()):
+        if previous_paragraph is not None and previous_paragraph != (block, par):
+            text_lines.append("")
+        text_lines.append(" ".join(words))
+        previous_paragraph = (block, par)
+
+    confidence = weighted_conf / chars if chars else 0.0
+    return {"text": "\n".join(text_lines), "confidence": confidence, "score": weighted_conf / 100.0}
+
+
+def _encode_png(image) -> bytes:
+    """Encode a PIL image or numpy array as PNG bytes for Tesseract's stdin."""
+    if isinstance(image, (bytes, bytearray)):
+        return bytes(image)
+    if isinstance(image, np.ndarray):
+        from PIL import Image
+        image = Image.fromarray(image)
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+# One thread per running candidate feeds stdin/reads stdout of its tesseract process
+_tesseract_threads = ThreadPoolExecutor(
+    max_workers=len(TESSERACT_PSM_MODES) * max(1, OCR_MAX_CONCURRENCY), thread_name_prefix="tesseract"
+)
+
+
+def tesseract_best_text(image, psm_modes: Iterable[int] = TESSERACT_PSM_MODES,
+                        time_budget: float = OCR_TIME_BUDGET_SECONDS,
+                        min_confidence: float = OCR_EARLY_EXIT_CONFIDENCE,
+                        min_chars: int = OCR_EARLY_EXIT_MIN_CHARS) -> Optional[Dict[str, float]]:
+    """
+    Run Tesseract with several page segmentation modes in parallel and keep
+    the best result.
+
+    Each mode runs as its own single-threaded tesseract process. As soon as
+    one result is confident and long enough, the remaining processes are
+    killed; anything still running when the time budget expires is killed
+    too, and the best result so far is returned.
+
+    Args:
+        image: PIL image, numpy array or encoded image bytes
+        psm_modes: Page segmentation modes to try
+        time_budget: Wall-clock seconds allowed for this image
+        min_confidence: Mean word confidence (0-100) that allows early exit
+        min_chars: Minimum recognized characters that allow early exit
+
+    Returns:
+        dict with "text", "confidence", "score" and "psm", or None if every run failed
+    """
+    if not PYTESSERACT_AVAILABLE:
+        raise RuntimeError("Pytesseract not available. Please install: pip install pytesseract")
+
+    png = _encode_png(image)
+    # Candidates run side by side, so keep each tesseract to one OpenMP thread
+    env = {**os.environ, "OMP_THREAD_LIMIT": "1"}
+    processes = {
+        psm: subprocess.Popen(
+            [pytesseract.pytesseract.tesseract_cmd, "stdin", "stdout", "--psm", str(psm), "tsv"],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, env=env
+        )
+        for psm in psm_modes
+    }
+
+    def run(psm: int) -> Dict[str, float]:
+        stdout, _ = processes[psm].communicate(input=png, timeout=time_budget)
+        if processes[psm].returncode != 0:
+            raise RuntimeError(f"tesseract --psm {psm} exited with {processes[psm].returncode}")
+        return {**parse_tesseract_tsv(stdout.decode("utf-8", errors="replace")), "psm": psm}
+
+    futures = {_tesseract_threads.submit(run, psm): psm for psm in processes}
+    best = None
+    try:
+        for future in as_completed(futures, timeout=time_budget):
+            try:
+                result = future.result()
+            except Exception:
+                continue
+            if best is None or result["score"] > best["score"]:
+                best = result
+            if result["confidence"] >= min_confidence and len(result["text"]) >= min_chars:
+                break
+    except FutureTimeoutError:
+        pass
+    finally:
+        for process in processes.values():
+            if process.poll() is None:
+                process.kill()
+
+    return best
+
+
+# Immerkaer's Laplacian-difference kernel: flat regions and edges cancel, noise remains
+_NOISE_KERNEL = np.array([[1, -2, 1], [-2, 4, -2], [1, -2, 1]], dtype=np.float32)
+
+_preprocess_stats = {"images": 0, "denoised": 0, "adaptive_threshold": 0, "timings_ms": {}}
+_preprocess_stats_lock = threading.Lock()
+
+
+def estimate_noise(gray: np.ndarray) -> float:
+    """
+    Estimate the standard deviation of additive Gaussian noise in a
+    grayscale image in a single convolution pass (Immerkaer, 1996).
+
+    Args:
+        gray: 2-D uint8 image
+
+    Returns:
+        float: Noise sigma on the 0-255 scale
+    """
+    height, width = gray.shape[:2]
+    if height < 3 or width < 3:
+        return 0.0
+    response = cv2.filter2D(gray.astype(np.float32), -1, _NOISE_KERNEL)[1:-1, 1:-1]
+    return float(np.sqrt(np.pi / 2.0) * np.abs(response).sum() / (6.0 * (width - 2) * (height - 2)))
+
+
+def estimate_illumination_spread(gray: np.ndarray) -> float:
+    """
+    Measure how uneven the page background is (shadows, vignetting) on a
+    small thumbnail, where text strokes are closed away by dilation.
+
+    Args:
+        gray: 2-D uint8 image
+
+    Returns:
+        float: Spread between the 5th and 95th background percentiles, 0-1
+    """
+    scale = 256.0 / max(gray.shape[:2])
+    thumbnail = cv2.resize(gray, None, fx=min(1.0, scale), fy=min(1.0, scale), interpolation=cv2.INTER_AREA)
+    background = cv2.dilate(thumbnail, np.ones((15, 15), np.uint8))
+    low, high = np.percentile(background, (5, 95))
+    return float(high - low) / 255.0
+
+
+def preprocess_for_ocr(image: np.ndarray, target_dpi: int = OCR_TARGET_DPI,
+                       denoise_sigma: float = OCR_DENOISE_SIGMA,
+                       illumination_spread: float = OCR_ILLUMINATION_SPREAD) -> Tuple[np.ndarray, dict]:
+    """
+    Prepare an image for OCR, doing only the work the image needs.
+
+    1. Grayscale, then scale down so the long side matches ``target_dpi`` for
+       a page-sized frame (phone photos are often 2-3x that).
+    2. Estimate noise; run non-local-means denoising only above ``denoise_sigma``.
+    3. Binarize with Otsu for evenly lit scans, or adaptive Gaussian
+       thresholding when the background brightness varies across the page.
+
+    Args:
+        image: Decoded image (BGR or grayscale)
+        target_dpi: Resolution to scale down to
+        denoise_sigma: Noise level that triggers denoising
+        illumination_spread: Background spread that triggers adaptive thresholding
+
+    Returns:
+        (processed_image, report) where report holds the decisions taken and
+        per-step timings in milliseconds
+    """
+    if not OPENCV_AVAILABLE:
+        raise RuntimeError("OpenCV not available. Please install: pip install opencv-python")
+
+    timings = {}
+    report = {"timings_ms": timings}
+
+    def timed(step, fn, *args, **kwargs):
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        timings[step] = (time.perf_counter() - start) * 1000.0
+        return result
+
+    gray = timed("grayscale", lambda: cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image)
+
+    max_side = int(target_dpi * OCR_PAGE_LONG_SIDE_INCHES)
+    scale = min(1.0, max_side / max(gray.shape[:2]))
+    report["scale"] = scale
+    if scale < 1.0:
+        gray = timed("resize", cv2.resize, gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+    sigma = timed("noise_estimate", estimate_noise, gray)
+    report["noise_sigma"] = sigma
+    report["denoised"] = sigma > denoise_sigma
+    if report["denoised"]:
+        # Filter strength follows the measured noise instead of a fixed default
+        gray = timed("denoise", cv2.fastNlMeansDenoising, gray, None, h=max(3.0, 1.2 * sigma))
+
+    spread = timed("illumination_estimate", estimate_illumination_spread, gray)
+    report["illumination_spread"] = spread
+    if spread > illumination_spread:
+        report["binarization"] = "adaptive"
+        block_size = max(15, (max(gray.shape[:2]) // 40) | 1)  # odd, roughly a few text lines tall
+        binary = timed("binarize", cv2.adaptiveThreshold, gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                       cv2.THRESH_BINARY, block_size, 10)
+    else:
+        report["binarization"] = "otsu"
+        binary = timed("binarize", lambda: cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1])
+
+    with _preprocess_stats_lock:
+        _preprocess_stats["images"] += 1
+        _preprocess_stats["denoised"] += int(report["denoised"])
+        _preprocess_stats["adaptive_threshold"] += int(report["binarization"] == "adaptive")
+        for step, ms in timings.items():
+            _preprocess_stats["timings_ms"][step] = _preprocess_stats["timings_ms"].get(step, 0.0) + ms
+
+    return binary, report
+
+
+def preprocess_stats() -> dict:
+    """Return cumulative preprocessing decisions and per-step timings."""
+    with _preprocess_stats_lock:
+        return {**_preprocess_stats, "timings_ms": dict(_preprocess_stats["timings_ms"])}
+
+
+def ocr_image_bytes(image_bytes: Union[bytes, str], engines: Sequence[str] = ("pytesseract", "easyocr")) -> str:
+    """
+    OCR one encoded image, trying each engine in turn until one returns text.
+    Tesseract gets the adaptive preprocessing; EasyOCR gets the decoded image.
+    Runs in the "cpu" worker processes, so it only depends on this module.
+
+    Args:
+        image_bytes: Encoded image (PNG, JPEG, ...), or its path (read by the worker)
+        engines: Engine names in order of preference ("pytesseract", "easyocr")
+
+    Returns:
+        str: Recognized text ("" if nothing was recognized)
+    """
+    if isinstance(image_bytes, str):
+        with open(image_bytes, "rb") as f:
+            image_bytes = f.read()
+    if OPENCV_AVAILABLE:
+        image = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+    else:
+        from PIL import Image
+        image = np.array(Image.open(io.BytesIO(image_bytes)).convert("RGB"))
+    if image is None:
+        return ""
+
+    for engine in engines:
+        if engine == "pytesseract" and PYTESSERACT_AVAILABLE:
+            try:
+                processed = preprocess_for_ocr(image)[0] if OPENCV_AVAILABLE else image
+                best = tesseract_best_text(processed)
+                if best and best["text"].strip():
+                    return best["text"]
+            except Exception as e:
+                print(f"Tesseract OCR failed: {e}")
+        elif engine == "easyocr" and EASYOCR_AVAILABLE:
+            try:
+                results = get_ocr_pool().readtext(image, languages=OCR_LANGUAGES)
+                text = "\n".join(result[1] for result in results if result[2] > 0.5)  # Confidence > 0.5
+                if text.strip():
+                    return text
+            except Exception as e:
+                print(f"EasyOCR failed: {e}")
+    return ""
+
+
+def ocr_images_parallel(images: Sequence[bytes]) -> List[str]:
+    """
+    OCR several encoded images across the shared "cpu" worker processes.
+    Inside a worker process (or with a single image) the images are
+    processed in-line instead, so pools never nest.
+
+    Args:
+        images: Encoded images, e.g. rendered scanned PDF pages
+
+    Returns:
+        list: Recognized text per image, in input order
+    """
+    if not images:
+        return []
+    if len(images) == 1 or in_worker_process():
+        return [ocr_image_bytes(image) for image in images]
+
+    executor = get_executor("cpu")
+    try:
+        return executor.map(ocr_image_bytes, images)
+    except BrokenProcessPool as e:
+        print(f"OCR worker pool failed, retrying in-process: {e}")
+        executor.shutdown()
+        return [ocr_image_bytes(image) for image in images]
+
+
+def _page_has_images(page) -> bool:
+    """Check the page resources for image XObjects without decoding them."""
+    try:
+        xobjects = page["/Resources"].get_object().get("/XObject")
+        if xobjects is None:
+            return False
+        return any(obj.get_object().get("/Subtype") == "/Image" for obj in xobjects.get_object().values())
+    except (KeyError, AttributeError):
+        return False
+
+
+def _scanned_page_image(page, pdf_document, page_index: int) -> Optional[bytes]:
+    """
+    Get an encoded image of a scanned page for OCR: a pdfium rendering at
+    OCR_TARGET_DPI if available, otherwise the largest image embedded in the page.
+    """
+    if pdf_document is not None:
+        bitmap = pdf_document[page_index].render(scale=OCR_TARGET_DPI / 72.0)
+        buffer = io.BytesIO()
+        bitmap.to_pil().save(buffer, format="PNG")
+        return buffer.getvalue()
+    images = page.images
+    if not images:
+        return None
+    return max(images, key=lambda image: len(image.data)).data
+
+
+def split_pdf_pages(pdf_source: Union[bytes, str], rasterize_scanned: bool = True) -> Tuple[List[str], List[Tuple[int, bytes]]]:
+    """
+    Extract the text layer of every PDF page and pick out image-only
+    (scanned) pages that need OCR. Pure CPU work, suitable for the "cpu" pool.
+
+    Args:
+        pdf_source: The PDF file contents, or its path (read by the worker)
+        rasterize_scanned: Produce page images for the scanned pages
+
+    Returns:
+        (page_texts, scanned) where scanned lists (page_index, encoded_image)
+        for pages with fewer than OCR_PDF_MIN_PAGE_CHARS characters and an image on them
+    """
+    reader = PyPDF2.PdfReader(pdf_source if isinstance(pdf_source, str) else io.BytesIO(pdf_source))
+    page_texts = [page.extract_text() or "" for page in reader.pages]
+    scanned_indexes = [
+        index for index, (page, text) in enumerate(zip(reader.pages, page_texts))
+        if len(text.strip()) < OCR_PDF_MIN_PAGE_CHARS and _page_has_images(page)
+    ]
+    if not (rasterize_scanned and scanned_indexes):
+        return page_texts, []
+
+    scanned = []
+    pdf_document = pdfium.PdfDocument(pdf_source) if PDFIUM_AVAILABLE else None
+    try:
+        for index in scanned_indexes:
+            try:
+                image = _scanned_page_image(reader.pages[index], pdf_document, index)
+            except Exception as e:
+                print(f"Could not rasterize PDF page {index + 1}: {e}")
+                image = None
+            if image:
+                scanned.append((index, image))
+    finally:
+        if pdf_document is not None:
+            pdf_document.close()
+    return page_texts, scanned
+
+
+def ocr_available() -> bool:
+    """Whether any OCR engine is installed."""
+    return PYTESSERACT_AVAILABLE or EASYOCR_AVAILABLE
@@ -0,0 +1,753 @@
+"""
+state_utils.py
+Shared state backends, so several worker processes (uvicorn --workers N)
+can serve one session. get_shared_store() returns the backend selected by
+STATE_BACKEND. Each backend has the BoundedStore interface (configure, get,
+set, delete, items, clear, purge_expired, stats) plus lock(namespace) for
+read-modify-write sequences:
+- "memory": the per-worker BoundedStore (a single worker only)
+- "sqlite": a SQLite file shared by the workers on one host
+- "redis": a Redis-protocol KV server shared by every worker and host;
+  KVStandInServer is a small local stand-in for development and tests
+Keys and values are BSON-encoded, so they can hold what documents hold
+(dicts, lists, strings, numbers, datetimes, ObjectIds) and nothing is
+unpickled from shared storage. The sqlite and redis backends block on disk
+or network I/O, and lock() waits for other workers, so async code calls
+them through utils/executor_utils.run_state, never on the event loop.
+"""
+
+import os
+import socket
+import socketserver
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import bson
+
+from .store_utils import STORE_DEFAULT_MAX_BYTES, STORE_DEFAULT_MAX_ENTRIES, STORE_DEFAULT_TTL_SECONDS, get_store
+
+# "memory", "sqlite" or "redis"
+STATE_BACKEND = os.getenv("STATE_BACKEND", "memory").lower()
+STATE_SQLITE_PATH = os.getenv("STATE_SQLITE_PATH", "studymentor_state.sqlite3")
+STATE_REDIS_URL = os.getenv("STATE_REDIS_URL", "redis://localhost:6379/0")
+# Prefix of every key on the Redis server (lets several deployments share one)
+STATE_KEY_PREFIX = os.getenv("STATE_KEY_PREFIX", "studymentor:")
+# How long lock() waits for another worker
+STATE_LOCK_TIMEOUT_SECONDS = float(os.getenv("STATE_LOCK_TIMEOUT_SECONDS", "10"))
+# How long a Redis lock lease lasts unless renewed (renewed every third of this while held)
+STATE_LOCK_LEASE_SECONDS = float(os.getenv("STATE_LOCK_LEASE_SECONDS", "30"))
+
+# Compare-and-delete / compare-and-extend of a lock lease, atomic on the server
+_RELEASE_SCRIPT = 'if redis.call("GET", KEYS[1]) == ARGV[1] then return redis.call("DEL", KEYS[1]) else return 0 end'
+_RENEW_SCRIPT = ('if redis.call("GET", KEYS[1]) == ARGV[1] then return redis.call("PEXPIRE", KEYS[1], ARGV[2]) '
+                 'else return 0 end')
+
+
+class StateBackendError(Exception):
+    """Raised when the shared state backend fails or a lock can't be taken."""
+
+
+def _encode_key(key: Any) -> bytes:
+    return bson.encode({"k": key})
+
+
+def _decode_key(data: bytes) -> Any:
+    return bson.decode(data)["k"]
+
+
+def _encode_value(value: Any) -> bytes:
+    return bson.encode({"v": value})
+
+
+def _decode_value(data: bytes) -> Any:
+    return bson.decode(data)["v"]
+
+
+class _NamespaceConfig:
+    def __init__(self, max_entries: int, max_bytes: int, ttl: Optional[float], evict: bool = True):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.evict = evict
+        # Counted by this worker only
+        self.stats = {"hits": 0, "misses": 0, "sets": 0, "evictions": 0, "expirations": 0, "rejected": 0}
+
+
+class _SharedStoreBase:
+    """Namespace configuration and per-worker counters common to the shared backends."""
+
+    def __init__(self):
+        self._configs: Dict[str, _NamespaceConfig] = {}
+        self._local = threading.local()
+
+    def configure(self, namespace: str, max_entries: int = STORE_DEFAULT_MAX_ENTRIES,
+                  max_bytes: int = STORE_DEFAULT_MAX_BYTES, ttl_seconds: Optional[float] = STORE_DEFAULT_TTL_SECONDS,
+                  copy_values: bool = True, evict: bool = True):
+        """
+        Set a namespace's limits, as BoundedStore.configure. Values are always
+        copies (they are decoded on every read), so copy_values is ignored.
+        """
+        config = _NamespaceConfig(max_entries, max_bytes, ttl_seconds, evict)
+        existing = self._configs.get(namespace)
+        if existing is not None:
+            config.stats = existing.stats
+        self._configs[namespace] = config
+
+    def _config(self, namespace: str) -> _NamespaceConfig:
+        config = self._configs.get(namespace)
+        if config is None:
+            config = self._configs[namespace] = _NamespaceConfig(
+                STORE_DEFAULT_MAX_ENTRIES, STORE_DEFAULT_MAX_BYTES, STORE_DEFAULT_TTL_SECONDS
+            )
+        return config
+
+    def _ttl(self, namespace: str, ttl_seconds: Optional[float]) -> Optional[float]:
+        ttl = self._config(namespace).ttl if ttl_seconds is None else ttl_seconds
+        return ttl if ttl else None
+
+
+class SQLiteStore(_SharedStoreBase):
+    """
+    Store in a SQLite file (WAL mode) shared by the worker processes on one
+    host. Entry and byte limits hold across all workers, evicting the least
+    recently used entries; lock() holds the database write lock.
+    """
+
+    def __init__(self, path: str = STATE_SQLITE_PATH):
+        super().__init__()
+        self.path = path
+        with self.lock(""):
+            connection = self._connection()
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries (namespace TEXT NOT NULL, key BLOB NOT NULL, "
+                "value BLOB NOT NULL, size INTEGER NOT NULL, expires_at REAL, accessed_at REAL NOT NULL, "
+                "PRIMARY KEY (namespace, key))"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries (namespace, accessed_at)")
+            # Running totals, so limit checks don't scan the namespace
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS namespaces (namespace TEXT PRIMARY KEY, "
+                "entries INTEGER NOT NULL, bytes INTEGER NOT NULL)"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread, reopened in a forked worker
+        local = self._local
+        if getattr(local, "pid", None) != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=STATE_LOCK_TIMEOUT_SECONDS,
+                                         isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            local.connection, local.pid, local.depth = connection, os.getpid(), 0
+        return local.connection
+
+    @contextmanager
+    def lock(self, namespace: str):
+        """
+        Hold the database write lock so a read-modify-write is atomic across
+        workers (reentrant; every namespace shares the one lock).
+        """
+        connection = self._connection()
+        local = self._local
+        if local.depth == 0:
+            connection.execute("BEGIN IMMEDIATE")
+        local.depth += 1
+        try:
+            yield
+        except BaseException:
+            local.depth -= 1
+            if local.depth == 0:
+                connection.execute("ROLLBACK")
+            raise
+        local.depth -= 1
+        if local.depth == 0:
+            connection.execute("COMMIT")
+
+    def _remove(self, connection: sqlite3.Connection, namespace: str, key: bytes) -> bool:
+        row = connection.execute(
+            "SELECT size FROM entries WHERE namespace = ? AND key = ?", (namespace, key)
+        ).fetchone()
+        if row is None:
+            return False
+        connection.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+        connection.execute(
+            "UPDATE namespaces SET entries = entries - 1, bytes = bytes - ? WHERE namespace = ?", (row[0], namespace)
+        )
+        return True
+
+    def get(self, namespace: str, key: Any, default: Any = None) -> Any:
+        """Look up a value (a fresh copy) and mark it recently used."""
+        config = self._config(namespace)
+        connection = self._connection()
+        encoded = _encode_key(key)
+        row = connection.execute(
+            "SELECT value, expires_at, accessed_at FROM entries WHERE namespace = ? AND key = ?", (namespace, encoded)
+        ).fetchone()
+        now = time.time()
+        if row is not None and row[1] is not None and row[1] <= now:
+            with self.lock(namespace):
+                self._remove(connection, namespace, encoded)
+            config.stats["expirations"] += 1
+            row = None
+        if row is None:
+            config.stats["misses"] += 1
+            return default
+        # Recency is recorded at one-second resolution to keep reads from writing every time
+        if now - row[2] >= 1:
+            connection.execute(
+                "UPDATE entries SET accessed_at = ? WHERE namespace = ? AND key = ?", (now, namespace, encoded)
+            )
+        config.stats["hits"] += 1
+        return _decode_value(row[0])
+
+    def set(self, namespace: str, key: Any, value: Any, ttl_seconds: Optional[float] = None) -> bool:
+        """
+        Store a value, evicting least recently used entries of the namespace
+        until it is back within its limits (or rejecting it, for a namespace
+        configured with evict=False).
+
+        Returns:
+            bool: False if the value was not stored (as BoundedStore.set)
+        """
+        config = self._config(namespace)
+        encoded, blob = _encode_key(key), _encode_value(value)
+        ttl = self._ttl(namespace, ttl_seconds)
+        now = time.time()
+        with self.lock(namespace):
+            connection = self._connection()
+            if not config.evict and not self._fits(connection, namespace, encoded, len(blob), config):
+                config.stats["rejected"] += 1
+                return False
+            self._remove(connection, namespace, encoded)
+            if len(blob) > config.max_bytes:
+                config.stats["rejected"] += 1
+                return False
+            connection.execute(
+                "INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                (namespace, encoded, blob, len(blob), now + ttl if ttl else None, now)
+            )
+            connection.execute(
+                "INSERT INTO namespaces VALUES (?, 1, ?) ON CONFLICT (namespace) "
+                "DO UPDATE SET entries = entries + 1, bytes = bytes + excluded.bytes",
+                (namespace, len(blob))
+            )
+            config.stats["sets"] += 1
+            self._evict(connection, namespace, config, now)
+        return True
+
+    @staticmethod
+    def _fits(connection: sqlite3.Connection, namespace: str, key: bytes, size: int,
+              config: _NamespaceConfig) -> bool:
+        totals = connection.execute("SELECT entries, bytes FROM namespaces WHERE namespace = ?", (namespace,)).fetchone()
+        entries, total = totals or (0, 0)
+        existing = connection.execute(
+            "SELECT size FROM entries WHERE namespace = ? AND key = ?", (namespace, key)
+        ).fetchone()
+        if existing is not None:
+            entries, total = entries - 1, total - existing[0]
+        return entries + 1 <= config.max_entries and total + size <= config.max_bytes
+
+    def _evict(self, connection: sqlite3.Connection, namespace: str, config: _NamespaceConfig, now: float):
+        entries, size = connection.execute(
+            "SELECT entries, bytes FROM namespaces WHERE namespace = ?", (namespace,)
+        ).fetchone()
+        if entries <= config.max_entries and size <= config.max_bytes:
+            return
+        # Expired entries go first, then least recently used ones
+        expired = connection.execute(
+            "SELECT key FROM entries WHERE namespace = ? AND expires_at IS NOT NULL AND expires_at <= ?",
+            (namespace, now)
+        ).fetchall()
+        for (key,) in expired:
+            self._remove(connection, namespace, key)
+        config.stats["expirations"] += len(expired)
+        while True:
+            entries, size = connection.execute(
+                "SELECT entries, bytes FROM namespaces WHERE namespace = ?", (namespace,)
+            ).fetchone()
+            if entries <= config.max_entries and size <= config.max_bytes:
+                return
+            oldest = connection.execute(
+                "SELECT key FROM entries WHERE namespace = ? ORDER BY accessed_at LIMIT ?",
+                (namespace, max(1, entries - config.max_entries))
+            ).fetchall()
+            if not oldest:
+                return
+            for (key,) in oldest:
+                self._remove(connection, namespace, key)
+            config.stats["evictions"] += len(oldest)
+
+    def delete(self, namespace: str, key: Any) -> bool:
+        """
+        Remove an entry.
+
+        Returns:
+            bool: Whether the key was present
+        """
+        with self.lock(namespace):
+            return self._remove(self._connection(), namespace, _encode_key(key))
+
+    def items(self, namespace: str) -> Iterator[Tuple[Any, Any]]:
+        """Iterate over a snapshot of the live entries, least recently used first, without marking them used."""
+        rows = self._connection().execute(
+            "SELECT key, value FROM entries WHERE namespace = ? AND (expires_at IS NULL OR expires_at > ?) "
+            "ORDER BY accessed_at", (namespace, time.time())
+        ).fetchall()
+        return iter([(_decode_key(key), _decode_value(value)) for key, value in rows])
+
+    def clear(self, namespace: Optional[str] = None):
+        """Remove all entries of one namespace, or of every namespace."""
+        with self.lock(namespace or ""):
+            connection = self._connection()
+            if namespace is None:
+                connection.execute("DELETE FROM entries")
+                connection.execute("DELETE FROM namespaces")
+            else:
+                connection.execute("DELETE FROM entries WHERE namespace = ?", (namespace,))
+                connection.execute("DELETE FROM namespaces WHERE namespace = ?", (namespace,))
+
+    def purge_expired(self) -> int:
+        """
+        Drop expired entries in every namespace.
+
+        Returns:
+            int: Number of entries removed
+        """
+        with self.lock(""):
+            connection = self._connection()
+            expired = connection.execute(
+                "SELECT namespace, key FROM entries WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),)
+            ).fetchall()
+            for namespace, key in expired:
+                self._remove(connection, namespace, key)
+        return len(expired)
+
+    def stats(self, namespace: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """Return per-namespace size and limits (shared) and hit/miss/eviction counters (this worker's)."""
+        totals = dict(
+            (name, (entries, size))
+            for name, entries, size in self._connection().execute("SELECT namespace, entries, bytes FROM namespaces")
+        )
+        return {
+            name: {
+                **config.stats,
+                "entries": totals.get(name, (0, 0))[0],
+                "bytes": totals.get(name, (0, 0))[1],
+                "max_entries": config.max_entries,
+                "max_bytes": config.max_bytes,
+                "ttl_seconds": config.ttl,
+            }
+            for name, config in self._configs.items()
+            if namespace is None or name == namespace
+        }
+
+
+def _encode_command(args) -> bytes:
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        if isinstance(arg, str):
+            arg = arg.encode("utf-8")
+        elif not isinstance(arg, bytes):
+            arg = str(arg).encode("ascii")
+        parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+    return b"".join(parts)
+
+
+def _read_reply(reader) -> Any:
+    line = reader.readline()
+    if not line:
+        raise ConnectionError("Connection closed by the state server")
+    kind, body = line[:1], line[1:-2]
+    if kind == b"+":
+        return body.decode("utf-8")
+    if kind == b"-":
+        raise StateBackendError(body.decode("utf-8"))
+    if kind == b":":
+        return int(body)
+    if kind == b"$":
+        length = int(body)
+        return None if length < 0 else reader.read(length + 2)[:-2]
+    if kind == b"*":
+        length = int(body)
+        return None if length < 0 else [_read_reply(reader) for _ in range(length)]
+    raise StateBackendError(f"Unexpected reply from the state server: {line!r}")
+
+
+def _glob_escape(text: str) -> str:
+    # [c] matches c literally in Redis globs
+    return "".join(f"[{char}]" if char in "*?[" else char for char in text)
+
+
+class _RespConnection:
+    """Blocking connection speaking the Redis protocol (RESP2)."""
+
+    def __init__(self, host: str, port: int, password: Optional[str], db: int, timeout: float):
+        self._socket = socket.create_connection((host, port), timeout=timeout)
+        self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._reader = self._socket.makefile("rb")
+        if password:
+            self.command("AUTH", password)
+        if db:
+            self.command("SELECT", db)
+
+    def command(self, *args) -> Any:
+        self._socket.sendall(_encode_command(args))
+        return _read_reply(self._reader)
+
+    def close(self):
+        self._reader.close()
+        self._socket.close()
+
+
+class RedisStore(_SharedStoreBase):
+    """
+    Store on a Redis-protocol server (Redis, Valkey, KVStandInServer) shared
+    by every worker and host. Each entry is one key,
+    "<prefix><namespace>:<encoded key>", expiring with the namespace TTL;
+    entry and byte limits are left to the server's maxmemory policy apart
+    from rejecting single values over max_bytes (run the server with
+    "noeviction" when it holds evict=False namespaces). lock() takes a SET NX
+    lease per namespace, renewed by a background thread while it is held.
+    """
+
+    def __init__(self, url: str = STATE_REDIS_URL, prefix: str = STATE_KEY_PREFIX):
+        super().__init__()
+        parsed = urlparse(url)
+        self._address = (parsed.hostname or "localhost", parsed.port or 6379)
+        self._password = parsed.password
+        self._db = int(parsed.path.lstrip("/") or 0)
+        self.prefix = prefix
+        # lock key -> [token, lost] for the leases this process holds
+        self._leases: Dict[str, list] = {}
+        self._leases_lock = threading.Lock()
+        self._renewer_pid: Optional[int] = None
+
+    def _command(self, *args) -> Any:
+        local = self._local
+        for attempt in range(2):
+            if getattr(local, "pid", None) != os.getpid():
+                local.connection = _RespConnection(*self._address, self._password, self._db,
+                                                   STATE_LOCK_TIMEOUT_SECONDS)
+                local.pid, local.locks = os.getpid(), {}
+            try:
+                return local.connection.command(*args)
+            except (OSError, ConnectionError) as e:
+                # Reconnect once (e.g. the server restarted), then give up
+                local.connection.close()
+                local.pid = None
+                if attempt:
+                    raise StateBackendError(f"State server unavailable: {e}")
+
+    def _key(self, namespace: str, key: Any) -> bytes:
+        return f"{self.prefix}{namespace}:".encode("utf-8") + _encode_key(key).hex().encode("ascii")
+
+    def _scan(self, pattern: str) -> List[bytes]:
+        keys, cursor = [], b"0"
+        while True:
+            cursor, batch = self._command("SCAN", cursor, "MATCH", pattern, "COUNT", 1000)
+            keys.extend(batch)
+            if cursor in (b"0", "0"):
+                return keys
+
+    @contextmanager
+    def lock(self, namespace: str):
+        """Hold a lease on the namespace so a read-modify-write is atomic across workers (reentrant per thread)."""
+        self._command("PING")  # Opens this thread's connection
+        locks = self._local.locks
+        if namespace in locks:
+            locks[namespace][1] += 1
+        else:
+            lock_key = f"{self.prefix}lock:{namespace}"
+            token = uuid.uuid4().hex
+            deadline = time.monotonic() + STATE_LOCK_TIMEOUT_SECONDS
+            delay = 0.001
+            while self._command("SET", lock_key, token, "NX", "PX", int(STATE_LOCK_LEASE_SECONDS * 1000)) is None:
+                if time.monotonic() > deadline:
+                    raise StateBackendError(f"Timed out waiting for the {namespace} lock")
+                # Backs off while another worker holds the lease (blocking: call from a worker thread)
+                time.sleep(delay)
+                delay = min(delay * 2, 0.05)
+            locks[namespace] = [token, 1]
+            with self._leases_lock:
+                self._leases[lock_key] = [token, False]
+            self._start_renewer()
+        try:
+            yield
+        except BaseException:
+            self._release(namespace)
+            raise
+        if not self._release(namespace):
+            raise StateBackendError(f"Lost the {namespace} lock lease while holding it; "
+                                    f"another worker may have written concurrently")
+
+    def _release(self, namespace: str) -> bool:
+        """Leave one level of lock(namespace); False if the lease had been lost."""
+        locks = self._local.locks
+        locks[namespace][1] -= 1
+        if locks[namespace][1]:
+            return True
+        token = locks.pop(namespace)[0]
+        lock_key = f"{self.prefix}lock:{namespace}"
+        with self._leases_lock:
+            lost = self._leases.pop(lock_key, [token, False])[1]
+        # Only deletes our own lease (it may have expired and been taken since)
+        released = self._command("EVAL", _RELEASE_SCRIPT, 1, lock_key, token)
+        return bool(released) and not lost
+
+    def _start_renewer(self):
+        with self._leases_lock:
+            if self._renewer_pid == os.getpid():
+                return
+            self._renewer_pid = os.getpid()
+        threading.Thread(target=self._renew_leases, name="state-lock-renewer", daemon=True).start()
+
+    def _renew_leases(self):
+        while True:
+            time.sleep(STATE_LOCK_LEASE_SECONDS / 3)
+            with self._leases_lock:
+                held = [(lock_key, lease[0]) for lock_key, lease in self._leases.items()]
+            for lock_key, token in held:
+                try:
+                    renewed = self._command("EVAL", _RENEW_SCRIPT, 1, lock_key, token,
+                                            int(STATE_LOCK_LEASE_SECONDS * 1000))
+                except StateBackendError as e:
+                    print(f"Error renewing the {lock_key} lease: {e}")
+                    continue
+                if not renewed:
+                    with self._leases_lock:
+                        lease = self._leases.get(lock_key)
+                        if lease is not None and lease[0] == token:
+                            lease[1] = True
+
+    def get(self, namespace: str, key: Any, default: Any = None) -> Any:
+        """Look up a value (a fresh copy)."""
+        config = self._config(namespace)
+        blob = self._command("GET", self._key(namespace, key))
+        if blob is None:
+            config.stats["misses"] += 1
+            return default
+        config.stats["hits"] += 1
+        return _decode_value(blob)
+
+    def set(self, namespace: str, key: Any, value: Any, ttl_seconds: Optional[float] = None) -> bool:
+        """
+        Store a value.
+
+        Returns:
+            bool: False if the value alone exceeds the namespace's byte limit and was not stored
+        """
+        config = self._config(namespace)
+        blob = _encode_value(value)
+        if len(blob) > config.max_bytes:
+            if config.evict:
+                self._command("DEL", self._key(namespace, key))
+            config.stats["rejected"] += 1
+            return False
+        ttl = self._ttl(namespace, ttl_seconds)
+        if ttl:
+            self._command("SET", self._key(namespace, key), blob, "PX", max(1, int(ttl * 1000)))
+        else:
+            self._command("SET", self._key(namespace, key), blob)
+        config.stats["sets"] += 1
+        return True
+
+    def delete(self, namespace: str, key: Any) -> bool:
+        """
+        Remove an entry.
+
+        Returns:
+            bool: Whether the key was present
+        """
+        return self._command("DEL", self._key(namespace, key)) > 0
+
+    def items(self, namespace: str) -> Iterator[Tuple[Any, Any]]:
+        """Iterate over a snapshot of the namespace's entries (in no particular order)."""
+        prefix = f"{self.prefix}{namespace}:".encode("utf-8")
+        keys = self._scan(_glob_escape(f"{self.prefix}{namespace}:") + "*")
+        snapshot = []
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            for key, blob in zip(chunk, self._command("MGET", *chunk)):
+                if blob is not None:
+                    snapshot.append((_decode_key(bytes.fromhex(key[len(prefix):].decode("ascii"))), _decode_value(blob)))
+        return iter(snapshot)
+
+    def clear(self, namespace: Optional[str] = None):
+        """Remove all entries of one namespace, or every key under the prefix."""
+        pattern = _glob_escape(self.prefix if namespace is None else f"{self.prefix}{namespace}:") + "*"
+        keys = self._scan(pattern)
+        for start in range(0, len(keys), 500):
+            self._command("DEL", *keys[start:start + 500])
+
+    def purge_expired(self) -> int:
+        """The server expires keys itself; nothing to do."""
+        return 0
+
+    def stats(self, namespace: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """Return limits and this worker's hit/miss counters (sizes are the server's to report)."""
+        return {
+            name: {**config.stats, "max_entries": config.max_entries, "max_bytes": config.max_bytes,
+                   "ttl_seconds": config.ttl}
+            for name, config in self._configs.items()
+            if namespace is None or name == namespace
+        }
+
+
+def _encode_reply(value: Any) -> bytes:
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, Exception):
+        return f"-ERR {value}\r\n".encode("utf-8")
+    if isinstance(value, str):
+        return f"+{value}\r\n".encode("utf-8")
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, bytes):
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+    return b"*%d\r\n" % len(value) + b"".join(_encode_reply(item) for item in value)
+
+
+def _glob_prefix(pattern: bytes) -> bytes:
+    # The stand-in only supports the "<literal prefix>*" patterns RedisStore sends
+    if not pattern.endswith(b"*"):
+        raise StateBackendError("only prefix patterns are supported")
+    return pattern[:-1].replace(b"[*]", b"*").replace(b"[?]", b"?").replace(b"[[]", b"[")
+
+
+class KVStandInServer:
+    """
+    In-process TCP server speaking the part of the Redis protocol RedisStore
+    uses (PING, AUTH, SELECT, GET, SET [NX] [PX], DEL, EVAL of the lock
+    scripts, MGET, SCAN, DBSIZE, FLUSHDB), for running several workers against a "network" store without
+    a Redis install. One database, nothing persisted.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self._data: Dict[bytes, Tuple[bytes, Optional[float]]] = {}
+        self._lock = threading.Lock()
+        stand_in = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                while True:
+                    try:
+                        request = _read_reply(self.rfile)
+                    except (ConnectionError, OSError):
+                        return
+                    try:
+                        reply = stand_in._execute([part.upper() if index == 0 else part
+                                                   for index, part in enumerate(request)])
+                    except Exception as e:
+                        reply = e
+                    self.wfile.write(_encode_reply(reply))
+
+        class Server(socketserver.ThreadingTCPServer):
+            allow_reuse_address = True
+            daemon_threads = True
+
+        self._server = Server((host, port), Handler)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"redis://{host}:{port}/0"
+
+    def start(self) -> "KVStandInServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="kv-stand-in", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _live(self, key: bytes) -> Optional[bytes]:
+        entry = self._data.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= time.monotonic():
+            del self._data[key]
+            entry = None
+        return entry[0] if entry else None
+
+    def _execute(self, request: List[bytes]) -> Any:
+        command, args = request[0], request[1:]
+        with self._lock:
+            if command == b"PING":
+                return "PONG"
+            if command in (b"AUTH", b"SELECT"):
+                return "OK"
+            if command == b"GET":
+                return self._live(args[0])
+            if command == b"MGET":
+                return [self._live(key) for key in args]
+            if command == b"SET":
+                key, value, options = args[0], args[1], [option.upper() for option in args[2:]]
+                if b"NX" in options and self._live(key) is not None:
+                    return None
+                expires_at = None
+                if b"PX" in options:
+                    expires_at = time.monotonic() + int(args[2 + options.index(b"PX") + 1]) / 1000
+                self._data[key] = (value, expires_at)
+                return "OK"
+            if command == b"DEL":
+                return sum(self._live(key) is not None and self._data.pop(key) is not None for key in args)
+            if command == b"EVAL":
+                return self._eval(args[0].decode("utf-8"), args[2:2 + int(args[1])], args[2 + int(args[1]):])
+            if command == b"SCAN":
+                options = [option.upper() for option in args[1:]]
+                prefix = _glob_prefix(args[1 + options.index(b"MATCH") + 1]) if b"MATCH" in options else b""
+                return [b"0", [key for key in list(self._data) if key.startswith(prefix) and self._live(key)]]
+            if command == b"DBSIZE":
+                return sum(self._live(key) is not None for key in list(self._data))
+            if command == b"FLUSHDB":
+                self._data.clear()
+                return "OK"
+        raise StateBackendError(f"unknown command {command.decode('utf-8', 'replace')}")
+
+    def _eval(self, script: str, keys: List[bytes], argv: List[bytes]) -> int:
+        # Only the lock scripts RedisStore sends (called with self._lock held)
+        if self._live(keys[0]) != argv[0]:
+            return 0
+        if script == _RELEASE_SCRIPT:
+            del self._data[keys[0]]
+            return 1
+        if script == _RENEW_SCRIPT:
+            self._data[keys[0]] = (argv[0], time.monotonic() + int(argv[1]) / 1000)
+            return 1
+        raise StateBackendError("only the lock scripts are supported")
+
+
+_shared_store = None
+_shared_store_lock = threading.Lock()
+
+
+def get_shared_store():
+    """
+    Get the process-wide shared state backend selected by STATE_BACKEND.
+
+    Returns:
+        BoundedStore, SQLiteStore or RedisStore
+    """
+    global _shared_store
+    if _shared_store is None:
+        with _shared_store_lock:
+            if _shared_store is None:
+                if STATE_BACKEND == "sqlite":
+                    _shared_store = SQLiteStore(STATE_SQLITE_PATH)
+                elif STATE_BACKEND == "redis":
+                    _shared_store = RedisStore(STATE_REDIS_URL)
+                elif STATE_BACKEND == "memory":
+                    _shared_store = get_store()
+                else:
+                    raise ValueError(f"Unknown STATE_BACKEND {STATE_BACKEND!r} (expected memory, sqlite or redis)")
+    return _shared_store
+
+
+def is_state_shared() -> bool:
+    """Whether state is shared between worker processes (STATE_BACKEND is not "memory")."""
+    return get_shared_store() is not get_store()
@@ -0,0 +1,308 @@
+"""
+store_utils.py
+Bounded in-process key/value store for transient per-worker state.
+Each namespace has its own limits on entry count and approximate byte size,
+an optional TTL, and evicts least recently used entries once a limit is
+reached (or, for data that must not silently disappear, rejects the write),
+so caches and scratch data can't grow a long-running worker without bound.
+Hits, misses, expirations and evictions are counted per namespace.
+"""
+
+import copy
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+# Defaults for namespaces that aren't configured explicitly
+STORE_DEFAULT_MAX_ENTRIES = int(os.getenv("STORE_DEFAULT_MAX_ENTRIES", "1024"))
+STORE_DEFAULT_MAX_BYTES = int(os.getenv("STORE_DEFAULT_MAX_BYTES", str(16 * 1024 * 1024)))
+STORE_DEFAULT_TTL_SECONDS = float(os.getenv("STORE_DEFAULT_TTL_SECONDS", "3600"))
+
+
+def estimate_size(value: Any) -> int:
+    """
+    Approximate memory footprint of a value in bytes, following containers.
+
+    Args:
+        value: Any value built from dicts, lists, tuples, sets, strings, bytes and scalars
+
+    Returns:
+        int: Estimated size in bytes
+    """
+    seen = set()
+    stack = [value]
+    total = 0
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+        elif hasattr(item, "__dict__"):
+            stack.append(vars(item))
+    return total
+
+
+class _Namespace:
+    def __init__(self, max_entries: int, max_bytes: int, ttl: Optional[float], copy_values: bool,
+                 evict: bool = True):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.copy_values = copy_values
+        self.evict = evict
+        # key -> (value, size, expires_at)
+        self.entries: "OrderedDict[Any, Tuple[Any, int, Optional[float]]]" = OrderedDict()
+        self.bytes = 0
+        self.stats = {"hits": 0, "misses": 0, "sets": 0, "evictions": 0, "expirations": 0, "rejected": 0}
+
+
+class BoundedStore:
+    """
+    Thread-safe namespaced store with per-namespace entry/byte limits,
+    TTL expiry and LRU eviction.
+    """
+
+    def __init__(self):
+        self._namespaces: Dict[str, _Namespace] = {}
+        self._lock = threading.Lock()
+        self._caller_locks: Dict[str, threading.RLock] = {}
+
+    def configure(self, namespace: str, max_entries: int = STORE_DEFAULT_MAX_ENTRIES,
+                  max_bytes: int = STORE_DEFAULT_MAX_BYTES, ttl_seconds: Optional[float] = STORE_DEFAULT_TTL_SECONDS,
+                  copy_values: bool = True, evict: bool = True):
+        """
+        Set a namespace's limits (existing entries are kept and re-checked on the next write).
+
+        Args:
+            namespace: Namespace name
+            max_entries: Maximum number of entries
+            max_bytes: Maximum approximate total size of the entries
+            ttl_seconds: Default time to live (None: entries only leave by eviction)
+            copy_values: Copy values on the way in and out so callers can't mutate stored entries
+            evict: Evict least recently used entries when full; False rejects the
+                write instead (set returns False), for data that must not be lost
+        """
+        with self._lock:
+            existing = self._namespaces.get(namespace)
+            config = _Namespace(max_entries, max_bytes, ttl_seconds, copy_values, evict)
+            if existing is not None:
+                config.entries, config.bytes, config.stats = existing.entries, existing.bytes, existing.stats
+            self._namespaces[namespace] = config
+
+    def _namespace(self, namespace: str) -> _Namespace:
+        config = self._namespaces.get(namespace)
+        if config is None:
+            config = self._namespaces[namespace] = _Namespace(
+                STORE_DEFAULT_MAX_ENTRIES, STORE_DEFAULT_MAX_BYTES, STORE_DEFAULT_TTL_SECONDS, True
+            )
+        return config
+
+    @staticmethod
+    def _drop(config: _Namespace, key: Any, outcome: str):
+        _, size, _ = config.entries.pop(key)
+        config.bytes -= size
+        config.stats[outcome] += 1
+
+    def get(self, namespace: str, key: Any, default: Any = None) -> Any:
+        """
+        Look up a value and mark it recently used.
+
+        Args:
+            namespace: Namespace name
+            key: Entry key
+            default: Returned on a miss or an expired entry
+
+        Returns:
+            The stored value (a copy if the namespace copies values) or default
+        """
+        with self._lock:
+            config = self._namespace(namespace)
+            entry = config.entries.get(key)
+            if entry is not None and entry[2] is not None and entry[2] <= time.monotonic():
+                self._drop(config, key, "expirations")
+                entry = None
+            if entry is None:
+                config.stats["misses"] += 1
+                return default
+            config.entries.move_to_end(key)
+            config.stats["hits"] += 1
+            value, copy_values = entry[0], config.copy_values
+        return copy.deepcopy(value) if copy_values else value
+
+    def set(self, namespace: str, key: Any, value: Any, ttl_seconds: Optional[float] = None) -> bool:
+        """
+        Store a value, evicting least recently used entries until the
+        namespace is back within its limits.
+
+        Args:
+            namespace: Namespace name
+            key: Entry key
+            value: Value to store
+            ttl_seconds: Time to live for this entry (defaults to the namespace TTL)
+
+        Returns:
+            bool: False if the value was not stored: it alone exceeds the
+            namespace's byte limit, or the namespace doesn't evict and is full
+            (the previous value, if any, is then kept)
+        """
+        with self._lock:
+            copy_values = self._namespace(namespace).copy_values
+        if copy_values:
+            value = copy.deepcopy(value)
+        # Sized outside the lock; it walks the whole value
+        size = estimate_size(value)
+        with self._lock:
+            config = self._namespace(namespace)
+            # Checked before touching the existing entry, which a rejected value leaves in place
+            if size > config.max_bytes:
+                config.stats["rejected"] += 1
+                return False
+            if not config.evict:
+                existing = config.entries.get(key)
+                entries = len(config.entries) + (existing is None)
+                if entries > config.max_entries or config.bytes - (existing[1] if existing else 0) + size > config.max_bytes:
+                    config.stats["rejected"] += 1
+                    return False
+            if key in config.entries:
+                _, old_size, _ = config.entries.pop(key)
+                config.bytes -= old_size
+            ttl = config.ttl if ttl_seconds is None else ttl_seconds
+            config.entries[key] = (value, size, time.monotonic() + ttl if ttl else None)
+            config.bytes += size
+            config.stats["sets"] += 1
+            self._evict(config)
+        return True
+
+    @staticmethod
+    def _over_limit(config: _Namespace) -> bool:
+        return len(config.entries) > config.max_entries or config.bytes > config.max_bytes
+
+    def _evict(self, config: _Namespace):
+        if not self._over_limit(config):
+            return
+        # Expired entries go first, then least recently used ones
+        now = time.monotonic()
+        expired = [key for key, (_, _, expires_at) in config.entries.items()
+                   if expires_at is not None and expires_at <= now]
+        for key in expired:
+            self._drop(config, key, "expirations")
+        while config.entries and self._over_limit(config):
+            self._drop(config, next(iter(config.entries)), "evictions")
+
+    @contextmanager
+    def lock(self, namespace: str):
+        """
+        Hold the namespace's (reentrant) lock so a caller's read-modify-write
+        sequence isn't interleaved with another thread's. Single operations
+        don't need it, and other namespaces aren't blocked.
+        """
+        with self._lock:
+            caller_lock = self._caller_locks.setdefault(namespace, threading.RLock())
+        with caller_lock:
+            yield
+
+    def delete(self, namespace: str, key: Any) -> bool:
+        """
+        Remove an entry.
+
+        Returns:
+            bool: Whether the key was present
+        """
+        with self._lock:
+            config = self._namespace(namespace)
+            if key not in config.entries:
+                return False
+            _, size, _ = config.entries.pop(key)
+            config.bytes -= size
+            return True
+
+    def items(self, namespace: str) -> Iterator[Tuple[Any, Any]]:
+        """
+        Iterate over a snapshot of the live entries, least recently used
+        first, without marking them used. Values are not copied.
+
+        Args:
+            namespace: Namespace name
+
+        Returns:
+            Iterator of (key, value)
+        """
+        now = time.monotonic()
+        with self._lock:
+            snapshot = [(key, value) for key, (value, _, expires_at) in self._namespace(namespace).entries.items()
+                        if expires_at is None or expires_at > now]
+        return iter(snapshot)
+
+    def clear(self, namespace: Optional[str] = None):
+        """Remove all entries of one namespace, or of every namespace."""
+        with self._lock:
+            for name, config in self._namespaces.items():
+                if namespace is None or name == namespace:
+                    config.entries.clear()
+                    config.bytes = 0
+
+    def purge_expired(self) -> int:
+        """
+        Drop expired entries in every namespace (expired entries are otherwise
+        removed lazily, on access or on the next write to their namespace).
+
+        Returns:
+            int: Number of entries removed
+        """
+        removed = 0
+        now = time.monotonic()
+        with self._lock:
+            for config in self._namespaces.values():
+                expired = [key for key, (_, _, expires_at) in config.entries.items()
+                           if expires_at is not None and expires_at <= now]
+                for key in expired:
+                    self._drop(config, key, "expirations")
+                removed += len(expired)
+        return removed
+
+    def stats(self, namespace: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Return per-namespace size, limits and hit/miss/eviction counters.
+
+        Args:
+            namespace: Only this namespace (default: all)
+
+        Returns:
+            dict: {namespace: stats}
+        """
+        with self._lock:
+            return {
+                name: {
+                    **config.stats,
+                    "entries": len(config.entries),
+                    "bytes": config.bytes,
+                    "max_entries": config.max_entries,
+                    "max_bytes": config.max_bytes,
+                    "ttl_seconds": config.ttl,
+                }
+                for name, config in self._namespaces.items()
+                if namespace is None or name == namespace
+            }
+
+
+_store = BoundedStore()
+
+
+def get_store() -> BoundedStore:
+    """
+    Get the process-wide bounded store.
+
+    Returns:
+        BoundedStore instance
+    """
+    return _store
@@ -1,4 +1,214 @@
 """
 syllabus_utils.py
 Functions for parsing syllabus, cleaning text, generating JSON topics.
+Splits syllabus text into fingerprinted sections so a re-uploaded syllabus
+only sends its changed sections back through the LLM, and reports how the
+topics changed between versions. A first parse is a single LLM call over
+the whole text; its topics are then attributed to sections for later
+re-parses.
 """
+
+import hashlib
+import re
+from typing import Dict, List, Optional, Tuple
+
+# Sections shorter than this are merged into their neighbour
+SECTION_MIN_CHARS = 200
+# Upper bound on sections per syllabus (each changed section is one LLM call)
+SECTION_MAX_COUNT = 16
+# Changed sections sent to the LLM at the same time during a re-parse
+SECTION_PARSE_CONCURRENCY = 4
+
+# "Unit 3", "Module II: ...", "Week 4 - ...", "Chapter 1"
+_KEYWORD_HEADING = re.compile(
+    r"^(unit|module|chapter|section|part|week|lecture|topic|lesson)\s*[-:#.]?\s*(\d+|[ivxlc]+)\b",
+    re.IGNORECASE
+)
+# "1. Introduction", "II) Relational model" - top-level numbering only, not "1.1"
+_NUMBERED_HEADING = re.compile(r"^(\d{1,2}|[IVXLC]{1,5})[.)]\s+[A-Z]")
+# "COURSE OBJECTIVES"
+_CAPS_HEADING = re.compile(r"^[A-Z][A-Z0-9 &,:/()'-]{3,}$")
+
+
+def fingerprint_text(text: str) -> str:
+    """
+    Fingerprint a piece of syllabus text, ignoring case and whitespace changes.
+
+    Args:
+        text: Section text
+
+    Returns:
+        str: SHA-256 hex digest of the normalized text
+    """
+    return hashlib.sha256(" ".join(text.lower().split()).encode("utf-8")).hexdigest()
+
+
+def _is_heading(line: str) -> bool:
+    line = line.strip()
+    if not line or len(line) > 100:
+        return False
+    return bool(_KEYWORD_HEADING.match(line) or _NUMBERED_HEADING.match(line) or _CAPS_HEADING.match(line))
+
+
+def _merge_into(target: Dict[str, str], other: Dict[str, str]):
+    target["text"] = f"{target['text']}\n{other['text']}".strip()
+    target["heading"] = target["heading"] or other["heading"]
+
+
+def split_into_sections(text: str, min_chars: int = SECTION_MIN_CHARS,
+                        max_sections: int = SECTION_MAX_COUNT) -> List[Dict[str, str]]:
+    """
+    Split syllabus text at its headings (units, modules, numbered or
+    all-caps titles). Tiny sections are merged into their neighbours and the
+    count is capped so the number of LLM calls stays bounded.
+
+    Args:
+        text: Syllabus text
+        min_chars: Minimum section size before merging
+        max_sections: Maximum number of sections
+
+    Returns:
+        list: Sections as {"heading", "text", "fingerprint"} in document order
+    """
+    sections = [{"heading": "", "text": ""}]
+    for line in text.splitlines():
+        if _is_heading(line) and sections[-1]["text"].strip():
+            sections.append({"heading": line.strip(), "text": line})
+        else:
+            if _is_heading(line) and not sections[-1]["heading"]:
+                sections[-1]["heading"] = line.strip()
+            sections[-1]["text"] += ("\n" if sections[-1]["text"] else "") + line
+    sections = [section for section in sections if section["text"].strip()]
+
+    # Fold undersized sections into the previous one (the first into the next)
+    merged: List[Dict[str, str]] = []
+    for section in sections:
+        if merged and len(merged[-1]["text"]) < min_chars:
+            _merge_into(merged[-1], section)
+        elif merged and len(section["text"]) < min_chars:
+            _merge_into(merged[-1], section)
+        else:
+            merged.append(section)
+
+    while len(merged) > max(1, max_sections):
+        # Merge the smallest section with its smaller neighbour
+        index = min(range(len(merged)), key=lambda i: len(merged[i]["text"]))
+        if index == 0:
+            neighbour = 1
+        elif index == len(merged) - 1:
+            neighbour = index - 1
+        else:
+            neighbour = min(index - 1, index + 1, key=lambda i: len(merged[i]["text"]))
+        first, second = sorted((index, neighbour))
+        _merge_into(merged[first], merged.pop(second))
+
+    for section in merged:
+        section["text"] = section["text"].strip()
+        section["fingerprint"] = fingerprint_text(section["text"])
+    return merged
+
+
+def match_sections(previous: List[Dict], current: List[Dict]) -> Tuple[Dict[int, Dict[str, List[str]]], Dict[str, int]]:
+    """
+    Find which current sections are unchanged since the previous version.
+
+    Args:
+        previous: Stored sections of the previous version, each with
+            "fingerprint", "heading" and "topics"
+        current: Sections from split_into_sections
+
+    Returns:
+        (reused, summary) where reused maps current section index to the
+        previous topics for that section, and summary counts sections that
+        are unchanged, changed (same heading, new content), added and removed
+    """
+    available: Dict[str, List[Dict]] = {}
+    for section in previous:
+        available.setdefault(section["fingerprint"], []).append(section)
+
+    reused = {}
+    for index, section in enumerate(current):
+        candidates = available.get(section["fingerprint"])
+        if candidates:
+            reused[index] = candidates.pop(0)["topics"]
+
+    unmatched_previous = [section for sections in available.values() for section in sections]
+    previous_headings = {section["heading"] for section in unmatched_previous if section["heading"]}
+    new_sections = [section for index, section in enumerate(current) if index not in reused]
+    changed = sum(1 for section in new_sections if section["heading"] and section["heading"] in previous_headings)
+    summary = {
+        "unchanged": len(reused),
+        "changed": changed,
+        "added": len(new_sections) - changed,
+        "removed": len(unmatched_previous) - changed,
+    }
+    return reused, summary
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def assign_topics_to_sections(topics: Dict[str, List[str]], sections: List[Dict]) -> List[Dict[str, List[str]]]:
+    """
+    Attribute topics parsed from the whole text to the sections they came
+    from, so a later re-parse can reuse the topics of unchanged sections.
+    A topic goes to the section mentioning its name and subtopics most
+    often (the earliest on a tie); topics found nowhere go to the first
+    section.
+
+    Args:
+        topics: Structured topics of the whole text
+        sections: Sections from split_into_sections
+
+    Returns:
+        list: Structured topics per section, in section order
+    """
+    section_topics: List[Dict[str, List[str]]] = [{} for _ in sections]
+    if not sections:
+        return section_topics
+    texts = [_normalize(section["text"]) for section in sections]
+    for topic, subtopics in topics.items():
+        terms = [term for term in (_normalize(name) for name in [topic, *subtopics]) if term]
+        scores = [sum(text.count(term) for term in terms) for text in texts]
+        best = max(range(len(sections)), key=lambda index: (scores[index], -index))
+        section_topics[best][topic] = subtopics
+    return section_topics
+
+
+def merge_topics(section_topics: List[Dict[str, List[str]]]) -> Dict[str, List[str]]:
+    """
+    Combine per-section topics in section order. A topic appearing in
+    several sections keeps one entry with the union of its subtopics.
+
+    Args:
+        section_topics: Structured topics of each section
+
+    Returns:
+        dict: Merged {topic_name: [subtopics]}
+    """
+    merged: Dict[str, List[str]] = {}
+    for topics in section_topics:
+        for topic, subtopics in topics.items():
+            existing = merged.setdefault(topic, [])
+            existing.extend(subtopic for subtopic in subtopics if subtopic not in existing)
+    return merged
+
+
+def diff_topics(old: Optional[Dict[str, List[str]]], new: Dict[str, List[str]]) -> Dict[str, List[str]]:
+    """
+    Compare two versions of structured topics.
+
+    Args:
+        old: Previous structured topics (None for a first parse)
+        new: Current structured topics
+
+    Returns:
+        dict: "added", "removed" and "changed" (different subtopics) topic names
+    """
+    old = old or {}
+    return {
+        "added": [topic for topic in new if topic not in old],
+        "removed": [topic for topic in old if topic not in new],
+        "changed": [topic for topic in new if topic in old and old[topic] != new[topic]],
+    }
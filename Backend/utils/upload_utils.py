@@ -0,0 +1,337 @@
+"""
+upload_utils.py
+Streaming handling of multipart file uploads.
+Upload routes read their body with read_upload_form, which parses the
+multipart stream itself (python-multipart's callback parser) and writes
+each file part into an UploadSpool: the part is hashed and checked against
+UPLOAD_MAX_BYTES as its bytes arrive, so an oversized file is rejected with
+413 mid-stream and nothing is read twice. Parts stay in memory up to
+UPLOAD_SPOOL_MAX_MEMORY and move to a named temporary file beyond that,
+which worker processes open by path instead of receiving the bytes.
+"""
+
+import hashlib
+import io
+import os
+import tempfile
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from fastapi import HTTPException, Request, UploadFile
+from python_multipart.multipart import MultipartParser, parse_options_header
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import FormData, Headers
+
+# Largest single uploaded file accepted
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(20 * 1024 * 1024)))
+# Largest request body accepted (all files and form fields together)
+UPLOAD_MAX_REQUEST_BYTES = int(os.getenv("UPLOAD_MAX_REQUEST_BYTES", str(100 * 1024 * 1024)))
+# Uploads up to this size stay in memory; larger ones roll over to a temporary file
+UPLOAD_SPOOL_MAX_MEMORY = int(os.getenv("UPLOAD_SPOOL_MAX_MEMORY", str(1024 * 1024)))
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(256 * 1024)))
+# Parts (files and fields) per request, and bytes per non-file field
+UPLOAD_MAX_PARTS = int(os.getenv("UPLOAD_MAX_PARTS", "1000"))
+UPLOAD_MAX_FIELD_BYTES = int(os.getenv("UPLOAD_MAX_FIELD_BYTES", str(1024 * 1024)))
+
+
+class UploadTooLargeError(ValueError):
+    """Raised when an upload exceeds the configured size limit."""
+
+    def __init__(self, limit: int, filename: Optional[str] = None):
+        self.limit = limit
+        name = f"'{filename}' " if filename else ""
+        super().__init__(f"Upload {name}exceeds the {limit / (1024 * 1024):g} MB limit")
+
+
+class UploadSpool:
+    """
+    File for one uploaded part that hashes and size-checks every write.
+    Held in memory up to max_size bytes, then moved to a named temporary
+    file (deleted on close) so it has a path.
+    """
+
+    def __init__(self, max_size: int, max_bytes: int, filename: Optional[str] = None):
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self.filename = filename
+        self.received = 0
+        self._digest = hashlib.sha256()
+        self._file: Any = io.BytesIO()
+        self._on_disk = False
+
+    def spills(self, size: int) -> bool:
+        """Whether writing size more bytes touches the disk (so belongs off the event loop)."""
+        return self._on_disk or self.received + size > self.max_size
+
+    def write(self, data: bytes) -> int:
+        self.received += len(data)
+        if self.received > self.max_bytes:
+            raise UploadTooLargeError(self.max_bytes, self.filename)
+        self._digest.update(data)
+        if not self._on_disk and self.received > self.max_size:
+            memory, self._file = self._file, tempfile.NamedTemporaryFile(prefix="upload-")
+            self._file.write(memory.getvalue())
+            self._on_disk = True
+        return self._file.write(data)
+
+    def read(self, size: int = -1) -> bytes:
+        return self._file.read(size)
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        return self._file.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self._file.tell()
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    @property
+    def closed(self) -> bool:
+        return self._file.closed
+
+    @property
+    def sha256(self) -> str:
+        return self._digest.hexdigest()
+
+    @property
+    def path(self) -> Optional[str]:
+        """Path of the on-disk file, or None while the part is held in memory."""
+        return self._file.name if self._on_disk else None
+
+
+class _MultipartReader:
+    """Callbacks for MultipartParser that collect one request's parts."""
+
+    def __init__(self, max_file_bytes: int, spool_max_size: int, max_parts: int, max_field_bytes: int):
+        self.max_file_bytes = max_file_bytes
+        self.spool_max_size = spool_max_size
+        self.max_parts = max_parts
+        self.max_field_bytes = max_field_bytes
+        self.items: List[Tuple[str, Union[str, UploadFile]]] = []
+        self.spools: List[UploadSpool] = []
+        # (spool or field buffer, bytes) received since the last drain, written in order
+        self.pending: List[Tuple[Union[UploadSpool, bytearray], bytes]] = []
+        self._headers: List[Tuple[bytes, bytes]] = []
+        self._field = self._value = b""
+        self._target: Optional[Union[UploadSpool, bytearray]] = None
+        self._name = ""
+
+    def callbacks(self) -> Dict[str, Any]:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+        }
+
+    def on_part_begin(self):
+        if len(self.items) >= self.max_parts:
+            raise HTTPException(status_code=400, detail=f"Too many form parts (at most {self.max_parts})")
+        self._headers = []
+
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self._field += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self._value += data[start:end]
+
+    def on_header_end(self):
+        self._headers.append((self._field.lower(), self._value))
+        self._field = self._value = b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(dict(self._headers).get(b"content-disposition"))
+        if b"name" not in options:
+            raise HTTPException(status_code=400, detail="Form part without a name")
+        self._name = options[b"name"].decode("utf-8", "replace")
+        if b"filename" in options:
+            filename = options[b"filename"].decode("utf-8", "replace")
+            spool = UploadSpool(self.spool_max_size, self.max_file_bytes, filename)
+            self.spools.append(spool)
+            self._target = spool
+            self.items.append((self._name, UploadFile(spool, filename=filename, headers=Headers(raw=self._headers))))
+        else:
+            self._target = bytearray()
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        self.pending.append((self._target, data[start:end]))
+
+    def on_part_end(self):
+        if isinstance(self._target, bytearray):
+            # Field values are complete once the data received so far is drained
+            self.pending.append((self._target, b""))
+            self.items.append((self._name, self._target))
+
+    async def drain(self):
+        pending, self.pending = self.pending, []
+        for target, data in pending:
+            if isinstance(target, UploadSpool):
+                if target.spills(len(data)):
+                    await run_in_threadpool(target.write, data)
+                else:
+                    target.write(data)
+            else:
+                target.extend(data)
+                if len(target) > self.max_field_bytes:
+                    raise HTTPException(status_code=413, detail=f"Form field exceeds {self.max_field_bytes} bytes")
+
+    def form(self) -> FormData:
+        return FormData([(name, value.decode("utf-8", "replace") if isinstance(value, bytearray) else value)
+                         for name, value in self.items])
+
+
+async def read_upload_form(request: Request, max_file_bytes: int = UPLOAD_MAX_BYTES,
+                           spool_max_size: int = UPLOAD_SPOOL_MAX_MEMORY) -> FormData:
+    """
+    Read a multipart/form-data request body, spooling each file part into
+    an UploadSpool as it streams in. Close the form (await form.close())
+    when done with it; that deletes the spooled files.
+
+    Args:
+        request: The incoming request
+        max_file_bytes: Largest accepted file part
+        spool_max_size: File bytes kept in memory before moving to disk
+
+    Returns:
+        FormData: Field values as str, files as UploadFile
+
+    Raises:
+        HTTPException: 400 for a malformed body, 413 when a file or field is too large
+    """
+    content_type, options = parse_options_header(request.headers.get("content-type"))
+    if content_type != b"multipart/form-data" or b"boundary" not in options:
+        raise HTTPException(status_code=400, detail="Expected a multipart/form-data body")
+    reader = _MultipartReader(max_file_bytes, spool_max_size, UPLOAD_MAX_PARTS, UPLOAD_MAX_FIELD_BYTES)
+    parser = MultipartParser(options[b"boundary"], reader.callbacks())
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            await reader.drain()
+        parser.finalize()
+        await reader.drain()
+    except UploadTooLargeError as e:
+        for spool in reader.spools:
+            spool.close()
+        raise HTTPException(status_code=413, detail=str(e)) from e
+    except HTTPException:
+        for spool in reader.spools:
+            spool.close()
+        raise
+    except Exception as e:
+        for spool in reader.spools:
+            spool.close()
+        raise HTTPException(status_code=400, detail=f"Malformed multipart body: {e}") from e
+    for _, upload in reader.items:
+        if isinstance(upload, UploadFile):
+            upload.size = upload.file.received
+            await upload.seek(0)
+    return reader.form()
+
+
+def upload_form_openapi(files: Dict[str, bool], fields: Dict[str, Dict[str, Any]], required: List[str]) -> Dict:
+    """
+    OpenAPI request body for a route that reads its form with read_upload_form
+    (FastAPI can't infer it from the signature).
+
+    Args:
+        files: Form name -> whether it takes several files
+        fields: Form name -> JSON schema of the field
+        required: Required form names
+
+    Returns:
+        dict: For the route's openapi_extra
+    """
+    binary = {"type": "string", "format": "binary"}
+    properties = {name: {"type": "array", "items": binary} if many else binary for name, many in files.items()}
+    properties.update(fields)
+    return {"requestBody": {"required": True, "content": {"multipart/form-data": {
+        "schema": {"type": "object", "properties": properties, "required": required}
+    }}}}
+
+
+class SpooledUpload:
+    """
+    A fully received upload: its spooled file plus size and SHA-256.
+    """
+
+    def __init__(self, upload: UploadFile, size: int, sha256: str, path: Optional[str] = None):
+        self.upload = upload
+        self.filename = upload.filename
+        self.content_type = upload.content_type
+        self.size = size
+        self.sha256 = sha256
+        self.path = path
+
+    async def read_bytes(self) -> bytes:
+        """
+        Read the whole upload into memory.
+        Bounded by the size limit checked in spool_upload.
+
+        Returns:
+            bytes: File contents
+        """
+        await self.upload.seek(0)
+        return await self.upload.read()
+
+    async def worker_source(self) -> Union[str, bytes]:
+        """
+        What to hand a worker process: the spooled file's path when the
+        upload is on disk (the worker reads it), otherwise the bytes, which
+        are at most UPLOAD_SPOOL_MAX_MEMORY.
+
+        Returns:
+            str or bytes: File path or contents
+        """
+        if self.path is not None:
+            self.upload.file.flush()
+            return self.path
+        return await self.read_bytes()
+
+
+async def spool_upload(upload: UploadFile, max_bytes: int = UPLOAD_MAX_BYTES,
+                       chunk_size: int = UPLOAD_CHUNK_SIZE) -> SpooledUpload:
+    """
+    Size and SHA-256 of an upload. Parts received by read_upload_form were
+    hashed and size-checked while streaming, so this only reads the file
+    for uploads created some other way.
+
+    Args:
+        upload: The uploaded file
+        max_bytes: Maximum accepted size in bytes
+        chunk_size: Bytes read per step
+
+    Returns:
+        SpooledUpload with size and SHA-256 (the file is rewound)
+
+    Raises:
+        UploadTooLargeError: If the upload exceeds max_bytes
+    """
+    spool = upload.file
+    if isinstance(spool, UploadSpool):
+        if spool.received > max_bytes:
+            raise UploadTooLargeError(max_bytes, upload.filename)
+        return SpooledUpload(upload, spool.received, spool.sha256, spool.path)
+
+    # Reject before reading when the part declared its size
+    if upload.size is not None and upload.size > max_bytes:
+        raise UploadTooLargeError(max_bytes, upload.filename)
+
+    digest = hashlib.sha256()
+    size = 0
+    await upload.seek(0)
+    while True:
+        chunk = await upload.read(chunk_size)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > max_bytes:
+            raise UploadTooLargeError(max_bytes, upload.filename)
+        digest.update(chunk)
+    await upload.seek(0)
+    return SpooledUpload(upload, size, digest.hexdigest())
@@ -5,35 +5,415 @@ Uses FAISS for efficient similarity search and sentence-transformers for embeddi
 """
 
 import os
-import tempfile
-from typing import List, Dict, Any, Optional
+import hashlib
+import itertools
+import mmap
+import queue
+import threading
+from collections.abc import MutableMapping
+from typing import List, Dict, Any, Optional, Set
 import numpy as np
 import streamlit as st
-from sentence_transformers import SentenceTransformer
 import faiss
 import PyPDF2
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-import pickle
 import json
 
+from .embedding_utils import get_embedding_engine, get_query_batcher
+
+
+def _content_hash(text: str) -> str:
+    """Fingerprint a chunk's text so unchanged chunks can be detected on re-upload."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def iter_pdf_pages(pdf_file):
+    """
+    Stream the text of a PDF one page at a time.
+    
+    Args:
+        pdf_file: Path or binary file-like object (e.g. Streamlit uploaded file)
+        
+    Yields:
+        (page_number, page_text) tuples, page numbers starting at 1
+    """
+    reader = PyPDF2.PdfReader(pdf_file)
+    for page_num, page in enumerate(reader.pages):
+        yield page_num + 1, page.extract_text() or ""
+
+
+def iter_chunks(pages, chunk_size: int = 1000, chunk_overlap: int = 200):
+    """
+    Stream overlapping chunks from a stream of pages without materializing
+    the whole document. Only a window of a few chunks is buffered.
+    
+    Args:
+        pages: Iterable of (page_number, page_text) tuples
+        chunk_size: Maximum size of each chunk
+        chunk_overlap: Overlap between chunks
+        
+    Yields:
+        (chunk_text, metadata) tuples; metadata holds the chunk's character
+        offsets in the full document and the page it starts on
+    """
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len,
+        separators=["\n\n", "\n", " ", ""]
+    )
+    buffer = ""
+    buffer_offset = 0     # document offset of buffer[0]
+    page_starts = []      # (document offset, page number) of pages overlapping the buffer
+    
+    def locate(chunks):
+        """Pair each chunk with its start position in the buffer."""
+        located, cursor = [], 0
+        for chunk in chunks:
+            start = buffer.find(chunk, cursor)
+            start = cursor if start < 0 else start
+            located.append((chunk, start))
+            cursor = start + 1
+        return located
+    
+    def with_metadata(chunk, start):
+        doc_start = buffer_offset + start
+        page = next((num for offset, num in reversed(page_starts) if offset <= doc_start), page_starts[0][1])
+        return chunk, {"start_offset": doc_start, "end_offset": doc_start + len(chunk), "page": page}
+    
+    for page_num, page_text in pages:
+        page_starts.append((buffer_offset + len(buffer), page_num))
+        buffer += f"\n--- Page {page_num} ---\n{page_text}"
+        if len(buffer) < 4 * chunk_size:
+            continue
+        
+        # Emit everything but the last chunk, which may continue on the next page
+        located = locate(text_splitter.split_text(buffer))
+        if len(located) < 2:
+            continue
+        for chunk, start in located[:-1]:
+            yield with_metadata(chunk, start)
+        
+        tail_start = located[-1][1]
+        buffer = buffer[tail_start:]
+        buffer_offset += tail_start
+        current_page = [(buffer_offset, num) for offset, num in page_starts if offset <= buffer_offset][-1:]
+        page_starts = current_page + [(offset, num) for offset, num in page_starts if offset > buffer_offset]
+    
+    if buffer.strip():
+        for chunk, start in locate(text_splitter.split_text(buffer)):
+            yield with_metadata(chunk, start)
+
+
+def iter_batches(items, batch_size: int):
+    """
+    Group a stream into lists of at most batch_size items.
+    
+    Args:
+        items: Any iterable
+        batch_size: Maximum items per batch
+        
+    Yields:
+        Lists of items
+    """
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _prefetch(iterable, max_pending: int = 2):
+    """
+    Run a generator on a background thread, keeping at most max_pending
+    items buffered, so producing the next item overlaps consuming this one.
+    
+    Args:
+        iterable: Source iterable (e.g. PDF extraction + chunking)
+        max_pending: Bound on items produced but not yet consumed
+        
+    Yields:
+        Items of the source iterable, re-raising any producer error
+    """
+    done = object()
+    pending: "queue.Queue" = queue.Queue(maxsize=max_pending)
+    stop = threading.Event()
+    
+    def produce():
+        try:
+            for item in iterable:
+                if stop.is_set():
+                    return
+                pending.put((item, None))
+        except Exception as e:
+            pending.put((done, e))
+            return
+        pending.put((done, None))
+    
+    producer = threading.Thread(target=produce, name="ingest-prefetch", daemon=True)
+    producer.start()
+    try:
+        while True:
+            item, error = pending.get()
+            if error is not None:
+                raise error
+            if item is done:
+                return
+            yield item
+    finally:
+        # Unblock the producer if the consumer stopped early
+        stop.set()
+        while producer.is_alive():
+            try:
+                pending.get_nowait()
+            except queue.Empty:
+                producer.join(timeout=0.05)
+
+
+# On-disk store format: a JSON manifest pointing at one "generation" of files
+# (FAISS index, sorted chunk IDs, UTF-8 text blob + offsets, and one blob +
+# offsets pair per metadata column). Every file is memory-mapped on load.
+STORE_FORMAT = "studymentor-vectors"
+STORE_VERSION = 1
+
+
+def _load_array(path: str) -> np.ndarray:
+    """Memory-map a .npy file, falling back to a regular load for empty arrays."""
+    try:
+        return np.load(path, mmap_mode="r")
+    except ValueError:
+        return np.load(path)
+
+
+def _save_array(path: str, array: np.ndarray):
+    """np.save to an exact path (np.save would append .npy to temp file names)."""
+    with open(path, "wb") as f:
+        np.save(f, array)
+
+
+def _atomic_write(path: str, write_fn):
+    """
+    Write a file crash-safely: write to a temp file, fsync, then rename over the target.
+    
+    Args:
+        path: Destination path
+        write_fn: Callable that receives the temp path and writes the content
+    """
+    tmp_path = f"{path}.tmp"
+    write_fn(tmp_path)
+    with open(tmp_path, "rb+") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _fsync_directory(path: str):
+    """Persist a rename by fsyncing its directory (not supported on Windows)."""
+    try:
+        fd = os.open(path or ".", os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _write_blob_column(values, blob_path: str, offsets_path: str):
+    """
+    Write variable-length byte values as one contiguous blob plus an int64 offsets array.
+    
+    Args:
+        values: Iterable of bytes, one per row
+        blob_path: Destination of the concatenated bytes
+        offsets_path: Destination of the (rows + 1) offsets array
+    """
+    offsets = [0]
+    
+    def write_blob(tmp_path):
+        with open(tmp_path, "wb") as f:
+            for value in values:
+                f.write(value)
+                offsets.append(offsets[-1] + len(value))
+    
+    _atomic_write(blob_path, write_blob)
+    _atomic_write(offsets_path, lambda tmp: _save_array(tmp, np.array(offsets, dtype=np.int64)))
+
+
+def _write_blob_columns(rows, path_for) -> Dict[str, Dict[str, str]]:
+    """
+    Write rows of named byte values as one blob column per name, in a single pass over the rows.
+    
+    Args:
+        rows: Iterable of {column: bytes} dicts, one per row; missing columns are stored as b""
+        path_for: Callable mapping the n-th column seen to its (blob_path, offsets_path)
+        
+    Returns:
+        Dict mapping each column to its {"blob", "offsets"} paths
+    """
+    paths: Dict[str, Dict[str, str]] = {}
+    blobs = {}
+    offsets: Dict[str, List[int]] = {}
+    count = 0
+    try:
+        for row in rows:
+            for column, value in row.items():
+                if column not in blobs:
+                    blob_path, offsets_path = path_for(len(paths))
+                    paths[column] = {"blob": blob_path, "offsets": offsets_path}
+                    blobs[column] = open(f"{blob_path}.tmp", "wb")
+                    offsets[column] = [0] * (count + 1)
+                blobs[column].write(value)
+            for column, column_offsets in offsets.items():
+                column_offsets.append(column_offsets[-1] + len(row.get(column, b"")))
+            count += 1
+    finally:
+        for f in blobs.values():
+            f.close()
+    
+    for column, files in paths.items():
+        # The blob's temp file is already written; _atomic_write fsyncs and renames it
+        _atomic_write(files["blob"], lambda tmp: None)
+        column_offsets = np.array(offsets[column], dtype=np.int64)
+        _atomic_write(files["offsets"], lambda tmp: _save_array(tmp, column_offsets))
+    return paths
+
+
+class _BlobColumn:
+    """Read-only, memory-mapped view of a column written by ``_write_blob_column``."""
+    
+    def __init__(self, blob_path: str, offsets_path: str):
+        self.offsets = _load_array(offsets_path)
+        with open(blob_path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            self._blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+    
+    def __getitem__(self, row: int) -> bytes:
+        return self._blob[int(self.offsets[row]):int(self.offsets[row + 1])]
+
+
+class _ChunkTable(MutableMapping):
+    """
+    Chunk-ID keyed table used for both chunk texts and chunk metadata.
+    
+    Rows loaded from disk stay in a read-only memory-mapped base and are only
+    decoded when accessed; writes and deletions go to an in-memory overlay.
+    """
+    
+    def __init__(self, ids: Optional[np.ndarray] = None, read_row=None, read_field=None):
+        """
+        Args:
+            ids: Sorted chunk IDs of the memory-mapped base rows
+            read_row: Callable decoding a full base row by row number
+            read_field: Callable decoding one metadata field of a base row, as (field, row)
+        """
+        self._base_ids = ids if ids is not None else np.empty(0, dtype=np.int64)
+        self._read_row = read_row
+        self._read_field = read_field
+        self._overlay: Dict[int, Any] = {}
+        self._hidden: Set[int] = set()  # base IDs deleted or shadowed by the overlay
+    
+    def _base_row(self, key) -> Optional[int]:
+        if not isinstance(key, (int, np.integer)) or len(self._base_ids) == 0 or key in self._hidden:
+            return None
+        row = int(np.searchsorted(self._base_ids, key))
+        if row < len(self._base_ids) and self._base_ids[row] == key:
+            return row
+        return None
+    
+    def __getitem__(self, key):
+        if key in self._overlay:
+            return self._overlay[key]
+        row = self._base_row(key)
+        if row is None:
+            raise KeyError(key)
+        return self._read_row(row)
+    
+    def __contains__(self, key) -> bool:
+        return key in self._overlay or self._base_row(key) is not None
+    
+    def __setitem__(self, key, value):
+        if self._base_row(key) is not None:
+            self._hidden.add(key)
+        self._overlay[key] = value
+    
+    def __delitem__(self, key):
+        if key in self._overlay:
+            del self._overlay[key]
+        elif self._base_row(key) is not None:
+            self._hidden.add(key)
+        else:
+            raise KeyError(key)
+    
+    def __iter__(self):
+        for key in self._base_ids.tolist():
+            if key not in self._hidden:
+                yield key
+        yield from list(self._overlay)
+    
+    def __len__(self) -> int:
+        return len(self._base_ids) - len(self._hidden) + len(self._overlay)
+    
+    def get_field(self, key, field: str):
+        """Read one metadata field of a row without decoding the rest of it."""
+        if key in self._overlay:
+            return self._overlay[key].get(field)
+        row = self._base_row(key)
+        if row is None:
+            raise KeyError(key)
+        return self._read_field(field, row)
+    
+    def field_items(self, field: str):
+        """Yield (chunk_id, value) pairs for one metadata field, scanning only that column."""
+        for row, key in enumerate(self._base_ids.tolist()):
+            if key not in self._hidden:
+                yield key, self._read_field(field, row)
+        for key, value in list(self._overlay.items()):
+            yield key, value.get(field)
+
 
 class VectorDatabase:
     """
     A vector database for storing and retrieving PDF document embeddings.
+
+    Chunks are addressed by stable 64-bit IDs (FAISS ``IndexIDMap2``), so
+    individual files or syllabi can be deleted or replaced without rebuilding
+    the index. Deletions are recorded as tombstones and physically removed
+    from the index by a background compaction pass.
     """
     
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2", compaction_threshold: float = 0.2,
+                 embedding_backend: Optional[str] = None):
         """
         Initialize the vector database with a sentence transformer model.
         
         Args:
             model_name: Name of the sentence transformer model to use
+            compaction_threshold: Fraction of tombstoned vectors that triggers background compaction
+            embedding_backend: Embedding backend ("torch", "onnx" or "int8"); defaults to EMBEDDING_BACKEND
         """
-        self.model = SentenceTransformer(model_name)
-        self.dimension = self.model.get_sentence_embedding_dimension()
-        self.index = faiss.IndexFlatIP(self.dimension)  # Inner product for cosine similarity
-        self.documents = []  # Store original text chunks
-        self.metadata = []   # Store metadata for each chunk
+        # Engines are shared process-wide, so re-initializing the database doesn't reload the model
+        self.engine = get_embedding_engine(model_name, embedding_backend)
+        self.query_batcher = get_query_batcher(model_name, embedding_backend)
+        self.dimension = self.engine.dimension
+        # Inner product for cosine similarity, wrapped so rows carry our own 64-bit IDs
+        self.index = faiss.IndexIDMap2(faiss.IndexFlatIP(self.dimension))
+        self.documents = _ChunkTable()  # chunk_id -> original text chunk
+        self.metadata = _ChunkTable()   # chunk_id -> metadata
+        self.compaction_threshold = compaction_threshold
+        self._index_source: Optional[str] = None  # set while the index is a read-only memory map
+        self._next_id = 1
+        self._tombstones: Set[int] = set()
+        self._lock = threading.RLock()
+        self._compaction_thread: Optional[threading.Thread] = None
+
+    def __len__(self) -> int:
+        """Number of live (non-deleted) chunks in the database."""
+        return len(self.documents)
         
     def extract_text_from_pdf(self, pdf_file) -> str:
         """
@@ -45,28 +425,14 @@ class VectorDatabase:
         Returns:
             str: Extracted text from PDF
         """
-        text = ""
         try:
-            # Create a temporary file to save the uploaded PDF
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
-                tmp_file.write(pdf_file.getvalue())
-                tmp_path = tmp_file.name
-            
-            # Extract text using PyPDF2
-            with open(tmp_path, "rb") as f:
-                reader = PyPDF2.PdfReader(f)
-                for page_num, page in enumerate(reader.pages):
-                    page_text = page.extract_text() or ""
-                    text += f"\n--- Page {page_num + 1} ---\n{page_text}"
-                    
-            # Clean up temporary file
-            os.unlink(tmp_path)
-            
+            return "".join(
+                f"\n--- Page {page_num} ---\n{page_text}"
+                for page_num, page_text in iter_pdf_pages(pdf_file)
+            )
         except Exception as e:
             st.error(f"Error extracting text from PDF: {str(e)}")
             return ""
-            
-        return text
     
     def chunk_text(self, text: str, chunk_size: int = 1000, chunk_overlap: int = 200) -> List[str]:
         """
@@ -100,100 +466,428 @@ class VectorDatabase:
         Returns:
             Numpy array of embeddings
         """
-        embeddings = self.model.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
+        embeddings = self.engine.encode(texts)
         return embeddings
     
-    def add_documents(self, texts: List[str], metadata: List[Dict[str, Any]] = None):
+    def embed_query(self, query: str) -> np.ndarray:
+        """
+        Create the embedding for a search query. Concurrent queries are
+        micro-batched into a single encoder call.
+        
+        Args:
+            query: Search query
+            
+        Returns:
+            Numpy array of shape (1, dimension)
+        """
+        return self.query_batcher.encode([query])
+    
+    def add_documents(self, texts: List[str], metadata: List[Dict[str, Any]] = None) -> List[int]:
         """
         Add documents to the vector database.
         
         Args:
             texts: List of text chunks
             metadata: Optional metadata for each chunk
+            
+        Returns:
+            List of the 64-bit chunk IDs assigned to the new chunks
         """
         if not texts:
-            return
+            return []
             
         embeddings = self.create_embeddings(texts)
         
-        # Add to FAISS index
-        self.index.add(embeddings)
+        with self._lock:
+            ids = np.arange(self._next_id, self._next_id + len(texts), dtype=np.int64)
+            self._next_id += len(texts)
+            
+            # Add to FAISS index under our own IDs
+            self._writable_index().add_with_ids(embeddings, ids)
+            
+            # Store documents and metadata
+            for i, (chunk_id, text) in enumerate(zip(ids.tolist(), texts)):
+                chunk_meta = dict(metadata[i]) if metadata else {"chunk_id": chunk_id}
+                chunk_meta["content_hash"] = _content_hash(text)
+                self.documents[chunk_id] = text
+                self.metadata[chunk_id] = chunk_meta
+                
+        return ids.tolist()
+    
+    def find_ids(self, filename: Optional[str] = None, syllabus_id: Optional[str] = None) -> List[int]:
+        """
+        Find live chunk IDs belonging to a file and/or syllabus.
         
-        # Store documents and metadata
-        self.documents.extend(texts)
-        if metadata:
-            self.metadata.extend(metadata)
-        else:
-            self.metadata.extend([{"chunk_id": len(self.documents) + i} for i in range(len(texts))])
+        Args:
+            filename: Source filename to match
+            syllabus_id: Syllabus identifier to match
+            
+        Returns:
+            List of matching chunk IDs
+        """
+        if filename is None and syllabus_id is None:
+            raise ValueError("filename or syllabus_id is required")
+            
+        with self._lock:
+            matches: Optional[Set[int]] = None
+            for field, value in (("filename", filename), ("syllabus_id", syllabus_id)):
+                if value is None:
+                    continue
+                # Scan only the metadata column being matched
+                field_ids = {chunk_id for chunk_id, v in self.metadata.field_items(field) if v == value}
+                matches = field_ids if matches is None else matches & field_ids
+            return sorted(matches)
+    
+    def delete_documents(self, ids: List[int]) -> int:
+        """
+        Delete chunks by ID. Vectors are tombstoned and removed from the
+        FAISS index later by background compaction.
+        
+        Args:
+            ids: Chunk IDs to delete
+            
+        Returns:
+            Number of chunks deleted
+        """
+        deleted = 0
+        with self._lock:
+            for chunk_id in ids:
+                if self.documents.pop(chunk_id, None) is not None:
+                    self.metadata.pop(chunk_id, None)
+                    self._tombstones.add(chunk_id)
+                    deleted += 1
+        
+        if deleted:
+            self._maybe_schedule_compaction()
+        return deleted
+    
+    def delete_by_source(self, filename: Optional[str] = None, syllabus_id: Optional[str] = None) -> int:
+        """
+        Delete every chunk of a file and/or syllabus.
+        
+        Args:
+            filename: Source filename to delete
+            syllabus_id: Syllabus identifier to delete
+            
+        Returns:
+            Number of chunks deleted
+        """
+        return self.delete_documents(self.find_ids(filename=filename, syllabus_id=syllabus_id))
+    
+    def replace_source(self, texts: List[str], metadata: List[Dict[str, Any]],
+                       filename: Optional[str] = None, syllabus_id: Optional[str] = None) -> Dict[str, int]:
+        """
+        Replace all chunks of a file and/or syllabus with a new version.
+        Chunks whose text is unchanged keep their ID and embedding; only new
+        or edited chunks are embedded.
+        
+        Args:
+            texts: New list of text chunks for the source
+            metadata: Metadata for each new chunk
+            filename: Source filename being replaced
+            syllabus_id: Syllabus identifier being replaced
+            
+        Returns:
+            dict: Counts of kept, added and removed chunks
+        """
+        return self.replace_source_stream(zip(texts, metadata), filename=filename, syllabus_id=syllabus_id)
+    
+    def replace_source_stream(self, chunks, filename: Optional[str] = None, syllabus_id: Optional[str] = None,
+                              batch_size: int = 64) -> Dict[str, int]:
+        """
+        Streaming form of replace_source. Chunks are consumed in fixed-size
+        batches, and each batch is embedded and indexed before the next one is
+        read, so memory stays bounded by the batch size. The chunk stream is
+        produced on a background thread, so extraction overlaps embedding.
+        If the stream or an embedding batch fails, the chunks added so far are
+        deleted and the previous version is left as it was.
+        
+        Args:
+            chunks: Iterable of (text, metadata) tuples
+            filename: Source filename being replaced
+            syllabus_id: Syllabus identifier being replaced
+            batch_size: Number of chunks embedded per encoder call
+            
+        Returns:
+            dict: Counts of kept, added and removed chunks
+        """
+        with self._lock:
+            # Index the previous version of the source by content hash
+            previous: Dict[str, List[int]] = {}
+            for chunk_id in self.find_ids(filename=filename, syllabus_id=syllabus_id):
+                previous.setdefault(self.metadata.get_field(chunk_id, "content_hash"), []).append(chunk_id)
+        
+        kept = 0
+        added_ids: List[int] = []
+        # Metadata of kept chunks before this call rewrote it, for rollback
+        touched: Dict[int, Dict[str, Any]] = {}
+        try:
+            for batch in _prefetch(iter_batches(chunks, batch_size)):
+                new_texts, new_metadata = [], []
+                with self._lock:
+                    for text, meta in batch:
+                        content_hash = _content_hash(text)
+                        if previous.get(content_hash):
+                            chunk_id = previous[content_hash].pop()
+                            touched.setdefault(chunk_id, self.metadata[chunk_id])
+                            self.metadata[chunk_id] = {**meta, "content_hash": content_hash}
+                            kept += 1
+                        else:
+                            new_texts.append(text)
+                            new_metadata.append(meta)
+                
+                # Embedding happens outside the lock so searches are not blocked
+                added_ids.extend(self.add_documents(new_texts, new_metadata))
+        except BaseException:
+            # Leave the previous version in place: drop what this call added and
+            # restore the metadata it rewrote
+            with self._lock:
+                self.delete_documents(added_ids)
+                for chunk_id, meta in touched.items():
+                    if chunk_id in self.metadata:
+                        self.metadata[chunk_id] = meta
+            raise
+        
+        stale_ids = [chunk_id for ids in previous.values() for chunk_id in ids]
+        removed = self.delete_documents(stale_ids)
+        
+        return {"kept": kept, "added": len(added_ids), "removed": removed}
+    
+    def update_metadata(self, ids: List[int], fields: Dict[str, Any]):
+        """
+        Merge fields into the metadata of existing chunks.
+        
+        Args:
+            ids: Chunk IDs to update
+            fields: Metadata fields to set
+        """
+        with self._lock:
+            for chunk_id in ids:
+                if chunk_id in self.metadata:
+                    self.metadata[chunk_id] = {**self.metadata[chunk_id], **fields}
     
-    def search(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
+    def search(self, query: str, k: int = 5, include_vectors: bool = False) -> List[Dict[str, Any]]:
         """
         Search for similar documents using semantic similarity.
         
         Args:
             query: Search query
             k: Number of results to return
+            include_vectors: Also return each result's stored embedding under "vector"
             
         Returns:
-            List of search results with text, score, and metadata
+            List of search results with id, text, score, and metadata
         """
-        if self.index.ntotal == 0:
+        if len(self) == 0:
             return []
             
         # Create query embedding
-        query_embedding = self.create_embeddings([query])
-        
-        # Search in FAISS index
-        scores, indices = self.index.search(query_embedding, k)
-        
-        results = []
-        for score, idx in zip(scores[0], indices[0]):
-            if idx < len(self.documents):
-                results.append({
-                    "text": self.documents[idx],
-                    "score": float(score),
-                    "metadata": self.metadata[idx]
-                })
+        query_embedding = self.embed_query(query)
+        
+        with self._lock:
+            # Over-fetch so tombstoned vectors don't crowd out live results
+            fetch_k = min(k + len(self._tombstones), self.index.ntotal)
+            scores, indices = self.index.search(query_embedding, fetch_k)
+            
+            results = []
+            for score, chunk_id in zip(scores[0], indices[0].tolist()):
+                if chunk_id in self.documents:
+                    results.append({
+                        "id": chunk_id,
+                        "text": self.documents[chunk_id],
+                        "score": float(score),
+                        "metadata": self.metadata[chunk_id]
+                    })
+                    if include_vectors:
+                        results[-1]["vector"] = self.index.reconstruct(chunk_id)
+                    if len(results) == k:
+                        break
                 
         return results
     
+    def compact(self):
+        """
+        Physically remove tombstoned vectors from the FAISS index.
+        """
+        with self._lock:
+            if not self._tombstones:
+                return
+            dead_ids = np.fromiter(self._tombstones, dtype=np.int64, count=len(self._tombstones))
+            self._writable_index().remove_ids(faiss.IDSelectorBatch(dead_ids.size, faiss.swig_ptr(dead_ids)))
+            self._tombstones.clear()
+    
+    def _maybe_schedule_compaction(self):
+        """Start a background compaction when enough of the index is tombstoned."""
+        with self._lock:
+            if self.index.ntotal == 0:
+                return
+            if len(self._tombstones) / self.index.ntotal < self.compaction_threshold:
+                return
+            if self._compaction_thread is not None and self._compaction_thread.is_alive():
+                return
+            self._compaction_thread = threading.Thread(
+                target=self.compact, name="vector-db-compaction", daemon=True
+            )
+            self._compaction_thread.start()
+    
+    def _writable_index(self):
+        """Return the FAISS index, first loading an owned copy if it is currently memory-mapped."""
+        if self._index_source is not None:
+            self.index = faiss.read_index(self._index_source)
+            self._index_source = None
+        return self.index
+    
     def save_database(self, filepath: str):
         """
         Save the vector database to disk.
         
+        Writes a new generation of files next to ``filepath`` and then
+        atomically swaps ``{filepath}.manifest.json`` to point at it, so a
+        crash mid-save always leaves the previous version loadable.
+        
         Args:
             filepath: Path to save the database
         """
-        # Save FAISS index
-        faiss.write_index(self.index, f"{filepath}.index")
+        directory = os.path.dirname(filepath)
+        manifest_path = f"{filepath}.manifest.json"
         
-        # Save documents and metadata
-        data = {
-            "documents": self.documents,
-            "metadata": self.metadata,
-            "dimension": self.dimension
-        }
+        with self._lock:
+            # Tombstones are never persisted
+            self.compact()
+            
+            previous = None
+            if os.path.exists(manifest_path):
+                with open(manifest_path, "r", encoding="utf-8") as f:
+                    previous = json.load(f)
+            generation = previous["generation"] + 1 if previous else 1
+            prefix = f"{filepath}.g{generation}"
+            
+            ids = np.array(sorted(self.documents), dtype=np.int64)
+            
+            files = {
+                "index": f"{prefix}.index",
+                "ids": f"{prefix}.ids.npy",
+                "text": f"{prefix}.text.bin",
+                "text_offsets": f"{prefix}.text_offsets.npy",
+            }
+            _atomic_write(files["index"], lambda tmp: faiss.write_index(self.index, tmp))
+            _atomic_write(files["ids"], lambda tmp: _save_array(tmp, ids))
+            _write_blob_column(
+                (self.documents[chunk_id].encode("utf-8") for chunk_id in ids.tolist()),
+                files["text"], files["text_offsets"]
+            )
+            # Each row is decoded once and fanned out to every metadata column;
+            # missing fields are stored as empty values, which JSON can never produce
+            metadata_files = _write_blob_columns(
+                (
+                    {field: json.dumps(value).encode("utf-8") for field, value in self.metadata[chunk_id].items()}
+                    for chunk_id in ids.tolist()
+                ),
+                lambda i: (f"{prefix}.meta{i}.bin", f"{prefix}.meta{i}_offsets.npy")
+            )
+            
+            manifest = {
+                "format": STORE_FORMAT,
+                "version": STORE_VERSION,
+                "generation": generation,
+                "dimension": self.dimension,
+                "next_id": self._next_id,
+                "count": int(ids.size),
+                "files": {key: os.path.basename(path) for key, path in files.items()},
+                "metadata_columns": {
+                    column: {key: os.path.basename(path) for key, path in paths.items()}
+                    for column, paths in sorted(metadata_files.items())
+                },
+            }
+            
+            def write_manifest(tmp_path):
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(manifest, f, indent=2)
+            
+            _atomic_write(manifest_path, write_manifest)
+            _fsync_directory(directory)
+            
+            if self._index_source is not None:
+                self._index_source = files["index"]
         
-        with open(f"{filepath}.pkl", "wb") as f:
-            pickle.dump(data, f)
+        # The new generation is live; drop the files of the previous one
+        if previous:
+            old_files = list(previous["files"].values()) + [
+                name for paths in previous["metadata_columns"].values() for name in paths.values()
+            ]
+            for name in old_files:
+                try:
+                    os.remove(os.path.join(directory, name))
+                except OSError:
+                    pass
     
     def load_database(self, filepath: str):
         """
         Load the vector database from disk.
         
+        All files are memory-mapped, so opening is near-instant regardless of
+        corpus size; chunk text and metadata are decoded only when accessed.
+        
         Args:
             filepath: Path to load the database from
         """
-        # Load FAISS index
-        self.index = faiss.read_index(f"{filepath}.index")
+        directory = os.path.dirname(filepath)
+        with open(f"{filepath}.manifest.json", "r", encoding="utf-8") as f:
+            manifest = json.load(f)
         
-        # Load documents and metadata
-        with open(f"{filepath}.pkl", "rb") as f:
-            data = pickle.load(f)
-            
-        self.documents = data["documents"]
-        self.metadata = data["metadata"]
-        self.dimension = data["dimension"]
+        if manifest.get("format") != STORE_FORMAT or manifest.get("version") != STORE_VERSION:
+            raise ValueError(f"Unsupported vector database format in {filepath}.manifest.json")
+        if manifest["dimension"] != self.dimension:
+            raise ValueError(
+                f"Database dimension {manifest['dimension']} does not match model dimension {self.dimension}"
+            )
+        
+        def path(name: str) -> str:
+            return os.path.join(directory, name)
+        
+        files = manifest["files"]
+        
+        # Load FAISS index, memory-mapped when this FAISS build supports it
+        index_path = path(files["index"])
+        mmap_flag = getattr(faiss, "IO_FLAG_MMAP_IFC", None)
+        index_source = None
+        if mmap_flag is not None:
+            try:
+                index = faiss.read_index(index_path, mmap_flag)
+                index_source = index_path
+            except RuntimeError:
+                index = faiss.read_index(index_path)
+        else:
+            index = faiss.read_index(index_path)
+        
+        ids = _load_array(path(files["ids"]))
+        text = _BlobColumn(path(files["text"]), path(files["text_offsets"]))
+        columns = {
+            column: _BlobColumn(path(paths["blob"]), path(paths["offsets"]))
+            for column, paths in manifest["metadata_columns"].items()
+        }
+        
+        def read_text(row: int) -> str:
+            return text[row].decode("utf-8")
+        
+        def read_field(field: str, row: int):
+            value = columns[field][row] if field in columns else b""
+            return json.loads(value) if value else None
+        
+        def read_metadata(row: int) -> Dict[str, Any]:
+            return {
+                field: json.loads(value)
+                for field, column in columns.items()
+                for value in (column[row],) if value
+            }
+        
+        with self._lock:
+            self.index = index
+            self._index_source = index_source
+            self.documents = _ChunkTable(ids, read_text)
+            self.metadata = _ChunkTable(ids, read_metadata, read_field)
+            self._next_id = manifest["next_id"]
+            self._tombstones = set()
 
 
 # Global vector database instance
@@ -231,35 +925,37 @@ def create_vector_embeddings(uploaded_files) -> bool:
     progress_bar = st.progress(0)
     status_text = st.empty()
     
-    all_chunks = []
-    all_metadata = []
+    totals = {"kept": 0, "added": 0, "removed": 0}
+    file_counts = {}  # filename -> number of chunks
     
     for i, uploaded_file in enumerate(uploaded_files):
         try:
             status_text.text(f"Processing {uploaded_file.name}...")
             
-            # Extract text from PDF
-            pdf_text = vector_db.extract_text_from_pdf(uploaded_file)
+            # Pages stream into the chunker, chunks stream into embedding batches
+            chunks = (
+                (text, {"filename": uploaded_file.name, "chunk_id": j, **offsets})
+                for j, (text, offsets) in enumerate(iter_chunks(iter_pdf_pages(uploaded_file)))
+            )
             
-            if not pdf_text.strip():
+            # Don't replace a previous version of the file with nothing
+            first_chunk = next(chunks, None)
+            if first_chunk is None:
                 st.warning(f"No text extracted from {uploaded_file.name}")
                 continue
             
-            # Chunk the text
-            chunks = vector_db.chunk_text(pdf_text)
-            
-            # Create metadata for each chunk
-            chunk_metadata = [
-                {
-                    "filename": uploaded_file.name,
-                    "chunk_id": j,
-                    "total_chunks": len(chunks)
-                }
-                for j in range(len(chunks))
-            ]
+            # Replace the file's previous version; unchanged chunks are not re-embedded
+            counts = vector_db.replace_source_stream(
+                itertools.chain([first_chunk], chunks), filename=uploaded_file.name
+            )
+            for key, value in counts.items():
+                totals[key] += value
             
-            all_chunks.extend(chunks)
-            all_metadata.extend(chunk_metadata)
+            file_counts[uploaded_file.name] = counts["kept"] + counts["added"]
+            vector_db.update_metadata(
+                vector_db.find_ids(filename=uploaded_file.name),
+                {"total_chunks": file_counts[uploaded_file.name]}
+            )
             
             # Update progress
             progress = (i + 1) / len(uploaded_files)
@@ -269,39 +965,27 @@ def create_vector_embeddings(uploaded_files) -> bool:
             st.error(f"Error processing {uploaded_file.name}: {str(e)}")
             continue
     
-    if all_chunks:
-        status_text.text("Creating embeddings and building vector database...")
-        try:
-            # Add all documents to the vector database
-            vector_db.add_documents(all_chunks, all_metadata)
-            
-            progress_bar.progress(1.0)
-            status_text.empty()
-            progress_bar.empty()
-            
-            st.success(f"Vector database is ready! Processed {len(all_chunks)} text chunks from {len(uploaded_files)} files.")
-            
-            # Display some stats
-            with st.expander("Database Statistics"):
-                st.write(f"**Total documents in database:** {vector_db.index.ntotal}")
-                st.write(f"**Embedding dimension:** {vector_db.dimension}")
-                st.write(f"**Files processed:** {len(set(meta['filename'] for meta in all_metadata))}")
-                
-                # Show file breakdown
-                file_counts = {}
-                for meta in all_metadata:
-                    filename = meta['filename']
-                    file_counts[filename] = file_counts.get(filename, 0) + 1
-                
-                st.write("**Chunks per file:**")
-                for filename, count in file_counts.items():
-                    st.write(f"- {filename}: {count} chunks")
-            
-            return True
+    progress_bar.progress(1.0)
+    status_text.empty()
+    progress_bar.empty()
+    
+    if file_counts:
+        total_chunks = sum(file_counts.values())
+        st.success(f"Vector database is ready! Processed {total_chunks} text chunks from {len(uploaded_files)} files.")
+        
+        # Display some stats
+        with st.expander("Database Statistics"):
+            st.write(f"**Total documents in database:** {len(vector_db)}")
+            st.write(f"**Chunks embedded / reused / removed:** {totals['added']} / {totals['kept']} / {totals['removed']}")
+            st.write(f"**Embedding dimension:** {vector_db.dimension}")
+            st.write(f"**Files processed:** {len(file_counts)}")
             
-        except Exception as e:
-            st.error(f"Error creating vector embeddings: {str(e)}")
-            return False
+            # Show file breakdown
+            st.write("**Chunks per file:**")
+            for filename, count in file_counts.items():
+                st.write(f"- {filename}: {count} chunks")
+        
+        return True
     else:
         st.error("No text could be extracted from the uploaded files!")
         return False
@@ -320,7 +1004,7 @@ def search_documents(query: str, k: int = 5) -> List[Dict[str, Any]]:
     """
     vector_db = get_vector_database()
     
-    if vector_db.index.ntotal == 0:
+    if len(vector_db) == 0:
         st.warning("No documents in the vector database. Please upload and process some PDFs first.")
         return []
     
@@ -328,35 +1012,181 @@ def search_documents(query: str, k: int = 5) -> List[Dict[str, Any]]:
     return results
 
 
-def get_relevant_context(query: str, max_context_length: int = 2000) -> str:
+# Token budget for RAG context; counted with tiktoken so it tracks what the model is billed for
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "512"))
+CONTEXT_TOKEN_ENCODING = os.getenv("CONTEXT_TOKEN_ENCODING", "cl100k_base")
+
+_token_encoder = None
+
+
+def _get_token_encoder():
+    """Load the tiktoken encoder once; None if tiktoken is unavailable."""
+    global _token_encoder
+    if _token_encoder is None:
+        try:
+            import tiktoken
+            _token_encoder = tiktoken.get_encoding(CONTEXT_TOKEN_ENCODING)
+        except Exception as e:
+            print(f"tiktoken unavailable, estimating tokens from characters: {e}")
+            _token_encoder = False
+    return _token_encoder or None
+
+
+def count_tokens(text: str) -> int:
     """
-    Get relevant context for a query by searching the vector database.
+    Count the tokens a text costs in a prompt.
+    
+    Args:
+        text: Input text
+        
+    Returns:
+        Token count (estimated as ~4 characters per token without tiktoken)
+    """
+    encoder = _get_token_encoder()
+    if encoder is None:
+        return (len(text) + 3) // 4
+    return len(encoder.encode(text))
+
+
+def _truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text down to at most max_tokens tokens."""
+    encoder = _get_token_encoder()
+    if encoder is None:
+        return text[:max_tokens * 4]
+    return encoder.decode(encoder.encode(text)[:max_tokens])
+
+
+def _mmr_order(results: List[Dict[str, Any]], diversity: float) -> List[Dict[str, Any]]:
+    """
+    Reorder search results by maximal marginal relevance, trading query
+    similarity against similarity to results already picked.
+    
+    Args:
+        results: Search results carrying "score" and "vector"
+        diversity: 0 keeps pure relevance order, 1 maximizes novelty
+        
+    Returns:
+        Results in MMR order
+    """
+    if len(results) < 2:
+        return list(results)
+    
+    vectors = np.vstack([r["vector"] for r in results])
+    relevance = np.array([r["score"] for r in results])
+    similarity = vectors @ vectors.T
+    
+    selected = [int(np.argmax(relevance))]
+    remaining = set(range(len(results))) - set(selected)
+    while remaining:
+        candidates = list(remaining)
+        redundancy = similarity[np.ix_(candidates, selected)].max(axis=1)
+        mmr = (1 - diversity) * relevance[candidates] - diversity * redundancy
+        best = candidates[int(np.argmax(mmr))]
+        selected.append(best)
+        remaining.remove(best)
+    
+    return [results[i] for i in selected]
+
+
+def _merge_passages(results: List[Dict[str, Any]]) -> List[str]:
+    """
+    Merge chunks from the same source whose character ranges overlap or
+    touch, so the 200-character chunk overlap is sent once.
+    
+    Args:
+        results: Search results in priority order
+        
+    Returns:
+        Passage texts, ordered by the best-ranked chunk each contains
+    """
+    spans = []  # [rank, source, start, end, text]
+    for rank, result in enumerate(results):
+        meta = result["metadata"]
+        start, end = meta.get("start_offset"), meta.get("end_offset")
+        if start is None or end is None:
+            spans.append([rank, None, 0, 0, result["text"]])
+        else:
+            spans.append([rank, (meta.get("filename"), meta.get("syllabus_id")), start, end, result["text"]])
+    
+    merged = []
+    positional = sorted(
+        (span for span in spans if span[1] is not None),
+        key=lambda span: (str(span[1]), span[2])
+    )
+    for span in positional:
+        last = merged[-1] if merged else None
+        if last is not None and last[1] == span[1] and span[2] <= last[3] + 1:
+            if span[3] > last[3]:
+                # Append only the part of this chunk past the end of the passage
+                overlap = last[3] - span[2]
+                gap = "" if overlap >= 0 else " "
+                last[4] = last[4] + gap + span[4][max(overlap, 0):]
+                last[3] = span[3]
+            last[0] = min(last[0], span[0])
+        else:
+            merged.append(list(span))
+    merged.extend(span for span in spans if span[1] is None)
+    
+    return [span[4] for span in sorted(merged, key=lambda span: span[0])]
+
+
+def build_context(query: str, max_tokens: int = CONTEXT_TOKEN_BUDGET, k: int = 8,
+                  diversity: float = 0.3, min_fragment_tokens: int = 32) -> str:
+    """
+    Assemble a dense, deduplicated RAG context that fits a token budget.
+    
+    Retrieves k candidates, orders them by MMR for diversity, merges
+    overlapping/adjacent chunks of the same source by offsets, then fills the
+    budget passage by passage (the last passage is truncated to fit).
     
     Args:
         query: Search query
-        max_context_length: Maximum length of context to return
+        max_tokens: Token budget for the returned context
+        k: Number of candidate chunks to retrieve
+        diversity: MMR diversity weight (0 = pure relevance)
+        min_fragment_tokens: Smallest truncated passage worth including
         
     Returns:
-        Relevant context text
+        Context text, or "" if nothing relevant is indexed
     """
-    results = search_documents(query, k=3)
+    vector_db = get_vector_database()
+    if len(vector_db) == 0:
+        return ""
     
+    results = vector_db.search(query, k=k, include_vectors=True)
     if not results:
         return ""
     
+    separator = "\n\n"
+    separator_tokens = count_tokens(separator)
+    
     context_parts = []
-    current_length = 0
+    used_tokens = 0
+    for passage in _merge_passages(_mmr_order(results, diversity)):
+        cost = count_tokens(passage) + (separator_tokens if context_parts else 0)
+        if used_tokens + cost <= max_tokens:
+            context_parts.append(passage)
+            used_tokens += cost
+            continue
+        
+        # Fill what's left of the budget with the start of this passage
+        remaining = max_tokens - used_tokens - (separator_tokens if context_parts else 0)
+        if remaining >= min_fragment_tokens:
+            context_parts.append(_truncate_to_tokens(passage, remaining))
+        break
     
-    for result in results:
-        text = result["text"]
-        if current_length + len(text) <= max_context_length:
-            context_parts.append(text)
-            current_length += len(text)
-        else:
-            # Add partial text if there's remaining space
-            remaining_space = max_context_length - current_length
-            if remaining_space > 100:  # Only add if there's meaningful space left
-                context_parts.append(text[:remaining_space] + "...")
-            break
+    return separator.join(context_parts)
+
+
+def get_relevant_context(query: str, max_tokens: int = CONTEXT_TOKEN_BUDGET) -> str:
+    """
+    Get relevant context for a query by searching the vector database.
     
-    return "\n\n".join(context_parts)
\ No newline at end of file
+    Args:
+        query: Search query
+        max_tokens: Token budget for the returned context
+        
+    Returns:
+        Relevant context text
+    """
+    return build_context(query, max_tokens=max_tokens)